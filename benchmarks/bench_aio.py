@@ -0,0 +1,52 @@
+'''
+Compare ``linetface.aio.get_addrs()`` with running ``linetface.get_addrs()`` in an executor.
+
+It reports the mean call latency and how late a 1 ms heartbeat task gets woken up
+while the queries run, which is how much the event loop is stalled::
+
+    python -m benchmarks.bench_aio
+'''
+
+import time
+import asyncio
+import statistics
+
+from linetface import aio, hand
+
+
+ROUNDS = 200
+
+
+async def heartbeat(lags: list, stop: asyncio.Event):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(0.001)
+        lags.append(time.perf_counter() - start - 0.001)
+
+
+async def run(name: str, query):
+    lags = []
+    stop = asyncio.Event()
+    beat = asyncio.create_task(heartbeat(lags, stop))
+    latencies = []
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        await query()
+        latencies.append(time.perf_counter() - start)
+    stop.set()
+    await beat
+    print('{:<10} call mean {:7.3f} ms   loop lag p50 {:6.3f} ms  max {:6.3f} ms'.format(
+        name, statistics.mean(latencies) * 1e3, statistics.median(lags) * 1e3, max(lags) * 1e3))
+
+
+async def main():
+    loop = asyncio.get_running_loop()
+    session = hand.Linetface(pool_size=1)
+    async with aio.AsyncLinetface() as lf:
+        await run('aio', lf.get_addrs)
+        await run('executor', lambda: loop.run_in_executor(None, session.get_addrs))
+    session.close()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,66 @@
+'''
+Start time and throughput of the ``linetface`` command against ``ip -j -d addr``,
+in a new network namespace with thousands of interfaces::
+
+    python -m benchmarks.bench_cli [ninterfaces]
+
+The benchmark runs itself again under ``unshare -rn`` (it needs unprivileged user namespaces
+or root) and creates ``dummy`` interfaces there, or ``ifb`` ones if the kernel has no dummy driver,
+each with one IPv4 address.
+'''
+
+import os
+import sys
+import time
+import statistics
+import subprocess
+from typing import Sequence
+
+
+IN_NETNS = 'LINETFACE_BENCH_NETNS'
+LINETFACE = (sys.executable, '-m', 'linetface')
+
+
+def populate(count: int):
+    for kind in ('dummy', 'ifb'):
+        if subprocess.run(('ip', 'link', 'add', 'probe0', 'type', kind), stderr=subprocess.DEVNULL).returncode == 0:
+            subprocess.run(('ip', 'link', 'del', 'probe0'), check=True)
+            break
+    else:
+        sys.exit('Neither dummy nor ifb interfaces can be created here.')
+    commands = []
+    for i in range(count):
+        commands.append('link add bench{} type {}'.format(i, kind))
+        commands.append('addr add 10.{}.{}.1/24 dev bench{}'.format(i // 256, i % 256, i))
+    subprocess.run(('ip', '-batch', '-'), input='\n'.join(commands).encode(), check=True)
+    print('{} {} interfaces'.format(count, kind))
+
+
+def timed(command: Sequence[str], runs: int) -> float:
+    ''' Median wall time of running ``command``, in milliseconds. '''
+    times = []
+    for _i in range(runs):
+        start = time.perf_counter()
+        subprocess.run(command, stdout=subprocess.DEVNULL, check=True)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1000
+
+
+def main(count: int = 2000):
+    if not os.environ.get(IN_NETNS):
+        env = dict(os.environ, **{IN_NETNS: '1'})
+        command = ('unshare', '-rn', sys.executable, '-m', 'benchmarks.bench_cli', str(count))
+        sys.exit(subprocess.run(command, env=env).returncode)
+    subprocess.run(('ip', 'link', 'set', 'lo', 'up'), check=True)
+    populate(count)
+    print('{:<28} {:>10} {:>10}'.format('', 'ip', 'linetface'))
+    for title, args, runs in (('start (-j -d addr show lo)', ('-j', '-d', 'addr', 'show', 'lo'), 20),
+                              ('full dump (-j -d addr)', ('-j', '-d', 'addr'), 5),
+                              ('full dump (-j -d link)', ('-j', '-d', 'link'), 5)):
+        ip_ms = timed(('ip',) + args, runs)
+        linetface_ms = timed(LINETFACE + args, runs)
+        print('{:<28} {:8.1f}ms {:8.1f}ms'.format(title, ip_ms, linetface_ms))
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:2]))
@@ -0,0 +1,46 @@
+'''
+Compare the decoding of a synthetic 10k-link dump by pyroute2 + ``shinify_*``
+with the direct decoder of :py:mod:`linetface.rawnl`::
+
+    python -m benchmarks.bench_decode
+'''
+
+import time
+
+from pyroute2.netlink.rtnl.marshal import MarshalRtnl
+
+from linetface import rawnl
+from linetface.hand import shinify_link, shinify_addr_info
+from tests.synth import host_dump, NLMSG_DONE
+
+
+def with_pyroute2(link_data: bytes, addr_data: bytes):
+    links = [shinify_link(m) for m in MarshalRtnl().parse(link_data) if m['header']['type'] != NLMSG_DONE]
+    addrs = [shinify_addr_info(m) for m in MarshalRtnl().parse(addr_data) if m['header']['type'] != NLMSG_DONE]
+    return links, addrs
+
+
+def with_rawnl(link_data: bytes, addr_data: bytes):
+    links = [rawnl.decode_link(link_data, start, end)
+             for kind, _f, _s, start, end in rawnl.iter_messages(link_data) if kind == rawnl.RTM_NEWLINK]
+    addrs = [rawnl.decode_addr(addr_data, start, end)[1]
+             for kind, _f, _s, start, end in rawnl.iter_messages(addr_data) if kind == rawnl.RTM_NEWADDR]
+    return links, addrs
+
+
+def measure(func, *args) -> float:
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def main(nlinks: int = 10000):
+    dump = host_dump(nlinks)
+    slow = measure(with_pyroute2, *dump)
+    fast = measure(with_rawnl, *dump)
+    print('{} links, {} addresses'.format(nlinks, 3 * nlinks - 2))
+    print('pyroute2: {:.3f}s  rawnl: {:.3f}s  speedup: {:.1f}x'.format(slow, fast, slow / fast))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,30 @@
+'''
+Decoding of link and address flags, with and without the memo tables::
+
+    python -m benchmarks.bench_flags
+'''
+
+import socket
+import timeit
+
+from linetface.consts import split_link_flags, decode_link_flags, split_ifa_flags, decode_ifa_flags
+
+
+# Values seen on a typical host: loopback, up/down ethernet, tunnels, bridge ports
+LINK_VALUES = (0x10049, 0x11043, 0x1003, 0x1002, 0x100d1, 0x11843, 0x10091, 0x11143)
+IFA_VALUES = (0x80, 0x200, 0x280, 0x100, 0x1, 0x2, 0x880)
+
+
+def main(number: int = 200000):
+    print('{} decodings each'.format(number * len(LINK_VALUES)))
+    for name, decode in (('uncached', split_link_flags), ('memo', decode_link_flags)):
+        elapsed = timeit.timeit(lambda: [decode(v) for v in LINK_VALUES], number=number)
+        print('link flags {:<9} {:7.3f}s'.format(name, elapsed))
+    for name, decode in (('uncached', lambda v: split_ifa_flags(v, True)),
+                         ('memo', lambda v: decode_ifa_flags(socket.AF_INET6, v))):
+        elapsed = timeit.timeit(lambda: [decode(v) for v in IFA_VALUES], number=number)
+        print('ifa flags  {:<9} {:7.3f}s'.format(name, elapsed))
+
+
+if __name__ == '__main__':
+    main()
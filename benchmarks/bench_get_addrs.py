@@ -0,0 +1,40 @@
+'''
+Show that ``get_addrs()`` scales linearly with the number of links.
+
+The kernel is replaced by a synthetic dump, so it runs without privileges::
+
+    python -m benchmarks.bench_get_addrs
+'''
+
+import time
+from unittest import mock
+
+from linetface import hand
+from tests.synth import host_dump, FakeIPRoute
+
+
+def per_link_label_query(ip):
+    # The algorithm used before: one (client-side filtered) address dump per link.
+    return [tuple(hand.shinify_addr_info(a) for a in ip.get_addr(label=li.get_attr('IFLA_IFNAME')))
+            for li in ip.get_links()]
+
+
+def measure(func, *args) -> float:
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    print('{:>7} {:>12} {:>14} {:>20}'.format('links', 'get_addrs', 'us per link', 'per-link label query'))
+    for nlinks in (1000, 2000, 5000, 10000):
+        fake = FakeIPRoute(*host_dump(nlinks))
+        with mock.patch.object(hand, '_IPRoute', return_value=fake), hand.Linetface() as session:
+            elapsed = measure(session.get_addrs)
+        # The old way is quadratic, don't wait for it on the biggest dumps.
+        old = '{:.3f}s'.format(measure(per_link_label_query, fake)) if nlinks <= 2000 else '-'
+        print('{:>7} {:>11.3f}s {:>14.1f} {:>20}'.format(nlinks, elapsed, elapsed / nlinks * 1e6, old))
+
+
+if __name__ == '__main__':
+    main()
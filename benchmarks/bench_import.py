@@ -0,0 +1,45 @@
+'''
+Cold import time of the package, measured with ``python -X importtime`` in fresh interpreters::
+
+    python -m benchmarks.bench_import [threshold_ms]
+
+It exits with status 1 if the median time of ``import linetface`` goes over the threshold,
+so that it can guard the start time of short-lived scripts as features are added.
+'''
+
+import sys
+import statistics
+import subprocess
+
+
+# Default threshold for "import linetface", in milliseconds
+THRESHOLD_MS = 50
+MODULES = ('linetface', 'linetface.consts', 'linetface.core', 'linetface.hand')
+
+
+def import_time(module: str) -> float:
+    ''' Cumulative import time of ``module`` and what it pulls in, in milliseconds. '''
+    result = subprocess.run((sys.executable, '-X', 'importtime', '-c', 'import ' + module),
+                            check=True, stderr=subprocess.PIPE, universal_newlines=True)
+    # Lines look like "import time: self [us] | cumulative | imported package".
+    # The line of the module itself comes last, its cumulative time includes its parent packages.
+    for line in result.stderr.splitlines():
+        _self, cumulative, name = line.split('|')
+        if name.strip() == module:
+            return int(cumulative) / 1000
+    raise ValueError('{} not found in -X importtime output'.format(module))
+
+
+def main(threshold_ms: float = THRESHOLD_MS, runs: int = 7) -> int:
+    results = {}
+    for module in MODULES:
+        results[module] = statistics.median(import_time(module) for _i in range(runs))
+        print('{:<18} {:7.1f} ms'.format(module, results[module]))
+    if results['linetface'] > threshold_ms:
+        print('"import linetface" takes longer than {} ms'.format(threshold_ms))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(*map(float, sys.argv[1:2])))
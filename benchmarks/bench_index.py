@@ -0,0 +1,58 @@
+'''
+Time of the lookups of :py:class:`linetface.index.InterfaceIndex`, and of the scans
+of the :py:func:`~linetface.get_addrs` tuple which they replace::
+
+    python -m benchmarks.bench_index
+
+Every synthetic link is UP, so the first flag query returns all of them, and the second one only ``lo``.
+'''
+
+import timeit
+from ipaddress import ip_address, ip_network
+
+from linetface.consts import LinkFlag
+from linetface.index import InterfaceIndex
+from tests.test_snapshot import get_addrs
+
+
+def scan_flags(records, flags, without):
+    return tuple(r for r in records if all(f in r.flags for f in flags) and not any(f in r.flags for f in without))
+
+
+def scan_containing(records, address):
+    return tuple((r, a) for r in records for a in r.addr_info
+                 if a.local.version == address.version
+                 and address in ip_network('{}/{}'.format(a.local, a.prefixlen), strict=False))
+
+
+def per_call(func, number: int) -> float:
+    return min(timeit.repeat(func, number=number, repeat=3)) / number
+
+
+def main():
+    print('{:>7} {:<36} {:>12} {:>12}'.format('links', 'query', 'scan', 'index'))
+    for nlinks in (1000, 10000, 100000):
+        records = get_addrs(nlinks)
+        index = InterfaceIndex(records)
+        target = records[-1].addr_info[0].local
+        queries = (
+            ('UP+MULTICAST, not LOOPBACK', lambda: scan_flags(records, (LinkFlag.UP, LinkFlag.MULTICAST),
+                                                              (LinkFlag.LOOPBACK,)),
+             lambda: index.with_flags(LinkFlag.UP | LinkFlag.MULTICAST, without=LinkFlag.LOOPBACK)),
+            ('UP, not BROADCAST', lambda: scan_flags(records, (LinkFlag.UP,), (LinkFlag.BROADCAST,)),
+             lambda: index.with_flags(LinkFlag.UP, without=LinkFlag.BROADCAST)),
+            ('owner of {}'.format(target), lambda: next(r for r in records for a in r.addr_info if a.local == target),
+             lambda: index.owners(target)),
+            ('subnets of 127.0.0.2', lambda: scan_containing(records, ip_address('127.0.0.2')),
+             lambda: index.containing('127.0.0.2')),
+        )
+        build = per_call(lambda: InterfaceIndex(records), 1)
+        print('{:>7} {:<36} {:>12} {:10.3f}ms'.format(nlinks, 'build the index', '', build * 1000))
+        for name, scan, lookup in queries:
+            number = 1 if nlinks >= 10000 else 10
+            print('{:>7} {:<36} {:10.3f}ms {:10.4f}ms'.format(
+                nlinks, name, per_call(scan, number) * 1000, per_call(lookup, 100) * 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+'''
+JSON output of a synthetic 10k-link ``ip -j -d addr``, with :py:mod:`linetface.ipjson`
+and with ``json.dumps`` of ``dataclasses.asdict``::
+
+    python -m benchmarks.bench_json
+'''
+
+import io
+import json
+import time
+import dataclasses
+
+from linetface import rawnl, ipjson
+from linetface.hand import join_addr_info
+from tests.synth import host_dump
+
+
+def records(nlinks: int):
+    link_data, addr_data = host_dump(nlinks)
+    links = [rawnl.decode_link(link_data, start, end)
+             for kind, _f, _s, start, end in rawnl.iter_messages(link_data) if kind == rawnl.RTM_NEWLINK]
+    infos = {}
+    for kind, _f, _s, start, end in rawnl.iter_messages(addr_data):
+        if kind == rawnl.RTM_NEWADDR:
+            index, info = rawnl.decode_addr(addr_data, start, end)
+            infos.setdefault(index, []).append(info)
+    return [join_addr_info(li, infos.get(li.ifindex, ())) for li in links]
+
+
+def with_asdict(addrs) -> str:
+    # Enums, MAC and IP addresses are not JSON serializable, str() is the closest.
+    return json.dumps([dataclasses.asdict(a) for a in addrs], default=str)
+
+
+def with_ipjson(addrs) -> str:
+    out = io.StringIO()
+    ipjson.dump(addrs, out)
+    return out.getvalue()
+
+
+def main(nlinks: int = 10000):
+    addrs = records(nlinks)
+    print('{} interfaces, 3 addresses each'.format(nlinks))
+    for name, func in (('asdict', with_asdict), ('ipjson', with_ipjson)):
+        start = time.perf_counter()
+        text = func(addrs)
+        print('{:<7} {:7.3f}s   {:6.1f} MiB'.format(name, time.perf_counter() - start, len(text) / 2**20))
+
+
+if __name__ == '__main__':
+    main()
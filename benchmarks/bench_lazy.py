@@ -0,0 +1,44 @@
+'''
+Time and memory of a "name + flags only" scan of a synthetic 10k-link dump,
+with eager and lazy records::
+
+    python -m benchmarks.bench_lazy
+'''
+
+import time
+import tracemalloc
+
+from linetface import rawnl
+from tests.synth import host_dump
+
+
+def scan(link_data: bytes, lazy: bool):
+    records = []
+    for kind, _f, _s, start, end in rawnl.iter_messages(link_data):
+        if kind != rawnl.RTM_NEWLINK:
+            continue
+        li = rawnl.LazyIPLink(link_data, start, end) if lazy else rawnl.decode_link(link_data, start, end)
+        li.ifname, li.flags, li.operstate
+        records.append(li)
+    return records
+
+
+def main(nlinks: int = 10000):
+    link_data, _addr_data = host_dump(nlinks)
+    print('{} links, reading ifname, flags and operstate'.format(nlinks))
+    for name, lazy in (('eager', False), ('lazy', True)):
+        start = time.perf_counter()
+        scan(link_data, lazy)
+        elapsed = time.perf_counter() - start
+        # Measure memory in another run, tracemalloc slows down allocations.
+        tracemalloc.start()
+        records = scan(link_data, lazy)
+        kept, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del records
+        print('{:<6} {:7.3f}s   kept {:6.1f} MiB   peak {:6.1f} MiB'.format(
+            name, elapsed, kept / 2**20, peak / 2**20))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+'''
+Building the MAC addresses of a synthetic 10k-link dump, with the netaddr-based class
+and with the interned :py:class:`~linetface.core.LinuxMAC`::
+
+    python -m benchmarks.bench_mac
+'''
+
+import gc
+import time
+from typing import Optional, Union
+
+from netaddr import EUI
+from netaddr.strategy.eui48 import mac_unix_expanded
+
+from linetface.core import LinuxMAC
+from tests.synth import host_dump, parse
+
+
+class EUIMAC(EUI):
+    ''' The former LinuxMAC, a netaddr EUI per address '''
+    def __init__(self, addr: Union[str, EUI], version: Optional[int] = None):
+        return super().__init__(addr, dialect=mac_unix_expanded)
+
+
+def build(cls, values):
+    return [(cls(address), cls(broadcast)) for address, broadcast in values]
+
+
+def main(nlinks: int = 10000, dumps: int = 5):
+    link_data, _addr_data = host_dump(nlinks)
+    values = [(m.get_attr('IFLA_ADDRESS'), m.get_attr('IFLA_BROADCAST')) for m in parse(link_data)]
+    print('{} links, {} dumps, address and broadcast of each link'.format(nlinks, dumps))
+    for name, cls in (('EUI', EUIMAC), ('LinuxMAC', LinuxMAC)):
+        # Like timeit, don't let the collection of pyroute2's leftover messages blur the numbers
+        gc.collect()
+        gc.disable()
+        start = time.perf_counter()
+        for _i in range(dumps):
+            macs = build(cls, values)
+        elapsed = time.perf_counter() - start
+        gc.enable()
+        distinct = len(set(map(id, (m for pair in macs for m in pair))))
+        start = time.perf_counter()
+        for address, broadcast in macs:
+            str(address), str(broadcast)
+        formatting = time.perf_counter() - start
+        print('{:<9} build {:6.3f}s   str() {:6.3f}s   {:6} distinct objects'.format(
+            name, elapsed, formatting, distinct))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+'''
+Bytes which the kernel sends, and time, of :py:meth:`~linetface.Linetface.get_links` with each
+dump profile (see :py:mod:`linetface.profiles`)::
+
+    python -m benchmarks.bench_profiles
+    unshare -rn python -m benchmarks.bench_profiles
+
+It measures the links of the current network namespace. In a new one, which has only ``lo``,
+it creates 10k interfaces first. The virtual functions of SR-IOV cards, whose information is
+most of what ``full`` adds, only show on hosts which have such cards.
+'''
+
+import time
+
+from linetface import Linetface, get_links
+from linetface.metrics import Metrics
+from linetface.profiles import PROFILES
+
+from .bench_transport import COUNT, REPEAT, create_links
+
+
+def main():
+    if len(get_links()) == 1:
+        print('{} {} interfaces'.format(COUNT, create_links(COUNT)))
+    print('{:<14} {:<9} {:>8} {:>12} {:>12} {:>11}'.format(
+        'profile', 'decoder', 'links', 'bytes', 'bytes/link', 'time'))
+    for name in PROFILES:
+        for decoder in ('fast', 'pyroute2'):
+            metrics = Metrics()
+            with Linetface(decoder=decoder, profile=name, metrics=metrics) as session:
+                nlinks = len(session.get_links())
+                metrics.reset()
+                best = None
+                for _i in range(REPEAT):
+                    start = time.perf_counter()
+                    session.get_links()
+                    elapsed = time.perf_counter() - start
+                    best = elapsed if best is None else min(best, elapsed)
+            received = metrics.totals()[('get_links', decoder)].bytes / REPEAT
+            print('{:<14} {:<9} {:>8} {:>12.0f} {:>12.1f} {:>8.2f} ms'.format(
+                name, decoder, nlinks, received, received / nlinks, best * 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+'''
+Longest-prefix-match lookups in a full IPv4 BGP table of synthetic routes::
+
+    python -m benchmarks.bench_routes [nroutes]
+
+The table is built from raw RTM_NEWROUTE buffers, as they come from the kernel,
+one buffer at a time. Memory is measured with :py:mod:`tracemalloc`, in a second build.
+'''
+
+import gc
+import sys
+import time
+import random
+import tracemalloc
+from ipaddress import IPv4Address
+
+from linetface import rawnl
+from linetface.consts import AddressFamily
+from linetface.table import RouteTable
+from tests.synth import bgp_dump
+
+
+def decode(buffers):
+    for data in buffers:
+        for kind, _f, _s, start, end in rawnl.iter_messages(data):
+            if kind == rawnl.RTM_NEWROUTE:
+                yield rawnl.decode_route_fields(data, start, end)
+
+
+def main(count: int = 1000000, nlookups: int = 200000):
+    print('{} routes'.format(count))
+    buffers = list(bgp_dump(count))
+    start = time.perf_counter()
+    table = RouteTable.from_dump(decode(buffers))
+    built = time.perf_counter()
+    table.lookup_row(AddressFamily.INET, 0)
+    indexed = time.perf_counter()
+    print('decode and store {:.2f}s, index {:.2f}s'.format(built - start, indexed - built))
+    # Again, under tracemalloc, which slows it down a lot
+    del table
+    tracemalloc.start()
+    table = RouteTable.from_dump(decode(buffers))
+    table.lookup_row(AddressFamily.INET, 0)
+    kept, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print('memory kept {:.1f} MiB, peak {:.1f} MiB'.format(kept / 2**20, peak / 2**20))
+    rng = random.Random(0)
+    addresses = [rng.getrandbits(32) for _i in range(nlookups)]
+    objects = [IPv4Address(a) for a in addresses]
+    gc.disable()
+    for title, lookup, args in (('lookup_row(int)', lambda a: table.lookup_row(AddressFamily.INET, a), addresses),
+                                ('lookup(IPv4Address)', table.lookup, objects)):
+        start = time.perf_counter()
+        for a in args:
+            lookup(a)
+        elapsed = time.perf_counter() - start
+        print('{:<20} {:6.2f} us per lookup'.format(title, elapsed / nlookups * 1e6))
+    gc.enable()
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:2]))
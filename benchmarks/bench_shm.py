@@ -0,0 +1,116 @@
+'''
+Reads per second of the interfaces by forked workers, each dumping them with
+:py:meth:`~linetface.Linetface.get_addrs`, or reading the snapshots of one
+:py:class:`~linetface.shm.SnapshotPublisher`, which publishes 10 times a second::
+
+    python -m benchmarks.bench_shm
+    unshare -rn python -m benchmarks.bench_shm
+
+It measures the links of the current network namespace. In a new one, which has only ``lo``,
+it creates 1000 interfaces first, and adds or removes an address before each publication,
+so that each one is a new snapshot.
+'''
+
+import os
+import time
+import itertools
+import struct
+import subprocess
+import tempfile
+import threading
+from typing import Callable
+
+from linetface import Linetface, get_links
+from linetface.shm import SnapshotPublisher, SnapshotReader
+
+from .bench_transport import create_links
+
+
+SECONDS = 2.0
+WORKERS = (1, 8, 64)
+
+
+def run_workers(count: int, read: Callable[[], object]) -> float:
+    '''
+    Fork ``count`` workers which call ``read`` in a loop, all for the same ``SECONDS``
+    once they are all started. Return the total calls per second.
+    '''
+    pipes = []
+    go_read, go_write = os.pipe()
+    for _i in range(count):
+        read_end, write_end = os.pipe()
+        if os.fork() == 0:
+            status = 1
+            try:
+                os.close(read_end)
+                calls = 0
+                # The monotonic clock is the same in all processes
+                deadline = struct.unpack('d', os.read(go_read, 8))[0]
+                while time.monotonic() < deadline:
+                    read()
+                    calls += 1
+                os.write(write_end, str(calls).encode())
+                status = 0
+            finally:
+                os._exit(status)
+        os.close(write_end)
+        pipes.append(read_end)
+    os.write(go_write, struct.pack('d', time.monotonic() + SECONDS) * count)
+    os.close(go_read)
+    os.close(go_write)
+    total = 0
+    for read_end in pipes:
+        with os.fdopen(read_end) as f:
+            total += int(f.read())
+        os.wait()
+    return total / SECONDS
+
+
+def netlink_read():
+    # Each worker has its own session, like the workers of a pre-forked pool.
+    session = getattr(netlink_read, 'session', None)
+    if session is None:
+        session = netlink_read.session = Linetface(pool_size=1, decoder='fast')
+    return session.get_addrs()
+
+
+def main():
+    churn = len(get_links()) == 1
+    if churn:
+        print('{} {} interfaces'.format(1000, create_links(1000)))
+    path = os.path.join(tempfile.gettempdir() if not os.path.isdir('/dev/shm') else '/dev/shm',
+                        'linetface-bench-{}'.format(os.getpid()))
+    with SnapshotPublisher(path) as publisher:
+        publisher.publish()
+        reader = SnapshotReader(path)
+        print('{} links, snapshot of {} bytes'.format(len(reader.get_addrs()), sum(map(len, publisher.dump()))))
+        stop = threading.Event()
+
+        commands = itertools.cycle(('add', 'del'))
+
+        def publish():
+            while not stop.wait(0.1):
+                if churn:
+                    subprocess.run(('ip', 'addr', next(commands), '192.168.0.1/32', 'dev', 'bench0'), check=True)
+                publisher.publish()
+        print('{:>8} {:>16} {:>16}'.format('workers', 'get_addrs()/s', 'snapshot reads/s'))
+        for count in WORKERS:
+            dumped = run_workers(count, netlink_read)
+            thread = threading.Thread(target=publish)
+            thread.start()
+            try:
+                generation = publisher.generation
+                shared = run_workers(count, reader.get_addrs)
+                published = publisher.generation - generation
+            finally:
+                stop.set()
+                thread.join()
+                stop.clear()
+            print('{:>8} {:>16.0f} {:>16.0f}  ({} snapshots published meanwhile)'.format(
+                count, dumped, shared, published))
+        reader.close()
+    os.unlink(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,40 @@
+'''
+Time to diff two successive dumps, with :py:func:`linetface.snapshot.diff` and with
+the nested scan it replaces::
+
+    python -m benchmarks.bench_snapshot
+'''
+
+import time
+
+from linetface.snapshot import diff
+from tests.test_snapshot import get_addrs
+
+
+def nested_scan(old, new):
+    ''' What callers did before: look up each old link and address in the new tuple. '''
+    changed = []
+    for before in old:
+        after = next((r for r in new if r.ifindex == before.ifindex), None)
+        if after is not None and after != before:
+            changed.append(after)
+    return changed
+
+
+def timed(func, *args) -> float:
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    print('{:>7} {:>10} {:>12}'.format('links', 'diff', 'nested scan'))
+    for nlinks in (1000, 10000, 100000):
+        # Two dumps decoded separately, so that no record is shared between them
+        old, new = get_addrs(nlinks), get_addrs(nlinks)
+        scan = '{:11.3f}s'.format(timed(nested_scan, old, new)) if nlinks <= 10000 else '-'
+        print('{:>7} {:9.3f}s {:>12}'.format(nlinks, timed(diff, old, new), scan))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+'''
+Cost of one poll of the traffic counters of 5k interfaces: building the matrix from the dump,
+and the rates since the previous poll, with NumPy and with the plain :py:mod:`array` fallback::
+
+    python -m benchmarks.bench_stats [ninterfaces]
+'''
+
+import sys
+import timeit
+from unittest import mock
+
+from linetface import stats
+from linetface.stats import COUNTERS, LinkStats, RateTracker
+
+
+def dump(count: int, tick: int):
+    ''' Payloads of RTM_NEWSTATS, as :py:func:`linetface.rawnl.iter_link_stats` yields them. '''
+    size = 8 * (len(COUNTERS) + 1)
+    data = b''.join(((i + 1) * tick).to_bytes(8, 'little') * (len(COUNTERS) + 1) for i in range(count))
+    return [(i + 1, data, i * size, (i + 1) * size) for i in range(count)]
+
+
+def main(count: int = 5000, number: int = 50):
+    print('{} interfaces, ms per poll'.format(count))
+    dumps = [dump(count, tick) for tick in range(2)]
+    if stats.numpy is None:
+        print('NumPy is not installed')
+    for name, numpy in (('numpy', stats.numpy), ('array', None)):
+        if name == 'numpy' and numpy is None:
+            continue
+        with mock.patch.object(stats, 'numpy', numpy):
+            build = timeit.timeit(lambda: LinkStats.from_dump(dumps[1], 1.0), number=number) / number
+            samples = [LinkStats.from_dump(d, float(t)) for t, d in enumerate(dumps)]
+
+            def rates():
+                tracker = RateTracker()
+                tracker.update(samples[0])
+                tracker.update(samples[1])
+
+            rate = timeit.timeit(rates, number=number) / number
+        print('{:<6} matrix {:7.2f}  rates {:7.2f}'.format(name, build * 1000, rate * 1000))
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:2]))
@@ -0,0 +1,64 @@
+'''
+Peak memory and time of :py:meth:`~linetface.Linetface.get_addrs` and of the streaming
+:py:meth:`~linetface.Linetface.iter_addrs`, reading every record, or stopping at the first match::
+
+    python -m benchmarks.bench_stream
+
+The records are counted, not kept, like a caller which handles them one by one.
+The kernel is replaced by synthetic dumps (see :py:mod:`tests.synth`).
+'''
+
+import gc
+import time
+import tracemalloc
+from typing import Callable
+from unittest import mock
+
+from linetface import hand, rawnl
+from tests.synth import host_dump, split_families, FakeSocket
+
+
+def measure(func: Callable) -> tuple:
+    gc.collect()
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    gc.collect()
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start, peak
+
+
+def main():
+    print('{:>7}  {:<32} {:>9} {:>11}'.format('links', 'method', 'time', 'peak'))
+    for nlinks in (10000, 100000):
+        link_data, addr_data = host_dump(nlinks)
+        dumps = {rawnl.RTM_GETLINK: link_data, rawnl.RTM_GETADDR: addr_data}
+        for family, data in split_families(addr_data).items():
+            dumps[(rawnl.RTM_GETADDR, family)] = data
+        target = 'veth{}'.format(nlinks // 2)
+        with mock.patch.object(hand, '_IPRoute', side_effect=lambda: FakeSocket(dumps)), \
+                hand.Linetface(decoder='fast') as session:
+            # Open the sockets before measuring
+            list(session.iter_addrs())
+            cases = (
+                ('get_addrs(), all', lambda: sum(1 for _r in session.get_addrs())),
+                ('iter_addrs(), all', lambda: sum(1 for _r in session.iter_addrs())),
+                ('iter_addrs(), all, unordered', lambda: sum(1 for _r in unordered(session))),
+                ('get_addrs(), first match', lambda: next(r for r in session.get_addrs() if r.ifname == target)),
+                ('iter_addrs(), first match', lambda: next(r for r in session.iter_addrs() if r.ifname == target)),
+            )
+            for name, func in cases:
+                seconds, peak = measure(func)
+                print('{:>7}  {:<32} {:8.3f}s {:7.1f} MiB'.format(nlinks, name, seconds, peak / 2**20))
+
+
+def unordered(session: hand.Linetface):
+    ''' What kernels older than 6.8 get: the addresses are dumped first. '''
+    with mock.patch.object(hand, 'ORDERED_DUMPS', False):
+        yield from session.iter_addrs()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+'''
+Memory kept by 100k links and their addresses, as tuples of records and as columnar tables::
+
+    python -m benchmarks.bench_table
+'''
+
+import time
+import tracemalloc
+
+from linetface import rawnl
+from linetface.table import LinkTable, AddrTable
+from tests.synth import host_dump
+
+
+def decode(link_data: bytes, addr_data: bytes):
+    links = tuple(rawnl.decode_link(link_data, start, end)
+                  for kind, _f, _s, start, end in rawnl.iter_messages(link_data) if kind == rawnl.RTM_NEWLINK)
+    addrs = tuple(rawnl.decode_addr(addr_data, start, end)
+                  for kind, _f, _s, start, end in rawnl.iter_messages(addr_data) if kind == rawnl.RTM_NEWADDR)
+    return links, addrs
+
+
+def measure(build):
+    tracemalloc.start()
+    result = build()
+    kept, _peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, kept
+
+
+def main(nlinks: int = 100000):
+    link_data, addr_data = host_dump(nlinks)
+    print('{} links, {} addresses'.format(nlinks, 3 * nlinks - 2))
+    (links, addrs), kept = measure(lambda: decode(link_data, addr_data))
+    print('{:<8} kept {:7.1f} MiB'.format('records', kept / 2**20))
+    tables, kept = measure(lambda: (LinkTable.from_links(links), AddrTable.from_addrs(addrs)))
+    print('{:<8} kept {:7.1f} MiB'.format('tables', kept / 2**20))
+    link_table = tables[0]
+    start = time.perf_counter()
+    for li in link_table:
+        pass
+    print('reading all rows back from the table: {:.3f}s'.format(time.perf_counter() - start))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+'''
+System calls and time of dumps of 10k interfaces, with the default transport, a bigger
+receive buffer and batched reads, then how often dumps are interrupted while an address changes::
+
+    unshare -rn python -m benchmarks.bench_transport
+
+It creates the interfaces itself, so it only runs in a new network namespace, which has only ``lo``.
+Dummy interfaces are used if the kernel has them, else ifb ones.
+'''
+
+import sys
+import time
+import subprocess
+import threading
+from typing import Callable
+
+from linetface import Linetface, get_links
+from linetface.metrics import Metrics
+from linetface.rawnl import DumpInterrupted
+
+
+COUNT = 10000
+REPEAT = 5
+
+
+def create_links(count: int):
+    for kind in ('dummy', 'ifb'):
+        commands = ''.join('link add bench{} type {}\n'.format(i, kind) for i in range(count))
+        commands += ''.join('addr add 10.{}.{}.1/24 dev bench{}\n'.format(i >> 8, i & 0xFF, i) for i in range(count))
+        if subprocess.run(('ip', '-b', '-'), input=commands.encode(), stderr=subprocess.DEVNULL).returncode == 0:
+            return kind
+        subprocess.run(('ip', '-b', '-'), input=''.join('link del bench{}\n'.format(i) for i in range(count)).encode(),
+                       stderr=subprocess.DEVNULL)
+    sys.exit('Cannot create interfaces')
+
+
+def measure(name: str, session: Linetface, query: Callable):
+    metrics = session.metrics = Metrics()
+    query(session)
+    metrics.reset()
+    best = None
+    for _i in range(REPEAT):
+        start = time.perf_counter()
+        query(session)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    totals = next(iter(metrics.totals().values()))
+    print('{:<40} {:>8.1f} {:>10.1f} {:>9.2f} ms {:>8.2f} ms'.format(
+        name, totals.recvs / REPEAT, totals.messages / REPEAT, best * 1000, totals.wall['recv'] / REPEAT * 1000))
+
+
+def churn(stop: threading.Event):
+    ''' Add or remove an address, twice a second. '''
+    command = 'add'
+    while not stop.wait(0.5):
+        subprocess.run(('ip', 'addr', command, '192.168.0.1/32', 'dev', 'bench0'))
+        command = 'del' if command == 'add' else 'add'
+
+
+def main():
+    if len(get_links()) != 1:
+        sys.exit('Run it in a new network namespace: unshare -rn python -m benchmarks.bench_transport')
+    kind = create_links(COUNT)
+    print('{} {} interfaces, best of {}'.format(COUNT, kind, REPEAT))
+    print('{:<40} {:>8} {:>10} {:>12} {:>11}'.format('', 'recvs', 'messages', 'time', 'recv time'))
+    configs = (
+        ('pyroute2', {'decoder': 'pyroute2'}),
+        ('fast', {'decoder': 'fast'}),
+        ('fast, rcvbuf 4 MiB', {'decoder': 'fast', 'rcvbuf': 4 << 20}),
+        ('fast, recv_batch 16', {'decoder': 'fast', 'recv_batch': 16}),
+        ('fast, recv_batch 64, rcvbuf 4 MiB', {'decoder': 'fast', 'recv_batch': 64, 'rcvbuf': 4 << 20}),
+    )
+    for query_name, query in (('get_links', lambda s: s.get_links()), ('get_addrs', lambda s: s.get_addrs())):
+        for name, options in configs:
+            with Linetface(**options) as session:
+                measure('{} {}'.format(query_name, name), session, query)
+
+    stop = threading.Event()
+    thread = threading.Thread(target=churn, args=(stop,))
+    thread.start()
+    try:
+        failed = 0
+        with Linetface(decoder='fast') as session:
+            for _i in range(20):
+                try:
+                    session.get_addrs()
+                except DumpInterrupted:
+                    failed += 1
+            print('While an address is added or removed every 0.5s: {} dumps interrupted in 20 get_addrs(), '
+                  '{} of them still interrupted after {} retries'.format(
+                      session.interrupted_dumps, failed, session.dump_retries))
+    finally:
+        stop.set()
+        thread.join()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,170 @@
+'''
+Time and peak memory of each stage of the decode path, on the recorded dumps of ``tests/data``
+and on synthetic dumps of 10 to 100k links (each with one IPv4 and two IPv6 addresses)::
+
+    python -m benchmarks.suite [--sizes 10,1000,10000,100000] [--save results.json]
+                               [--compare baseline.json [--tolerance 0.25]]
+
+The kernel is replaced by the dumps (see :py:mod:`tests.synth`), so it needs no privileges
+and no real interfaces. With ``--compare``, the stages which got slower or bigger than the baseline
+by more than the tolerance are reported, and the exit status is 1. Only compare results
+taken on the same machine, while it is otherwise idle.
+'''
+
+import gc
+import sys
+import json
+import time
+import argparse
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+from unittest import mock
+
+from pyroute2.netlink.rtnl.marshal import MarshalRtnl
+
+from linetface import hand, rawnl, ipjson
+from tests.synth import host_dump, FakeIPRoute, FakeSocket, NLMSG_DONE
+
+
+DATA = Path(__file__).parent.parent / 'tests' / 'data'
+# pyroute2 takes minutes and gigabytes beyond that
+PYROUTE2_LIMIT = 10000
+# Differences below these are noise
+MIN_SECONDS = 0.005
+MIN_BYTES = 1 << 16
+
+Dump = Tuple[bytes, bytes]
+
+
+def parse(data: bytes) -> list:
+    return [m for m in MarshalRtnl().parse(data) if m['header']['type'] != NLMSG_DONE]
+
+
+def session_get_addrs(decoder: str, link_data: bytes, addr_data: bytes) -> Callable:
+    if decoder == 'pyroute2':
+        fake = FakeIPRoute(link_data, addr_data)
+    else:
+        fake = FakeSocket({rawnl.RTM_GETLINK: link_data, rawnl.RTM_GETADDR: addr_data})
+
+    def run():
+        with mock.patch.object(hand, '_IPRoute', return_value=fake), hand.Linetface(decoder=decoder) as session:
+            return session.get_addrs()
+    return run
+
+
+def stages(dump: Dump) -> Dict[str, Callable]:
+    ''' The stages, ready to run on one dump. Their inputs are prepared here, outside of the measures. '''
+    link_data, addr_data = dump
+    nlinks = sum(1 for m in rawnl.iter_messages(link_data) if m[0] == rawnl.RTM_NEWLINK)
+    found = {
+        'rawnl.decode_link': lambda: [rawnl.decode_link(link_data, s, e)
+                                      for k, _f, _q, s, e in rawnl.iter_messages(link_data) if k == rawnl.RTM_NEWLINK],
+        'rawnl.decode_addr': lambda: [rawnl.decode_addr(addr_data, s, e)
+                                      for k, _f, _q, s, e in rawnl.iter_messages(addr_data) if k == rawnl.RTM_NEWADDR],
+        'get_addrs[fast]': session_get_addrs('fast', link_data, addr_data),
+    }
+    if nlinks <= PYROUTE2_LIMIT:
+        link_msgs, addr_msgs = parse(link_data), parse(addr_data)
+        found.update({
+            'pyroute2 parse': lambda: (parse(link_data), parse(addr_data)),
+            'shinify_link': lambda: [hand.shinify_link(m) for m in link_msgs],
+            'shinify_addr_info': lambda: [hand.shinify_addr_info(m) for m in addr_msgs],
+            'get_addrs[pyroute2]': session_get_addrs('pyroute2', link_data, addr_data),
+        })
+    records = found['get_addrs[fast]']()
+    found['ipjson.dumps'] = lambda: ipjson.dumps(records)
+    return found
+
+
+def best_time(func: Callable, repeat: int) -> float:
+    '''
+    Best time of ``repeat`` runs, each one being the mean of enough calls to last 0.2s.
+    The garbage collector is stopped while measuring: its passes depend on what ran before.
+    '''
+    start = time.perf_counter()
+    func()
+    calls = max(1, int(0.2 / max(time.perf_counter() - start, 1e-6)))
+    times = []
+    gc.collect()
+    gc.disable()
+    try:
+        for _i in range(repeat):
+            start = time.perf_counter()
+            for _j in range(calls):
+                func()
+            times.append((time.perf_counter() - start) / calls)
+    finally:
+        gc.enable()
+    return min(times)
+
+
+def peak_memory(func: Callable) -> int:
+    ''' Highest memory allocated while running ``func``, over what was allocated before. '''
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak - before
+
+
+def datasets(sizes: List[int]) -> Dict[str, Dump]:
+    found = {'recorded': ((DATA / 'host_links.bin').read_bytes(), (DATA / 'host_addrs.bin').read_bytes())}
+    for size in sizes:
+        found['synthetic-{}'.format(size)] = host_dump(size)
+    return found
+
+
+def run(sizes: List[int], repeat: int) -> Dict[str, Dict[str, Dict[str, float]]]:
+    results = {}
+    print('{:<18} {:<20} {:>11} {:>12}'.format('dataset', 'stage', 'time', 'peak memory'))
+    for name, dump in datasets(sizes).items():
+        results[name] = {}
+        for stage, func in stages(dump).items():
+            seconds = best_time(func, repeat)
+            peak = peak_memory(func)
+            results[name][stage] = {'seconds': seconds, 'peak_bytes': peak}
+            print('{:<18} {:<20} {:9.4f}s {:8.2f} MiB'.format(name, stage, seconds, peak / 2**20))
+    return results
+
+
+def regressions(results: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    found = []
+    for name, dataset in results.items():
+        for stage, now in dataset.items():
+            before = baseline.get(name, {}).get(stage)
+            if before is None:
+                continue
+            for key, minimum in (('seconds', MIN_SECONDS), ('peak_bytes', MIN_BYTES)):
+                if now[key] > before[key] * (1 + tolerance) and now[key] - before[key] > minimum:
+                    found.append('{} {}: {} {:.4g} -> {:.4g} (+{:.0%})'.format(
+                        name, stage, key, before[key], now[key], now[key] / before[key] - 1))
+    return found
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--sizes', default='10,1000,10000,100000',
+                        help='Numbers of links of the synthetic dumps, comma-separated')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per stage, the best time is kept')
+    parser.add_argument('--save', type=Path, help='Write the results to this JSON file')
+    parser.add_argument('--compare', type=Path, help='Compare with the results saved in this JSON file')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed slowdown or growth, as a ratio')
+    args = parser.parse_args(argv)
+    results = run([int(s) for s in args.sizes.split(',') if s], args.repeat)
+    if args.save:
+        args.save.write_text(json.dumps(results, indent=2))
+    if args.compare:
+        found = regressions(results, json.loads(args.compare.read_text()), args.tolerance)
+        for line in found:
+            print('REGRESSION', line)
+        if found:
+            return 1
+        print('No regression against {}'.format(args.compare))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,8 +1,44 @@
-from pathlib import Path
+'''
+The heavy dependencies (pyroute2, netaddr) are only imported when they are first needed,
+so that ``import linetface`` or ``from linetface import consts`` stays cheap.
+'''
 
-from single_version import get_version
+# Same as typing.TYPE_CHECKING, without importing typing
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from .hand import Linetface, get_links, get_addrs, iter_links, iter_addrs, get_link_stats, \
+        get_routes, get_neighbors, iter_neighbors     # NOQA: F401
 
-from .hand import get_links, get_addrs     # NOQA: F401
 
+# The names that this package re-exports from its submodules
+_LAZY_NAMES = {
+    'Linetface': 'hand',
+    'get_links': 'hand',
+    'get_addrs': 'hand',
+    'iter_links': 'hand',
+    'iter_addrs': 'hand',
+    'get_link_stats': 'hand',
+    'get_routes': 'hand',
+    'get_neighbors': 'hand',
+    'iter_neighbors': 'hand',
+}
 
-__version__ = get_version('linetface', Path(__file__).parent.parent)
+
+def __getattr__(name: str):
+    if name == '__version__':
+        # single_version looks for pyproject.toml on disk, only do it once.
+        from pathlib import Path
+        from single_version import get_version
+        value = get_version('linetface', Path(__file__).parent.parent)
+    elif name in _LAZY_NAMES:
+        from importlib import import_module
+        value = getattr(import_module('.' + _LAZY_NAMES[name], __name__), name)
+    else:
+        raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
+    # Cache it, next lookups won't come here.
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + list(_LAZY_NAMES) + ['__version__'])
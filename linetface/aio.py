@@ -0,0 +1,213 @@
+'''
+asyncio interface.
+
+The netlink sockets here are non-blocking and are waited on by the event loop,
+so no query blocks the loop and no thread is needed to watch the interfaces.
+
+.. code-block:: python
+
+    from linetface import aio
+
+    async def main():
+        links = await aio.get_links()
+        async for event in aio.watch():
+            print(event)
+'''
+
+import asyncio
+import itertools
+import socket
+from typing import Tuple, Optional, AsyncIterator, Iterator, Type
+
+from pyroute2.netlink import NLM_F_REQUEST, NLM_F_DUMP, NLMSG_DONE
+from pyroute2.netlink.rtnl import RTM_GETLINK, RTM_GETADDR, \
+    RTMGRP_LINK, RTMGRP_IPV4_IFADDR, RTMGRP_IPV6_IFADDR
+from pyroute2.netlink.rtnl.ifinfmsg import ifinfmsg
+from pyroute2.netlink.rtnl.ifaddrmsg import ifaddrmsg
+from pyroute2.netlink.rtnl.marshal import MarshalRtnl
+
+from . import rawnl
+from .core import IPLink, IPAddr, ChangeEvent
+from .hand import shinify_link, shinify_addr_info, shinify_event, join_addr_info, check_dump
+
+
+RCVBUF = 1 << 16
+WATCH_GROUPS = RTMGRP_LINK | RTMGRP_IPV4_IFADDR | RTMGRP_IPV6_IFADDR
+
+_sequence = itertools.count(1)
+
+
+def open_socket(groups: int = 0) -> socket.socket:
+    ''' :meta private: '''
+    sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW | socket.SOCK_CLOEXEC, socket.NETLINK_ROUTE)
+    sock.setblocking(False)
+    sock.bind((0, groups))
+    return sock
+
+
+def dump_request(msg_class: Type, msg_type: int, seq: int) -> bytes:
+    ''' :meta private: '''
+    msg = msg_class()
+    msg['header']['type'] = msg_type
+    msg['header']['flags'] = NLM_F_REQUEST | NLM_F_DUMP
+    msg['header']['sequence_number'] = seq
+    msg.encode()
+    return msg.data
+
+
+def parse_reply(marshal: MarshalRtnl, data: bytes, seq: int) -> Iterator:
+    '''
+    Yield the messages of a dump reply, ``None`` at the end of dump.
+
+    :meta private:
+    '''
+    for msg in marshal.parse(data):
+        header = msg['header']
+        if header['sequence_number'] != seq:
+            continue
+        if header.get('error') is not None:
+            raise header['error']
+        if header['type'] == NLMSG_DONE:
+            yield None
+            return
+        yield msg
+
+
+class AsyncLinetface:
+    '''
+    asyncio counterpart of :py:class:`linetface.Linetface`.
+
+    It owns one non-blocking netlink socket, the queries on it take turn.
+    As in the synchronous session, a dump which the kernel flags as interrupted is done again,
+    up to ``dump_retries`` times, then :py:class:`~linetface.rawnl.DumpInterrupted` is raised.
+
+    .. code-block:: python
+
+        async with AsyncLinetface() as lf:
+            addrs = await lf.get_addrs()
+    '''
+    def __init__(self, dump_retries: int = 3):
+        self.dump_retries = dump_retries
+        #: Number of dumps which the kernel reported as interrupted
+        self.interrupted_dumps = 0
+        self._sock: Optional[socket.socket] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = asyncio.Lock()
+
+    async def __aenter__(self) -> 'AsyncLinetface':
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+    async def _dump(self, msg_class: Type, msg_type: int) -> list:
+        attempt = 0
+        while True:
+            try:
+                return check_dump(await self._dump_once(msg_class, msg_type))
+            except rawnl.DumpInterrupted:
+                self.interrupted_dumps += 1
+                if attempt >= self.dump_retries:
+                    raise
+                attempt += 1
+
+    async def _dump_once(self, msg_class: Type, msg_type: int) -> list:
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # The lock belongs to the loop which used it first, like the session of
+            # default_session() after each asyncio.run(). Sockets don't belong to any.
+            self._loop = loop
+            self._lock = asyncio.Lock()
+        seq = next(_sequence)
+        marshal = MarshalRtnl()
+        messages = []
+        async with self._lock:
+            if self._sock is None:
+                self._sock = open_socket()
+            try:
+                await loop.sock_sendall(self._sock, dump_request(msg_class, msg_type, seq))
+                while True:
+                    data = await loop.sock_recv(self._sock, RCVBUF)
+                    for msg in parse_reply(marshal, data, seq):
+                        if msg is None:
+                            return messages
+                        messages.append(msg)
+                    # The kernel fills the dump replies as fast as we read them, so the receive
+                    # above rarely has to wait. Let other tasks run between batches.
+                    await asyncio.sleep(0)
+            except BaseException:
+                # Cancelled or failed in the middle of the dump: the rest of it is still queued
+                # on the socket. Drop the socket, the next query opens a new one.
+                self.close()
+                raise
+
+    async def get_links(self) -> Tuple[IPLink, ...]:
+        '''
+        Return result same as ``ip -j -d link``.
+        '''
+        return tuple(shinify_link(raw) for raw in await self._dump(ifinfmsg, RTM_GETLINK))
+
+    async def get_addrs(self) -> Tuple[IPAddr, ...]:
+        '''
+        Return result same as ``ip -j -d addr``.
+        '''
+        links = await self.get_links()
+        ainfos = {}
+        for raw in await self._dump(ifaddrmsg, RTM_GETADDR):
+            ainfos.setdefault(raw['index'], []).append(shinify_addr_info(raw))
+        return tuple(join_addr_info(li, ainfos.get(li.ifindex, ())) for li in links)
+
+
+_default_session: Optional[AsyncLinetface] = None
+
+
+def default_session() -> AsyncLinetface:
+    '''
+    Return the :py:class:`AsyncLinetface` session used by the module-level functions,
+    creating it on first use.
+    '''
+    global _default_session
+    if _default_session is None:
+        _default_session = AsyncLinetface()
+    return _default_session
+
+
+async def get_links() -> Tuple[IPLink, ...]:
+    '''
+    Return result same as ``ip -j -d link``.
+    '''
+    return await default_session().get_links()
+
+
+async def get_addrs() -> Tuple[IPAddr, ...]:
+    '''
+    Return result same as ``ip -j -d addr``.
+    '''
+    return await default_session().get_addrs()
+
+
+async def watch(groups: int = WATCH_GROUPS) -> AsyncIterator[ChangeEvent]:
+    '''
+    Yield the link and address changes notified by the kernel, until the iteration is stopped.
+
+    If the kernel drops notifications because the socket buffer is full, :py:class:`OSError`
+    with ``ENOBUFS`` is raised: the caller's view of the interfaces is stale and should be
+    rebuilt, for example with :py:func:`get_addrs`.
+    '''
+    loop = asyncio.get_running_loop()
+    marshal = MarshalRtnl()
+    sock = open_socket(groups)
+    try:
+        while True:
+            data = await loop.sock_recv(sock, RCVBUF)
+            for msg in marshal.parse(data):
+                event = shinify_event(msg)
+                if event is not None:
+                    yield event
+    finally:
+        sock.close()
@@ -0,0 +1,172 @@
+import errno
+import select
+import socket
+import threading
+from typing import Dict, Tuple, Optional, List
+
+from pyroute2 import IPRoute as _IPRoute
+from pyroute2.netlink.rtnl import RTMGRP_LINK, RTMGRP_IPV4_IFADDR, RTMGRP_IPV6_IFADDR
+
+from .core import IPLink, IPAddr, AddrInfo, ChangeEvent
+from .hand import Linetface, shinify_event, join_addr_info
+
+
+AddrKey = Tuple[int, str, int]
+
+
+def addr_key(info: AddrInfo) -> AddrKey:
+    return (int(info.family), str(info.local), info.prefixlen)
+
+
+class InterfaceCache:
+    '''
+    Copy of the kernel's link and address tables, kept current by rtnetlink notifications.
+
+    On creation, it subscribes to the link and IPv4/IPv6 address multicast groups, then dumps
+    the tables once. After that, call :py:meth:`poll` (for example, when :py:meth:`fileno`
+    becomes readable) to apply the pending notifications. Reads don't touch the kernel.
+
+    If the kernel drops notifications because the socket buffer is full (``ENOBUFS``),
+    the cache is rebuilt from a fresh dump.
+
+    .. code-block:: python
+
+        with InterfaceCache() as cache:
+            while True:
+                for event in cache.poll(timeout=1):
+                    print(event)
+                eth0 = cache.link_by_name('eth0')
+    '''
+    groups = RTMGRP_LINK | RTMGRP_IPV4_IFADDR | RTMGRP_IPV6_IFADDR
+
+    def __init__(self, session: Optional[Linetface] = None, rcvbuf: int = 1 << 20):
+        self._own_session = session is None
+        self.session = session if session is not None else Linetface(pool_size=1)
+        self._lock = threading.RLock()
+        self._links: Dict[int, IPLink] = {}
+        self._names: Dict[str, int] = {}
+        self._addrs: Dict[int, Dict[AddrKey, AddrInfo]] = {}
+        self._joined: Dict[int, IPAddr] = {}
+        #: Number of times the cache was rebuilt after losing notifications
+        self.resyncs = 0
+        # Subscribe before dumping, so that no change falls between the dump and the first poll.
+        # The monitor listens in the namespace of the session, like its sockets.
+        if self.session.netns is None:
+            self._monitor = _IPRoute()
+        else:
+            from .netns import call_in
+            self._monitor = call_in(self.session.netns, _IPRoute)
+        self._monitor.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, rcvbuf)
+        self._monitor.bind(groups=self.groups)
+        self.resync()
+
+    def __enter__(self) -> 'InterfaceCache':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self._monitor.close()
+        if self._own_session:
+            self.session.close()
+
+    def fileno(self) -> int:
+        return self._monitor.fileno()
+
+    def resync(self):
+        ''' Rebuild the cache from a full dump of links and addresses. '''
+        links = {li.ifindex: li for li in self.session.get_links()}
+        addrs = {a.ifindex: {addr_key(info): info for info in a.addr_info} for a in self.session.get_addrs()}
+        with self._lock:
+            self._links = links
+            self._names = {li.ifname: i for i, li in links.items()}
+            self._addrs = addrs
+            self._joined = {}
+
+    def apply(self, msg) -> Optional[ChangeEvent]:
+        '''
+        Apply one rtnetlink notification (a pyroute2 message) to the cache.
+
+        :return: The parsed change, or ``None`` if the message is not about links or addresses.
+        '''
+        change = shinify_event(msg)
+        if change is None:
+            return None
+        ifindex = change.ifindex
+        with self._lock:
+            if change.link is not None:
+                link = change.link
+                old = self._links.get(ifindex)
+                if old is not None:
+                    self._names.pop(old.ifname, None)
+                if change.event == 'RTM_NEWLINK':
+                    self._links[ifindex] = link
+                    self._names[link.ifname] = ifindex
+                else:
+                    self._links.pop(ifindex, None)
+                    self._addrs.pop(ifindex, None)
+            else:
+                info = change.addr
+                table = self._addrs.setdefault(ifindex, {})
+                if change.event == 'RTM_NEWADDR':
+                    table[addr_key(info)] = info
+                else:
+                    table.pop(addr_key(info), None)
+            self._joined.pop(ifindex, None)
+        return change
+
+    def poll(self, timeout: Optional[float] = 0) -> List[ChangeEvent]:
+        '''
+        Apply the notifications received so far.
+
+        :param timeout: Seconds to wait for a notification if there is none yet.
+                        ``None`` to block until one arrives.
+        :return: The changes which were applied. It is empty after a resync.
+        '''
+        if timeout is not None:
+            readable, _w, _x = select.select((self._monitor,), (), (), timeout)
+            if not readable:
+                return []
+        try:
+            messages = self._monitor.get()
+        except OSError as e:
+            if e.errno != errno.ENOBUFS:
+                raise
+            self.resyncs += 1
+            self.resync()
+            return []
+        events = (self.apply(m) for m in messages)
+        return [e for e in events if e is not None]
+
+    def link(self, ifindex: int) -> Optional[IPLink]:
+        return self._links.get(ifindex)
+
+    def link_by_name(self, ifname: str) -> Optional[IPLink]:
+        with self._lock:
+            ifindex = self._names.get(ifname)
+            return self._links.get(ifindex) if ifindex is not None else None
+
+    def addr(self, ifindex: int) -> Optional[IPAddr]:
+        '''
+        Return the ``ip -j -d addr`` record of an interface.
+        It is built on first read after a change, then reused.
+        '''
+        with self._lock:
+            joined = self._joined.get(ifindex)
+            if joined is not None:
+                return joined
+            link = self._links.get(ifindex)
+            if link is None:
+                return None
+            joined = join_addr_info(link, self._addrs.get(ifindex, {}).values())
+            self._joined[ifindex] = joined
+            return joined
+
+    def get_links(self) -> Tuple[IPLink, ...]:
+        with self._lock:
+            return tuple(self._links.values())
+
+    def get_addrs(self) -> Tuple[IPAddr, ...]:
+        with self._lock:
+            return tuple(self.addr(i) for i in self._links)
@@ -0,0 +1,154 @@
+'''
+``linetface`` command, a stand-in for ``ip -j -d link`` and ``ip -j -d addr`` where iproute2
+is not installed (BusyBox ``ip`` cannot output JSON)::
+
+    linetface [-j] [-d] [-4 | -6] {link | addr} [show] [[dev] NAME]
+
+It talks to the kernel with :py:mod:`linetface.rawnl`, without loading pyroute2,
+and writes each interface as soon as it is decoded. Like ``ip``, it asks the kernel
+to leave out the statistics, and only decodes the fields which are shown.
+'''
+
+import os
+import sys
+from collections import defaultdict
+from typing import Iterator, Optional, Sequence, NamedTuple, Union
+
+from . import rawnl, ipjson
+from .core import IPLink, IPAddr
+from .profiles import DumpProfile
+
+
+USAGE = 'Usage: linetface [-j] [-d] [-4 | -6] {link | addr} [show] [[dev] NAME]'
+
+
+class UsageError(Exception):
+    pass
+
+
+class DeviceNotFound(Exception):
+    pass
+
+
+class Options(NamedTuple):
+    obj: str
+    json: bool = False
+    details: bool = False
+    family: Optional[int] = None
+    dev: Optional[str] = None
+
+    @property
+    def link_layer(self) -> bool:
+        return self.details or self.family is None
+
+    def profile(self) -> DumpProfile:
+        ''' What to dump and decode of the links, for what is shown. '''
+        return DumpProfile('cli', rawnl.RTEXT_FILTER_SKIP_STATS,
+                           ipjson.shown_fields(self.obj == 'addr', self.details, self.link_layer))
+
+
+def matches(arg: str, word: str) -> bool:
+    ''' Like iproute2, accept any prefix of a keyword: "a", "ad", "addr"... '''
+    return bool(arg) and word.startswith(arg)
+
+
+def parse_args(argv: Sequence[str]) -> Options:
+    args = list(argv)
+    json = details = False
+    family = None
+    while args and args[0].startswith('-'):
+        opt = args.pop(0).lstrip('-')
+        if matches(opt, 'json'):
+            json = True
+        elif matches(opt, 'details'):
+            details = True
+        elif opt == '4':
+            family = rawnl.AF_INET
+        elif opt == '6':
+            family = rawnl.AF_INET6
+        elif matches(opt, 'help'):
+            raise UsageError()
+        else:
+            raise UsageError('Option "-{}" is unknown.'.format(opt))
+    if not args:
+        raise UsageError()
+    word = args.pop(0)
+    if matches(word, 'link'):
+        obj = 'link'
+    elif matches(word, 'address'):
+        obj = 'addr'
+    else:
+        raise UsageError('Object "{}" is unknown.'.format(word))
+    if args and (matches(args[0], 'show') or matches(args[0], 'list')):
+        args.pop(0)
+    if args and args[0] == 'dev':
+        args.pop(0)
+        if not args:
+            raise UsageError('Missing device name after "dev".')
+    dev = args.pop(0) if args else None
+    if args:
+        raise UsageError('Either "dev" is duplicate, or "{}" is a garbage.'.format(args[0]))
+    return Options(obj, json, details, family, dev)
+
+
+def query(sock, options: Options) -> Iterator[Union[IPLink, IPAddr]]:
+    '''
+    Return an iterator of the links, or of the links joined with their addresses,
+    which decodes them while it is consumed.
+
+    :raise DeviceNotFound: If ``options.dev`` doesn't exist. This is checked right away.
+    '''
+    profile = options.profile()
+    links = None
+    if options.dev is not None:
+        links = tuple(rawnl.iter_links(sock, ifname=options.dev, ext_mask=profile.ext_mask,
+                                       fields=profile.link_fields))
+        if not links:
+            raise DeviceNotFound(options.dev)
+    if options.obj == 'link':
+        return iter(links) if links is not None else \
+            rawnl.iter_links(sock, ext_mask=profile.ext_mask, fields=profile.link_fields)
+    return join_addrs(sock, options.family, links, profile)
+
+
+def join_addrs(sock, family: Optional[int], links: Optional[Sequence[IPLink]],
+               profile: DumpProfile) -> Iterator[IPAddr]:
+    # The address dump is read first, then the links are joined as they are decoded.
+    addr_info = defaultdict(list)
+    ifindex = links[0].ifindex if links is not None else None
+    for index, info in rawnl.iter_addrs(sock, family, ifindex):
+        addr_info[index].append(info)
+    if links is None:
+        links = rawnl.iter_links(sock, ext_mask=profile.ext_mask, fields=profile.link_fields)
+    for link in links:
+        infos = addr_info.get(link.ifindex, ())
+        # "ip -4 addr" skips the interfaces which have no address of that family
+        if family is not None and not infos:
+            continue
+        yield link.join(infos)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    try:
+        options = parse_args(sys.argv[1:] if argv is None else argv)
+        if not options.json:
+            raise UsageError('Only the JSON output is supported, please add -j.')
+    except UsageError as e:
+        if e.args:
+            print(e.args[0], file=sys.stderr)
+        print(USAGE, file=sys.stderr)
+        return 2
+    sock = rawnl.open_socket()
+    try:
+        ipjson.dump(query(sock, options), sys.stdout, details=options.details, link_layer=options.link_layer)
+        sys.stdout.flush()
+    except DeviceNotFound as e:
+        print('Device "{}" does not exist.'.format(e.args[0]), file=sys.stderr)
+        return 1
+    except BrokenPipeError:
+        # The reader went away, like with "| head". Don't let Python complain at exit.
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 1
+    finally:
+        sock.close()
+    return 0
@@ -1,7 +1,7 @@
 # Ref: https://www.kernel.org/doc/Documentation/networking/operstates.txt
 
-import enum
 from enum import Enum, IntFlag
+from typing import Callable, Tuple
 
 
 # Ref: https://git.kernel.org/pub/scm/network/iproute2/iproute2.git/tree/ip/ipaddress.c
@@ -65,20 +65,7 @@ class LinkFlag(IntFlag):
 
         For example: 4099 -> [NO_CARRIER, BROADCAST, MULTICAST, UP]
         '''
-        cls = self.__class__
-        members, uncoverd = enum._decompose(cls, self._value_)
-        if len(members) == 1:
-            yield from members
-            return
-        # To be compliant with output of "ip" tool, we don't return "RUNNING",
-        # and return NO_CARRIER in case RUNNING is not set.
-        if cls.RUNNING not in members:
-            members.insert(0, cls.NO_CARRIER)
-        try:
-            members.remove(cls.RUNNING)
-        except ValueError:
-            pass
-        yield from members
+        yield from decode_link_flags(self._value_)
 
 
 class _IntDispEnum(int, Enum):
@@ -209,6 +196,69 @@ class RTScope(_IntDispEnum):
     SITE = (200, 'site')
 
 
+# Ref: include/uapi/linux/rtnetlink.h, and iproute2's etc/iproute2/rt_protos
+class RouteType(_IntDispEnum):
+    UNSPEC = (0, 'none')
+    UNICAST = (1, 'unicast')
+    LOCAL = (2, 'local')
+    BROADCAST = (3, 'broadcast')
+    ANYCAST = (4, 'anycast')
+    MULTICAST = (5, 'multicast')
+    BLACKHOLE = (6, 'blackhole')
+    UNREACHABLE = (7, 'unreachable')
+    PROHIBIT = (8, 'prohibit')
+    THROW = (9, 'throw')
+    NAT = (10, 'nat')
+    XRESOLVE = (11, 'xresolve')
+
+
+class RouteProtocol(_IntDispEnum):
+    # Routing daemons are free to use other values, which are kept as plain int.
+    UNSPEC = (0, 'unspec')
+    REDIRECT = (1, 'redirect')
+    KERNEL = (2, 'kernel')
+    BOOT = (3, 'boot')
+    STATIC = (4, 'static')
+    GATED = (8, 'gated')
+    RA = (9, 'ra')
+    MRT = (10, 'mrt')
+    ZEBRA = (11, 'zebra')
+    BIRD = (12, 'bird')
+    DNROUTED = (13, 'dnrouted')
+    XORP = (14, 'xorp')
+    NTK = (15, 'ntk')
+    DHCP = (16, 'dhcp')
+    MROUTED = (17, 'mrouted')
+    KEEPALIVED = (18, 'keepalived')
+    BABEL = (42, 'babel')
+    OPENR = (99, 'openr')
+    BGP = (186, 'bgp')
+    ISIS = (187, 'isis')
+    OSPF = (188, 'ospf')
+    RIP = (189, 'rip')
+    EIGRP = (192, 'eigrp')
+
+
+class NUDState(IntFlag):
+    # Ref: include/uapi/linux/neighbour.h. A neighbor is in one state at a time.
+    NONE = 0x00
+    INCOMPLETE = 0x01
+    REACHABLE = 0x02
+    STALE = 0x04
+    DELAY = 0x08
+    PROBE = 0x10
+    FAILED = 0x20
+    NOARP = 0x40
+    PERMANENT = 0x80
+
+    def __str__(self):
+        return self.name or super().__str__()
+
+
+RT_TABLE_MAIN = 254
+RT_TABLE_LOCAL = 255
+
+
 class IFAFlag(IntFlag):
     SECONDARY = 0x01
     TEMPORARY = 0x01
@@ -223,3 +273,99 @@ class IFAFlag(IntFlag):
     NOPREFIXROUTE = 0x200
     MCAUTOJOIN = 0x400
     STABLE_PRIVACY = 0x800
+
+
+class FlagMemo(dict):
+    '''
+    Memo table of decoded flag values, keyed on the raw integer from the kernel.
+
+    A host only shows a few dozen distinct combinations, so each one is decoded once.
+    The table is bounded: when it is full, new values are decoded every time but not kept.
+
+    :meta private:
+    '''
+    def __init__(self, decode: Callable[[int], object], maxsize: int = 256):
+        super().__init__()
+        self.decode = decode
+        self.maxsize = maxsize
+
+    def __missing__(self, value: int):
+        result = self.decode(value)
+        if len(self) < self.maxsize:
+            self[value] = result
+        return result
+
+
+# Ref: iproute2's print_link_flags(), in ip/ipaddress.c. This is the order "ip" prints them.
+LINK_FLAG_ORDER = (
+    LinkFlag.LOOPBACK, LinkFlag.BROADCAST, LinkFlag.POINTOPOINT, LinkFlag.MULTICAST, LinkFlag.NOARP,
+    LinkFlag.ALLMULTI, LinkFlag.PROMISC, LinkFlag.MASTER, LinkFlag.SLAVE, LinkFlag.DEBUG, LinkFlag.DYNAMIC,
+    LinkFlag.AUTOMEDIA, LinkFlag.PORTSEL, LinkFlag.NOTRAILERS, LinkFlag.UP, LinkFlag.LOWER_UP,
+    LinkFlag.DORMANT, LinkFlag.ECHO,
+)
+
+
+def split_link_flags(value: int) -> Tuple[LinkFlag, ...]:
+    '''
+    Split ``ifi_flags`` to :py:class:`LinkFlag` members, without caching.
+
+    To be compliant with output of "ip" tool, we don't return "RUNNING",
+    and return NO_CARRIER in case the link is UP but RUNNING is not set. Unknown bits are dropped.
+    '''
+    members = [m for m in LINK_FLAG_ORDER if value & m.value]
+    if value & LinkFlag.UP.value and not value & LinkFlag.RUNNING.value:
+        members.insert(0, LinkFlag.NO_CARRIER)
+    return tuple(members)
+
+
+#: Decode ``ifi_flags`` to the tuple of :py:class:`LinkFlag` which "ip" tool shows.
+decode_link_flags: Callable[[int], Tuple[LinkFlag, ...]] = FlagMemo(split_link_flags).__getitem__
+
+
+# Ref: iproute2's ifa_flag_data[] and print_ifa_flags(), in ip/ipaddress.c.
+# The SECONDARY bit is shown as "temporary" for IPv6, and PERMANENT as "dynamic" when it is not set.
+IFA_FLAG_NAMES = (
+    (IFAFlag.SECONDARY, 'secondary'),
+    (IFAFlag.NODAD, 'nodad'),
+    (IFAFlag.OPTIMISTIC, 'optimistic'),
+    (IFAFlag.DADFAILED, 'dadfailed'),
+    (IFAFlag.HOMEADDRESS, 'home'),
+    (IFAFlag.DEPRECATED, 'deprecated'),
+    (IFAFlag.TENTATIVE, 'tentative'),
+    (IFAFlag.PERMANENT, 'permanent'),
+    (IFAFlag.MANAGETEMPADDR, 'mngtmpaddr'),
+    (IFAFlag.NOPREFIXROUTE, 'noprefixroute'),
+    (IFAFlag.MCAUTOJOIN, 'autojoin'),
+    (IFAFlag.STABLE_PRIVACY, 'stable-privacy'),
+)
+
+
+def split_ifa_flags(value: int, inet6: bool = False) -> Tuple[Tuple[str, ...], int]:
+    '''
+    Split the flags of an address to the names that "ip" tool shows, without caching.
+
+    :return: The names, in the order "ip" prints them, and the bits that have no name
+             (which "ip" shows in hex, as ``ifa_flags``).
+    '''
+    names = []
+    for flag, name in IFA_FLAG_NAMES:
+        mask = flag.value
+        if flag == IFAFlag.PERMANENT:
+            if not value & mask:
+                names.append('dynamic')
+        elif value & mask:
+            names.append('temporary' if flag == IFAFlag.SECONDARY and inet6 else name)
+        value &= ~mask
+    return tuple(names), value
+
+
+_ifa_flags_memo = FlagMemo(split_ifa_flags)
+_ifa6_flags_memo = FlagMemo(lambda value: split_ifa_flags(value, inet6=True))
+
+
+def decode_ifa_flags(family: int, value: int) -> Tuple[Tuple[str, ...], int]:
+    '''
+    Decode the flags of an address (``IFA_FLAGS``, or ``ifa_flags`` of the header
+    when the attribute is missing). See :py:func:`split_ifa_flags`.
+    '''
+    return (_ifa6_flags_memo if family == AddressFamily.INET6 else _ifa_flags_memo)[value]
@@ -1,17 +1,177 @@
+import sys
+import string
 import dataclasses
 from dataclasses import dataclass
-from ipaddress import IPv4Address, IPv6Address
-from typing import List, Tuple, Union, Optional
+from functools import lru_cache, total_ordering
+from ipaddress import IPv4Address, IPv6Address, IPv4Network, IPv6Network
+from typing import List, Tuple, Union, Optional, Iterable, TYPE_CHECKING
 
-from netaddr import EUI
-from netaddr.strategy.eui48 import mac_unix_expanded
-from .consts import LinkFlag, OperState, LinkMode, LinkType
+from .consts import LinkFlag, OperState, LinkMode, LinkType, AddressFamily, RouteType, RouteProtocol, RTScope, \
+    NUDState
 
+if TYPE_CHECKING:
+    from netaddr import EUI
 
-class LinuxMAC(EUI):
-    ''' Subclass of :py:class:`netaddr.EUI` to force display to common format used by Linux tools '''
-    def __init__(self, addr: Union[str, EUI], version: Optional[int] = None):
-        return super().__init__(addr, dialect=mac_unix_expanded)
+
+def is_eui(obj) -> bool:
+    '''
+    Tell if ``obj`` is a :py:class:`netaddr.EUI`, without importing netaddr:
+    if it is not imported yet, there cannot be any EUI object.
+
+    :meta private:
+    '''
+    netaddr = sys.modules.get('netaddr')
+    return netaddr is not None and isinstance(obj, netaddr.EUI)
+
+
+@total_ordering
+class LinuxMAC:
+    '''
+    Hardware address, displayed in the common format used by Linux tools (``aa:bb:cc:dd:ee:ff``).
+
+    It only keeps the address as an integer and its length in bytes, the text is built on first use.
+    The objects are immutable and interned: building the same address again, like the
+    ``ff:ff:ff:ff:ff:ff`` broadcast of every Ethernet link, returns the same object.
+
+    It accepts a string, bytes, an integer (48-bit, or 64-bit if ``version`` is 64 or the value
+    doesn't fit in 48 bits) or a :py:class:`netaddr.EUI`, and converts back with :py:meth:`to_eui`.
+    Other :py:class:`netaddr.EUI` attributes, like ``oui``, are looked up on the converted object.
+    '''
+    __slots__ = ('value', 'length', '_text')
+
+    def __new__(cls, addr: Union[str, bytes, int, 'EUI', 'LinuxMAC'], version: Optional[int] = None):
+        if isinstance(addr, cls):
+            return addr
+        if is_eui(addr):
+            addr, version = int(addr), addr.version
+        return _lookup_mac(cls, addr, version)
+
+    @property
+    def packed(self) -> bytes:
+        return self.value.to_bytes(self.length, 'big')
+
+    def to_eui(self) -> 'EUI':
+        ''' Convert to :py:class:`netaddr.EUI`, with the same display format. '''
+        from netaddr import EUI
+        from netaddr.strategy.eui48 import mac_unix_expanded
+        from netaddr.strategy.eui64 import eui64_unix_expanded
+        if self.length == 8:
+            return EUI(self.value, 64, dialect=eui64_unix_expanded)
+        return EUI(self.value, 48, dialect=mac_unix_expanded)
+
+    def __getattr__(self, name: str):
+        return getattr(self.to_eui(), name)
+
+    def __str__(self) -> str:
+        text = self._text
+        if text is None:
+            digits = '{:0{}x}'.format(self.value, 2 * self.length)
+            text = self._text = ':'.join(digits[i:i + 2] for i in range(0, len(digits), 2))
+        return text
+
+    def __repr__(self) -> str:
+        return '{}({!r})'.format(type(self).__name__, str(self))
+
+    def __int__(self) -> int:
+        return self.value
+
+    def __index__(self) -> int:
+        return self.value
+
+    def __hash__(self) -> int:
+        return hash((self.value, self.length))
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, LinuxMAC):
+            return self.value == other.value and self.length == other.length
+        if isinstance(other, (str, bytes)) or is_eui(other):
+            try:
+                other = LinuxMAC(other)
+            except ValueError:
+                return False
+            return self.value == other.value and self.length == other.length
+        return NotImplemented
+
+    def __lt__(self, other) -> bool:
+        # Like netaddr.EUI: 48-bit addresses before 64-bit ones, then by value
+        if not isinstance(other, LinuxMAC):
+            if not isinstance(other, (str, bytes)) and not is_eui(other):
+                return NotImplemented
+            other = LinuxMAC(other)
+        return (self.length, self.value) < (other.length, other.value)
+
+    def __copy__(self) -> 'LinuxMAC':
+        return self
+
+    def __deepcopy__(self, memo) -> 'LinuxMAC':
+        return self
+
+    def __reduce__(self):
+        return (type(self), (self.packed,))
+
+
+HEX_DIGITS = frozenset(string.hexdigits)
+# The text formats of netaddr for 6 and 8 bytes:
+# (separator, number of groups) -> (least, most hex digits per group)
+MAC_TEXT_FORMATS = {
+    # "2:42:ac:11:0:2", "02-42-AC-11-00-02", and with 8 groups for EUI-64
+    (':', 6): (1, 2), ('-', 6): (1, 2), (':', 8): (1, 2), ('-', 8): (1, 2),
+    # "0242.ac11.0002"
+    ('.', 3): (4, 4), ('.', 4): (4, 4),
+    # "0242ac:110002", "0242ac-110002"
+    (':', 2): (6, 6), ('-', 2): (6, 6),
+}
+
+
+def parse_mac(addr: Union[str, bytes, int], version: Optional[int] = None) -> Tuple[int, int]:
+    '''
+    Get the integer value and the length in bytes of a hardware address.
+
+    :meta private:
+    '''
+    if isinstance(addr, int):
+        if addr < 0 or addr >= 1 << 64:
+            raise ValueError('{} is not a valid hardware address'.format(addr))
+        return addr, 8 if version == 64 or addr >= 1 << 48 else 6
+    if isinstance(addr, str):
+        sep = next((c for c in ':-.' if c in addr), None)
+        if sep is None:
+            # "0242ac110002"
+            parts = [addr]
+            digits = (len(addr), len(addr)) if len(addr) in (12, 16) else None
+        else:
+            parts = addr.split(sep)
+            digits = MAC_TEXT_FORMATS.get((sep, len(parts)))
+        if digits is None or not all(digits[0] <= len(p) <= digits[1] and HEX_DIGITS.issuperset(p)
+                                     for p in parts):
+            raise ValueError('{!r} is not a valid hardware address'.format(addr))
+        width = digits[1]
+        value = 0
+        for part in parts:
+            value = value << width * 4 | int(part, 16)
+        return value, len(parts) * width // 2
+    if not addr:
+        raise ValueError('Empty hardware address')
+    return int.from_bytes(addr, 'big'), len(addr)
+
+
+# Big enough for the links of a large host, so that a new dump finds them all again
+MAC_CACHE_SIZE = 1 << 14
+
+
+@lru_cache(maxsize=MAC_CACHE_SIZE)
+def _intern_mac(cls: type, value: int, length: int) -> LinuxMAC:
+    mac = object.__new__(cls)
+    mac.value = value
+    mac.length = length
+    mac._text = None
+    return mac
+
+
+# Two levels, so that different spellings of an address still share one object
+@lru_cache(maxsize=MAC_CACHE_SIZE)
+def _lookup_mac(cls: type, addr: Union[str, bytes, int], version: Optional[int]) -> LinuxMAC:
+    return _intern_mac(cls, *parse_mac(addr, version))
 
 
 @dataclass
@@ -21,6 +181,10 @@ class IPCommonInfo:
 
     :meta private:
     '''
+    # The records are slotted to save memory when many of them are kept.
+    __slots__ = ('ifindex', 'ifname', 'flags', 'mtu', 'qdisc', 'operstate', 'group', 'txqlen', 'link_type',
+                 'address', 'broadcast', 'promiscuity', 'min_mtu', 'max_mtu', 'num_tx_queues', 'num_rx_queues',
+                 'gso_max_size', 'gso_max_segs')
     ifindex: str
     ifname: str
     flags: List[LinkFlag]
@@ -41,20 +205,33 @@ class IPCommonInfo:
     gso_max_segs: int
 
 
+COMMON_FIELDS = tuple(f.name for f in dataclasses.fields(IPCommonInfo))
+
+
 @dataclass
 class IPLink(IPCommonInfo):
     '''
     The class which represent a data structure member of ``ip -j -d link`` result.
     '''
+    __slots__ = ('linkmode', 'inet6_addr_gen_mode')
     linkmode: LinkMode
     inet6_addr_gen_mode: str
 
     def to_dict(self):
         return dataclasses.asdict(self)
 
+    def join(self, addr_info: Iterable['AddrInfo']) -> 'IPAddr':
+        '''
+        Build the ``ip -j -d addr`` record of this link, with its addresses.
+        The fields are shared with the link, not copied: they are immutable.
+        '''
+        return IPAddr(*(getattr(self, name) for name in COMMON_FIELDS), addr_info=tuple(addr_info))
+
 
 @dataclass
 class AddrInfo:
+    __slots__ = ('family', 'local', 'prefixlen', 'broadcast', 'scope', 'dynamic', 'mngtmpaddr', 'noprefixroute',
+                 'label', 'valid_life_time', 'preferred_life_time', 'flags', 'unknown_flags')
     family: str
     local: Union[IPv4Address, IPv6Address]
     prefixlen: str
@@ -66,6 +243,9 @@ class AddrInfo:
     label: Optional[str]
     valid_life_time: int
     preferred_life_time: int
+    # All the flags, named like in iproute2's print_ifa_flags(), and the bits which have no name
+    flags: Tuple[str, ...]
+    unknown_flags: int
 
 
 @dataclass
@@ -73,4 +253,73 @@ class IPAddr(IPCommonInfo):
     '''
     The class which represent a data structure member of ``ip -j -d addr`` result.
     '''
+    __slots__ = ('addr_info',)
     addr_info: Tuple[AddrInfo, ...]
+
+
+@dataclass
+class Nexthop:
+    '''
+    One path of a multipath route.
+    '''
+    __slots__ = ('gateway', 'oif', 'weight')
+    gateway: Union[IPv4Address, IPv6Address, None]
+    oif: int
+    weight: int
+
+
+@dataclass
+class Route:
+    '''
+    The class which represent a data structure member of ``ip -j -d route`` result.
+
+    The output interface is given by its index, ``oif``. A multipath route has its paths
+    in ``nexthops``, and neither ``gateway`` nor ``oif``.
+    '''
+    __slots__ = ('family', 'dst', 'type', 'table', 'protocol', 'scope', 'gateway', 'oif', 'prefsrc', 'metric',
+                 'flags', 'nexthops')
+    family: AddressFamily
+    dst: Union[IPv4Network, IPv6Network]
+    type: RouteType
+    table: int
+    protocol: Union[RouteProtocol, int]
+    scope: RTScope
+    gateway: Union[IPv4Address, IPv6Address, None]
+    oif: Optional[int]
+    prefsrc: Union[IPv4Address, IPv6Address, None]
+    metric: Optional[int]
+    # rtm_flags, like RTM_F_CLONED
+    flags: int
+    nexthops: Tuple[Nexthop, ...]
+
+
+@dataclass
+class Neighbor:
+    '''
+    The class which represent a data structure member of ``ip -j neigh`` result: an entry
+    of the ARP (IPv4) or NDP (IPv6) cache. The interface is given by its index.
+    '''
+    __slots__ = ('family', 'ifindex', 'dst', 'lladdr', 'state', 'router', 'probes')
+    family: AddressFamily
+    ifindex: int
+    dst: Union[IPv4Address, IPv6Address]
+    # None when the neighbor isn't resolved (yet), like in the INCOMPLETE and FAILED states
+    lladdr: Optional[LinuxMAC]
+    state: NUDState
+    # IPv6 neighbors which announced themselves as routers
+    router: bool
+    probes: Optional[int]
+
+
+@dataclass
+class ChangeEvent:
+    '''
+    A change of the interfaces, as notified by the kernel.
+
+    ``event`` is the name of the rtnetlink message: ``RTM_NEWLINK``, ``RTM_DELLINK``,
+    ``RTM_NEWADDR`` or ``RTM_DELADDR``. ``link`` is set for the link events, ``addr`` for the address ones.
+    '''
+    event: str
+    ifindex: int
+    link: Optional[IPLink] = None
+    addr: Optional[AddrInfo] = None
@@ -1,15 +1,29 @@
+import errno
 import struct
+import platform
+import functools
 import ipaddress
-from typing import Tuple, Optional
+import threading
+from collections import defaultdict
+from contextlib import contextmanager, ExitStack
+from typing import TYPE_CHECKING, Tuple, Optional, List, Iterator, Iterable, Union, Dict
 
 from pyroute2 import IPRoute as _IPRoute
+from pyroute2.netlink.exceptions import NetlinkError
 from pyroute2.netlink import nla_slot, nla_base
 from pyroute2.netlink.rtnl.ifinfmsg import ifinfmsg, ifinfbase
 from pyroute2.netlink.rtnl.ifaddrmsg import ifaddrmsg
 
-from .core import IPLink, LinuxMAC, IPAddr, AddrInfo
-from .consts import LinkFlag, OperState, LinkType, LinkMode, \
-    Inet6AddrGenMode, AddressFamily, RTScope, IFAFlag
+from . import rawnl
+from .core import IPLink, LinuxMAC, IPAddr, AddrInfo, ChangeEvent, Route, Neighbor
+from .table import LinkTable, AddrTable, RouteTable
+from .consts import OperState, LinkType, LinkMode, \
+    Inet6AddrGenMode, AddressFamily, RTScope, RT_TABLE_MAIN, decode_link_flags, decode_ifa_flags
+from .metrics import Metrics, Probe, NullProbe, NULL_PROBE
+from .profiles import DumpProfile, get_profile
+
+if TYPE_CHECKING:
+    from .stats import LinkStats
 
 
 def extract_nla_short_int(msg: ifinfmsg, numeric_type: int) -> Optional[int]:
@@ -36,7 +50,6 @@ def extract_max_mtu(msg: ifinfmsg) -> Optional[int]:
 
 
 def shinify_link(msg: ifinfmsg) -> IPLink:
-    link_flags = LinkFlag(msg['flags'])
     operstate = msg.get_attr('IFLA_OPERSTATE')
     ifla_group = msg.get_attr('IFLA_GROUP')
     # pyroute returns IFLA_GROUP as number, but "ip" tool returns string.
@@ -58,14 +71,15 @@ def shinify_link(msg: ifinfmsg) -> IPLink:
     if max_mtu is None:
         max_mtu = extract_max_mtu(msg)
     af_spec: ifinfbase.af_spec_inet = msg.get_attr('IFLA_AF_SPEC')
-    inet: ifinfbase.af_spec_inet.inet6 = af_spec.get_attr('AF_INET6')
+    # There is no AF_INET6 block if IPv6 is disabled
+    inet: ifinfbase.af_spec_inet.inet6 = af_spec.get_attr('AF_INET6') if af_spec else None
     # FIXME: iproute2 print hex of unknown IFLA_INET6_ADDR_GEN_MODE value. We should support it.
-    inet6_addr_gen_mode = Inet6AddrGenMode(inet.get_attr('IFLA_INET6_ADDR_GEN_MODE'))
+    inet6_addr_gen_mode = Inet6AddrGenMode(inet.get_attr('IFLA_INET6_ADDR_GEN_MODE')) if inet else None
 
     return IPLink(
         ifindex=msg['index'],
         ifname=msg.get_attr('IFLA_IFNAME'),
-        flags=tuple(link_flags),
+        flags=decode_link_flags(msg['flags']),
         mtu=msg.get_attr('IFLA_MTU'),
         qdisc=msg.get_attr('IFLA_QDISC'),
         operstate=OperState(operstate),
@@ -88,7 +102,9 @@ def shinify_link(msg: ifinfmsg) -> IPLink:
 
 def shinify_addr_info(msg: ifaddrmsg) -> AddrInfo:
     family = AddressFamily(msg['family'])
-    local = ipaddress.ip_address(msg.get_attr('IFA_LOCAL'))
+    # Kernel doesn't send IFA_LOCAL for IPv6 addresses, the IFA_ADDRESS is the local one then.
+    ifa_local = msg.get_attr('IFA_LOCAL')
+    local = ipaddress.ip_address(ifa_local if ifa_local is not None else msg.get_attr('IFA_ADDRESS'))
     prefixlen = msg['prefixlen']
     try:
         broadcast = ipaddress.ip_address(msg.get_attr('IFA_BROADCAST'))
@@ -99,49 +115,607 @@ def shinify_addr_info(msg: ifaddrmsg) -> AddrInfo:
     cache_info = msg.get_attr('IFA_CACHEINFO')
     valid_life_time = cache_info['ifa_valid']
     preferred_life_time = cache_info['ifa_preferred']
-    aflag = IFAFlag(msg.get_attr('IFA_FLAGS'))
-    # FIXME: See iproute2's print_ifa_flags() function to know how to print these flags
-    dynamic = (aflag & IFAFlag.PERMANENT == 0)
-    noprefixroute = (aflag & IFAFlag.NOPREFIXROUTE == IFAFlag.NOPREFIXROUTE)
+    # IFA_FLAGS has all the flags, the header only has the lower 8 bits.
+    ifa_flags = msg.get_attr('IFA_FLAGS')
+    flags, unknown_flags = decode_ifa_flags(msg['family'], ifa_flags if ifa_flags is not None else msg['flags'])
     return AddrInfo(
         family=family,
         local=local,
         prefixlen=prefixlen,
         broadcast=broadcast,
         scope=scope,
-        dynamic=dynamic,
-        mngtmpaddr=None,
-        noprefixroute=noprefixroute,
+        dynamic='dynamic' in flags,
+        mngtmpaddr='mngtmpaddr' in flags,
+        noprefixroute='noprefixroute' in flags,
         label=label,
         valid_life_time=valid_life_time,
-        preferred_life_time=preferred_life_time
+        preferred_life_time=preferred_life_time,
+        flags=flags,
+        unknown_flags=unknown_flags
     )
 
 
-def get_links() -> Tuple[IPLink, ...]:
+def open_socket(netns: Optional[str] = None, rcvbuf: Optional[int] = None) -> _IPRoute:
+    '''
+    Open a netlink socket on which the kernel applies the filters of dump requests.
+
+    Without ``NETLINK_GET_STRICT_CHK`` (Linux < 4.20), the kernel ignores the header fields
+    of dump requests, like the interface index, and dumps everything.
+
+    :param netns: Path of the network namespace to open the socket in, instead of the current one.
+    :param rcvbuf: Size of the receive buffer (``SO_RCVBUF``), instead of the system's default.
+
+    :meta private:
+    '''
+    if netns is None:
+        ip = _IPRoute()
+    else:
+        from .netns import call_in
+        ip = call_in(netns, _IPRoute)
+    try:
+        ip.setsockopt(rawnl.SOL_NETLINK, rawnl.NETLINK_GET_STRICT_CHK, 1)
+    except OSError:
+        pass
+    if rcvbuf is not None:
+        rawnl.set_rcvbuf(ip, rcvbuf)
+    return ip
+
+
+def check_dump(msgs: Iterable) -> Iterable:
+    '''
+    Raise :py:class:`~linetface.rawnl.DumpInterrupted` if pyroute2 received a dump
+    flagged with ``NLM_F_DUMP_INTR``, which it doesn't check.
+
+    :meta private:
+    '''
+    for m in msgs:
+        if m['header']['flags'] & rawnl.NLM_F_DUMP_INTR:
+            raise rawnl.DumpInterrupted()
+    return msgs
+
+
+def query_links(ip: _IPRoute, ifname: Optional[str] = None, ifindex: Optional[int] = None,
+                ext_mask: Optional[int] = None) -> Iterable:
+    '''
+    Dump all links, or ask the kernel for the one with given name or index.
+
+    :meta private:
+    '''
+    if ifname is None and ifindex is None:
+        if ext_mask is None:
+            return check_dump(ip.get_links())
+        # get_links() would take ext_mask as a filter of the results
+        return check_dump(ip.link('dump', ext_mask=ext_mask, match=None))
+    kwarg = {}
+    if ext_mask is not None:
+        kwarg['ext_mask'] = ext_mask
+    if ifindex is not None:
+        kwarg['index'] = ifindex
+    if ifname is not None:
+        kwarg['ifname'] = ifname
+    try:
+        msgs = ip.link('get', **kwarg)
+    except NetlinkError as e:
+        if e.code == errno.ENODEV:
+            return ()
+        raise
+    # If both are given, kernel looks up by index only
+    return tuple(m for m in msgs if ifname is None or m.get_attr('IFLA_IFNAME') == ifname)
+
+
+def query_addrs(ip: _IPRoute, family: Optional[int] = None, ifindex: Optional[int] = None) -> Iterable:
+    '''
+    Dump addresses, optionally of one family and one interface only.
+
+    :meta private:
+    '''
+    if family is None and ifindex is None:
+        return check_dump(ip.get_addr())
+    msgs = check_dump(ip.addr('dump', family=family, index=ifindex))
+    if ifindex is None:
+        return msgs
+    # Old kernels ignore the index
+    return tuple(m for m in msgs if m['index'] == ifindex)
+
+
+def shinify_event(msg) -> Optional[ChangeEvent]:
+    '''
+    Parse a link or address notification. Return ``None`` for other messages.
+    '''
+    if isinstance(msg, ifinfmsg):
+        return ChangeEvent(msg['event'], msg['index'], link=shinify_link(msg))
+    if isinstance(msg, ifaddrmsg):
+        return ChangeEvent(msg['event'], msg['index'], addr=shinify_addr_info(msg))
+    return None
+
+
+def join_addr_info(link: IPLink, addr_info: Iterable[AddrInfo]) -> IPAddr:
+    '''
+    Build the ``ip -j -d addr`` record of a link from its ``ip -j -d link`` one.
+    '''
+    return link.join(addr_info)
+
+
+def kernel_version() -> Tuple[int, ...]:
+    numbers = []
+    for part in platform.release().split('-')[0].split('.')[:3]:
+        if not part.isdigit():
+            break
+        numbers.append(int(part))
+    return tuple(numbers)
+
+
+# Since Linux 6.8, the link and address dumps walk the interfaces in order of index.
+# Before, they walk the buckets of a hash table of the indexes.
+ORDERED_DUMPS = kernel_version() >= (6, 8)
+
+
+@contextmanager
+def closing_all(iterators: Iterable[Iterator]) -> Iterator[None]:
+    '''
+    Close the iterators (if they can be) at the end of the block, so that
+    the dumps which they didn't read to the end are drained before their sockets are given back.
+
+    :meta private:
+    '''
+    try:
+        yield
+    finally:
+        for it in iterators:
+            close = getattr(it, 'close', None)
+            if close is not None:
+                close()
+
+
+def restricted(profile: DumpProfile, links: Iterator[IPLink]) -> Iterator[IPLink]:
+    '''
+    Clear the fields of the links which the profile leaves out. Unlike ``map()``, it can be
+    closed, which closes ``links``, so that the rest of their dump is drained.
+
+    :meta private:
+    '''
+    with closing_all([links]):
+        for link in links:
+            yield profile.restrict(link)
+
+
+def merge_addr_info(links: Iterable[IPLink], streams: List[Iterator[Tuple[int, AddrInfo]]],
+                    family: Optional[int] = None) -> Iterator[IPAddr]:
+    '''
+    Join address dumps to a link dump, in one pass, when all of them are in order of interface index:
+    the addresses of a link are the ones met in each address dump before the next link's index.
+
+    Addresses whose link comes later than expected (the order is not the one of the indexes)
+    are kept aside until it comes, and the ones of links which don't come (removed between the dumps)
+    are dropped.
+
+    :meta private:
+    '''
+    heads = [next(s, None) for s in streams]
+    strays: Dict[int, List[AddrInfo]] = defaultdict(list)
+    for link in links:
+        index = link.ifindex
+        infos = strays.pop(index, [])
+        for i, stream in enumerate(streams):
+            head = heads[i]
+            while head is not None and head[0] <= index:
+                if head[0] == index:
+                    infos.append(head[1])
+                else:
+                    strays[head[0]].append(head[1])
+                head = next(stream, None)
+            heads[i] = head
+        if family is None or infos:
+            yield join_addr_info(link, infos)
+
+
+def retry_interrupted(method):
+    '''
+    Run a query again, up to ``dump_retries`` times, while its dumps are interrupted.
+
+    :meta private:
+    '''
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        attempt = 0
+        while True:
+            try:
+                return method(self, *args, **kwargs)
+            except rawnl.DumpInterrupted:
+                with self._lock:
+                    self.interrupted_dumps += 1
+                if attempt >= self.dump_retries:
+                    raise
+                attempt += 1
+    return wrapper
+
+
+class Linetface:
+    '''
+    Session which keeps its netlink sockets open between queries.
+
+    The sockets are kept in a small pool, so that one session can be shared between threads:
+    each query borrows a socket, and waits for one to be given back if ``pool_size`` of them
+    are busy. Use it as a context manager, or call :py:meth:`close`, to release the sockets.
+
+    The ``decoder`` chooses how the netlink messages are parsed: ``'pyroute2'`` (default)
+    or ``'fast'``, which uses :py:mod:`linetface.rawnl` to read the raw messages directly.
+    ``'lazy'`` is like ``'fast'``, but each field of the links is only decoded when it is first read,
+    which saves time and memory when callers look at a few fields only.
+
+    ``netns`` is the path of a network namespace (like ``/run/netns/NAME`` or ``/proc/PID/ns/net``)
+    to query instead of the current one. See :py:mod:`linetface.netns`.
+
+    ``metrics`` receives the measures of each query (see :py:mod:`linetface.metrics`).
+    It can also be set, or unset, later.
+
+    For hosts with thousands of interfaces, ``rcvbuf`` sets the receive buffer of the sockets
+    (``SO_RCVBUF``), and ``recv_batch`` makes the ``'fast'`` and ``'lazy'`` decoders read that many
+    datagrams of a dump with each system call (see :py:class:`~linetface.rawnl.BatchedSocket`).
+
+    ``profile`` is the :py:class:`~linetface.profiles.DumpProfile`, or the name of one of
+    :py:data:`~linetface.profiles.PROFILES`, of the link queries: what the kernel leaves out
+    of its messages, and which fields of the links are filled. The others are ``None``.
+
+    When the kernel reports that a table changed during its dump (``NLM_F_DUMP_INTR``),
+    the ``get_*`` methods dump again, up to ``dump_retries`` times, then raise
+    :py:class:`~linetface.rawnl.DumpInterrupted`. :py:attr:`interrupted_dumps` counts those dumps.
+    The ``iter_*`` methods, which have already yielded the records, raise it at the end.
+
+    .. code-block:: python
+
+        with Linetface() as lf:
+            links = lf.get_links()
+    '''
+    decoders = ('pyroute2', 'fast', 'lazy')
+
+    def __init__(self, pool_size: int = 4, decoder: str = 'pyroute2', netns: Optional[str] = None,
+                 metrics: Optional[Metrics] = None, rcvbuf: Optional[int] = None, recv_batch: int = 1,
+                 dump_retries: int = 3, profile: Union[str, DumpProfile] = 'ip-compatible'):
+        if pool_size < 1:
+            raise ValueError('pool_size must be at least 1')
+        if decoder not in self.decoders:
+            raise ValueError('decoder must be one of {}'.format(', '.join(self.decoders)))
+        if recv_batch < 1:
+            raise ValueError('recv_batch must be at least 1')
+        self.pool_size = pool_size
+        self.decoder = decoder
+        self.netns = netns
+        self.metrics = metrics
+        self.rcvbuf = rcvbuf
+        self.recv_batch = recv_batch
+        self.dump_retries = dump_retries
+        self.profile = get_profile(profile)
+        #: Number of dumps which the kernel reported as interrupted
+        self.interrupted_dumps = 0
+        self._slots = threading.BoundedSemaphore(pool_size)
+        self._lock = threading.Lock()
+        self._multi_lock = threading.Lock()
+        self._idle: List[_IPRoute] = []
+        self._closed = False
+
+    def __enter__(self) -> 'Linetface':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _probe(self, operation: str) -> Union[Probe, NullProbe]:
+        metrics = self.metrics
+        if metrics is None:
+            return NULL_PROBE
+        return metrics.probe(operation, self.decoder)
+
+    @contextmanager
+    def socket(self, probe: Union[Probe, NullProbe] = NULL_PROBE) -> Iterator[_IPRoute]:
+        '''
+        Borrow a netlink socket from the pool, creating it if no idle one is available.
+        The ``recv`` calls on it are measured by ``probe``. If the block raises, the socket
+        is closed instead of being given back.
+
+        :meta private:
+        '''
+        self._slots.acquire()
+        try:
+            with self._lock:
+                if self._closed:
+                    raise RuntimeError('Linetface session is closed')
+                ip = self._idle.pop() if self._idle else None
+            if ip is None:
+                ip = open_socket(self.netns, self.rcvbuf)
+                if self.recv_batch > 1:
+                    ip = rawnl.BatchedSocket(ip, self.recv_batch)
+            clean = False
+            try:
+                with probe.attach(ip):
+                    yield ip
+                clean = True
+            except (GeneratorExit, rawnl.DumpInterrupted):
+                # Closed iterators read the rest of their dump, interrupted dumps are read to their end.
+                clean = True
+                raise
+            finally:
+                with self._lock:
+                    # A dump which failed part way may have left messages on the socket.
+                    if self._closed or not clean:
+                        ip.close()
+                    else:
+                        self._idle.append(ip)
+        finally:
+            self._slots.release()
+
+    def close(self):
+        '''
+        Close the idle sockets. The ones being used are closed when they are given back.
+        '''
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for ip in idle:
+            ip.close()
+
+    @retry_interrupted
+    def get_links(self, ifname: Optional[str] = None, ifindex: Optional[int] = None) -> Tuple[IPLink, ...]:
+        '''
+        Return result same as ``ip -j -d link``, or ``ip -j -d link show dev <ifname>``.
+
+        :param ifname: Only get the interface of this name.
+        :param ifindex: Only get the interface of this index.
+
+        The filters are applied by the kernel, so only the matching interfaces are sent and parsed.
+        '''
+        with self._probe('get_links') as probe, self.socket(probe) as ip:
+            return tuple(self._iter_links(ip, ifname, ifindex))
+
+    def _iter_links(self, ip: _IPRoute, ifname: Optional[str] = None,
+                    ifindex: Optional[int] = None) -> Iterator[IPLink]:
+        profile = self.profile
+        if self.decoder == 'fast':
+            return rawnl.iter_links(ip, ifname, ifindex, ext_mask=profile.ext_mask, fields=profile.link_fields)
+        if self.decoder == 'lazy':
+            links = rawnl.iter_links(ip, ifname, ifindex, lazy=True, ext_mask=profile.ext_mask)
+        else:
+            links = map(shinify_link, query_links(ip, ifname, ifindex, profile.ext_mask))
+        return restricted(profile, links) if profile.omitted else links
+
+    def _iter_addrs(self, ip: _IPRoute, family: Optional[int] = None,
+                    ifindex: Optional[int] = None) -> Iterator[Tuple[int, AddrInfo]]:
+        if self.decoder != 'pyroute2':
+            return rawnl.iter_addrs(ip, family, ifindex)
+        return ((raw['index'], shinify_addr_info(raw)) for raw in query_addrs(ip, family, ifindex))
+
+    @retry_interrupted
+    def get_addrs(self, family: Optional[int] = None, ifindex: Optional[int] = None) -> Tuple[IPAddr, ...]:
+        '''
+        Return result same as ``ip -j -d addr``.
+
+        :param family: Only get addresses of this family (:py:class:`~linetface.consts.AddressFamily`
+                       ``INET`` or ``INET6``). Like ``ip -4`` and ``ip -6``, interfaces
+                       which don't have such address are left out.
+        :param ifindex: Only get the interface of this index.
+        '''
+        with self._probe('get_addrs') as probe:
+            with self.socket(probe) as ip:
+                links = tuple(self._iter_links(ip, ifindex=ifindex))
+                if not links:
+                    return ()
+                # Dump the address table once and join it to the links by interface index,
+                # instead of asking for (and filtering) the whole table again for each link.
+                ainfos = defaultdict(list)
+                for index, info in self._iter_addrs(ip, family, ifindex):
+                    ainfos[index].append(info)
+            probe.materialize()
+            if family is not None:
+                links = tuple(li for li in links if li.ifindex in ainfos)
+            return tuple(join_addr_info(li, ainfos.get(li.ifindex, ())) for li in links)
+
+    @contextmanager
+    def sockets(self, count: int, probe: Union[Probe, NullProbe] = NULL_PROBE) -> Iterator[List[_IPRoute]]:
+        '''
+        Borrow ``count`` sockets from the pool, at most ``pool_size``.
+
+        :meta private:
+        '''
+        with ExitStack() as stack:
+            # Only one thread at a time takes several sockets, else two of them
+            # could each hold some and wait for the ones of the other.
+            with self._multi_lock:
+                ips = [stack.enter_context(self.socket(probe)) for _i in range(count)]
+            yield ips
+
+    def iter_links(self, ifname: Optional[str] = None, ifindex: Optional[int] = None) -> Iterator[IPLink]:
+        '''
+        Like :py:meth:`get_links`, but yield the links one by one as they are received and decoded,
+        instead of gathering them first. The socket is borrowed until the end of the iteration,
+        or until the iterator is closed: then the rest of the dump is read and dropped.
+
+        With the ``'pyroute2'`` decoder, pyroute2 still receives and parses the whole dump first.
+        '''
+        with self._probe('iter_links') as probe, self.socket(probe) as ip:
+            yield from self._iter_links(ip, ifname, ifindex)
+
+    def iter_addrs(self, family: Optional[int] = None, ifindex: Optional[int] = None) -> Iterator[IPAddr]:
+        '''
+        Like :py:meth:`get_addrs`, but yield the records one by one, as the links are received.
+
+        If the kernel dumps the links and addresses in order of interface index (Linux 6.8+),
+        the link dump and the address dumps (one per family) are read side by side, on one socket each,
+        and joined in one pass: only the records of a few links are in memory at once.
+        This needs 3 sockets (2 for one family) from the pool. Otherwise, the addresses are dumped
+        first, then the links are streamed.
+        '''
+        families = (AddressFamily.INET, AddressFamily.INET6) if family is None else (family,)
+        with self._probe('iter_addrs') as probe:
+            if ORDERED_DUMPS and ifindex is None and self.pool_size > len(families):
+                with self.sockets(1 + len(families), probe) as (ip, *others):
+                    links = self._iter_links(ip)
+                    streams = [self._iter_addrs(other, f) for other, f in zip(others, families)]
+                    with closing_all([links] + streams):
+                        yield from merge_addr_info(links, streams, family)
+                return
+            with self.socket(probe) as ip:
+                ainfos = defaultdict(list)
+                for index, info in self._iter_addrs(ip, family, ifindex):
+                    ainfos[index].append(info)
+                links = self._iter_links(ip, ifindex=ifindex)
+                with closing_all([links]):
+                    for link in links:
+                        infos = ainfos.pop(link.ifindex, ())
+                        if family is None or infos:
+                            yield join_addr_info(link, infos)
+
+    @retry_interrupted
+    def get_link_table(self) -> LinkTable:
+        '''
+        Return all links in columnar form, which takes much less memory than
+        the tuple of :py:class:`IPLink` for large tables.
+        '''
+        with self._probe('get_link_table') as probe, self.socket(probe) as ip:
+            return LinkTable.from_links(self._iter_links(ip))
+
+    @retry_interrupted
+    def get_addr_table(self, family: Optional[int] = None) -> AddrTable:
+        '''
+        Return all addresses in columnar form.
+        '''
+        with self._probe('get_addr_table') as probe, self.socket(probe) as ip:
+            return AddrTable.from_addrs(self._iter_addrs(ip, family))
+
+    @retry_interrupted
+    def get_routes(self, family: Optional[int] = None, table: Optional[int] = RT_TABLE_MAIN) -> Tuple[Route, ...]:
+        '''
+        Return the routes, like ``ip -d route``.
+
+        :param family: Only get the routes of this family (``INET`` or ``INET6``).
+        :param table: Only get the routes of this routing table, ``None`` for all of them
+                      (like ``ip route show table all``). By default, the main table.
+        '''
+        with self._probe('get_routes') as probe, self.socket(probe) as ip:
+            return tuple(rawnl.iter_routes(ip, family, table))
+
+    @retry_interrupted
+    def get_route_table(self, family: Optional[int] = None, table: Optional[int] = RT_TABLE_MAIN) -> RouteTable:
+        '''
+        Return the routes in columnar form, with a longest-prefix-match index
+        (see :py:meth:`~linetface.table.RouteTable.lookup`). The routes are stored as they are
+        received, so it fits full Internet tables.
+        '''
+        with self._probe('get_route_table') as probe, self.socket(probe) as ip:
+            return RouteTable.from_dump(rawnl.iter_route_fields(ip, family, table))
+
+    def iter_neighbors(self, family: Optional[int] = None, ifindex: Optional[int] = None,
+                       states: Optional[int] = rawnl.SHOWN_NUD_STATES) -> Iterator[Neighbor]:
+        '''
+        Yield the entries of the ARP and NDP caches, like ``ip neigh``, one by one as they are received.
+        The socket is borrowed until the end of the iteration, or until the iterator is closed.
+
+        :param family: Only get the neighbors of this family (``INET`` or ``INET6``).
+        :param ifindex: Only get the neighbors on the interface of this index.
+        :param states: Mask of the :py:class:`~linetface.consts.NUDState` to keep.
+                       By default, all but ``NOARP``, like ``ip neigh``. ``None`` to keep all.
+        '''
+        with self._probe('iter_neighbors') as probe, self.socket(probe) as ip:
+            yield from rawnl.iter_neighbors(ip, family, ifindex, states)
+
+    @retry_interrupted
+    def get_neighbors(self, family: Optional[int] = None, ifindex: Optional[int] = None,
+                      states: Optional[int] = rawnl.SHOWN_NUD_STATES) -> Tuple[Neighbor, ...]:
+        '''
+        Return the entries of the ARP and NDP caches, like ``ip neigh``.
+        See :py:meth:`iter_neighbors` for the filters.
+        '''
+        with self._probe('get_neighbors') as probe, self.socket(probe) as ip:
+            return tuple(rawnl.iter_neighbors(ip, family, ifindex, states))
+
+    @retry_interrupted
+    def get_link_stats(self) -> 'LinkStats':
+        '''
+        Return the traffic counters of all links, like ``ip -s link``, as one matrix.
+        See :py:mod:`linetface.stats`.
+        '''
+        # Imported here, as it loads NumPy if available
+        from .stats import LinkStats
+        with self._probe('get_link_stats') as probe, self.socket(probe) as ip:
+            return LinkStats.from_dump(rawnl.iter_link_stats(ip))
+
+
+_default_session: Optional[Linetface] = None
+_default_session_lock = threading.Lock()
+
+
+def default_session() -> Linetface:
+    '''
+    Return the :py:class:`Linetface` session used by the module-level functions,
+    creating it on first use.
+    '''
+    global _default_session
+    with _default_session_lock:
+        if _default_session is None:
+            _default_session = Linetface()
+        return _default_session
+
+
+def get_links(ifname: Optional[str] = None, ifindex: Optional[int] = None) -> Tuple[IPLink, ...]:
     '''
     Return result same as ``ip -j -d link``.
+    See :py:meth:`Linetface.get_links` for the filters.
     '''
-    ip = _IPRoute()
-    links = []
-    for raw in ip.get_links():
-        links.append(shinify_link(raw))
-    return tuple(links)
+    return default_session().get_links(ifname, ifindex)
 
 
-def get_addrs() -> Tuple[IPAddr, ...]:
+def get_addrs(family: Optional[int] = None, ifindex: Optional[int] = None) -> Tuple[IPAddr, ...]:
     '''
     Return result same as ``ip -j -d addr``.
+    See :py:meth:`Linetface.get_addrs` for the filters.
+    '''
+    return default_session().get_addrs(family, ifindex)
+
+
+def iter_links(ifname: Optional[str] = None, ifindex: Optional[int] = None) -> Iterator[IPLink]:
+    '''
+    Yield the links one by one, like ``ip -j -d link``.
+    See :py:meth:`Linetface.iter_links`.
+    '''
+    return default_session().iter_links(ifname, ifindex)
+
+
+def iter_addrs(family: Optional[int] = None, ifindex: Optional[int] = None) -> Iterator[IPAddr]:
+    '''
+    Yield the records of ``ip -j -d addr`` one by one.
+    See :py:meth:`Linetface.iter_addrs`.
+    '''
+    return default_session().iter_addrs(family, ifindex)
+
+
+def get_link_stats() -> 'LinkStats':
+    '''
+    Return the traffic counters of all links.
+    See :py:meth:`Linetface.get_link_stats`.
+    '''
+    return default_session().get_link_stats()
+
+
+def get_routes(family: Optional[int] = None, table: Optional[int] = RT_TABLE_MAIN) -> Tuple[Route, ...]:
+    '''
+    Return the routes, like ``ip -d route``.
+    See :py:meth:`Linetface.get_routes` for the filters.
+    '''
+    return default_session().get_routes(family, table)
+
+
+def iter_neighbors(family: Optional[int] = None, ifindex: Optional[int] = None,
+                   states: Optional[int] = rawnl.SHOWN_NUD_STATES) -> Iterator[Neighbor]:
+    '''
+    Yield the entries of the ARP and NDP caches, like ``ip neigh``.
+    See :py:meth:`Linetface.iter_neighbors` for the filters.
+    '''
+    return default_session().iter_neighbors(family, ifindex, states)
+
+
+def get_neighbors(family: Optional[int] = None, ifindex: Optional[int] = None,
+                  states: Optional[int] = rawnl.SHOWN_NUD_STATES) -> Tuple[Neighbor, ...]:
+    '''
+    Return the entries of the ARP and NDP caches, like ``ip neigh``.
+    See :py:meth:`Linetface.iter_neighbors` for the filters.
     '''
-    ip = _IPRoute()
-    links = get_links()
-    addresses = []
-    for li in links:
-        data = li.to_dict()
-        data.pop('linkmode')
-        data.pop('inet6_addr_gen_mode', None)
-        ainfos = ip.get_addr(label=li.ifname)
-        data['addr_info'] = tuple(shinify_addr_info(i) for i in ainfos)
-        a = IPAddr(**data)
-        addresses.append(a)
-    return tuple(addresses)
+    return default_session().get_neighbors(family, ifindex, states)
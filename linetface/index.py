@@ -0,0 +1,175 @@
+'''
+Indexes over query results, for lookups in constant time instead of scans.
+'''
+
+import heapq
+from ipaddress import IPv4Address, IPv6Address, ip_address
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from .consts import LinkFlag, LinkType, OperState
+from .core import LinuxMAC, Neighbor, IPCommonInfo, IPAddr, AddrInfo
+from .table import flags_value
+
+
+IPAddress = Union[str, IPv4Address, IPv6Address]
+
+
+class NeighborIndex:
+    '''
+    Neighbors indexed by link-layer address and by IP address. It can be built straight
+    from :py:func:`~linetface.iter_neighbors`, without keeping the tuple of all entries.
+
+    .. code-block:: python
+
+        from linetface import iter_neighbors
+        from linetface.index import NeighborIndex
+
+        neighbors = NeighborIndex(iter_neighbors())
+        camera_ips = [n.dst for n in neighbors.by_mac('00:12:34:56:78:9a')]
+    '''
+    __slots__ = ('_macs', '_ips', '_count')
+
+    def __init__(self, neighbors: Iterable[Neighbor] = ()):
+        self._macs: Dict[LinuxMAC, List[Neighbor]] = {}
+        self._ips: Dict[Union[IPv4Address, IPv6Address], List[Neighbor]] = {}
+        self._count = 0
+        for neighbor in neighbors:
+            self.add(neighbor)
+
+    def add(self, neighbor: Neighbor):
+        if neighbor.lladdr is not None:
+            self._macs.setdefault(neighbor.lladdr, []).append(neighbor)
+        self._ips.setdefault(neighbor.dst, []).append(neighbor)
+        self._count += 1
+
+    def __len__(self) -> int:
+        return self._count
+
+    def by_mac(self, lladdr: Union[str, LinuxMAC]) -> Tuple[Neighbor, ...]:
+        ''' The neighbors which resolve to this link-layer address, usually one IPv4 and some IPv6 ones. '''
+        return tuple(self._macs.get(LinuxMAC(lladdr), ()))
+
+    def by_ip(self, address: IPAddress, ifindex: Optional[int] = None) -> Optional[Neighbor]:
+        '''
+        The neighbor of this IP address. The same address can be on several interfaces,
+        give ``ifindex`` to choose, otherwise the first one found is returned.
+        '''
+        if isinstance(address, str):
+            address = ip_address(address)
+        for neighbor in self._ips.get(address, ()):
+            if ifindex is None or neighbor.ifindex == ifindex:
+                return neighbor
+        return None
+
+
+def _address(address: IPAddress) -> Union[IPv4Address, IPv6Address]:
+    return ip_address(address) if isinstance(address, str) else address
+
+
+class InterfaceIndex:
+    '''
+    Links, and their addresses, indexed by flags, type, state, name and IP address.
+    It is built from the result of :py:func:`~linetface.get_addrs` (or :py:func:`~linetface.get_links`,
+    which has no address), and the lookups return the records in the same order.
+
+    - Links are grouped by their set of flags (there are few distinct ones), so :py:meth:`with_flags`
+      only tests each group's bitmask.
+    - Addresses are hashed by their network, one table per prefix length: :py:meth:`containing`
+      looks up each length which is in use, from the longest, like routers do.
+
+    .. code-block:: python
+
+        from linetface import get_addrs
+        from linetface.consts import LinkFlag
+        from linetface.index import InterfaceIndex
+
+        index = InterfaceIndex(get_addrs())
+        scanned = index.with_flags(LinkFlag.UP | LinkFlag.MULTICAST, without=LinkFlag.LOOPBACK)
+        owner = index.containing('10.1.2.3')
+    '''
+    __slots__ = ('records', '_positions', '_names', '_flags', '_types', '_states', '_owners', '_networks')
+
+    def __init__(self, records: Iterable[IPCommonInfo] = ()):
+        self.records: Tuple[IPCommonInfo, ...] = tuple(records)
+        self._positions: Dict[int, int] = {}
+        self._names: Dict[str, IPCommonInfo] = {}
+        self._flags: Dict[int, List[int]] = {}
+        self._types: Dict[LinkType, List[IPCommonInfo]] = {}
+        self._states: Dict[OperState, List[IPCommonInfo]] = {}
+        self._owners: Dict[Union[IPv4Address, IPv6Address], List[Tuple[IPCommonInfo, AddrInfo]]] = {}
+        # (IP version, prefix length) -> network as an integer -> addresses
+        self._networks: Dict[Tuple[int, int], Dict[int, List[Tuple[IPCommonInfo, AddrInfo]]]] = {}
+        owners, networks = self._owners, self._networks
+        for position, record in enumerate(self.records):
+            self._positions[record.ifindex] = position
+            self._names[record.ifname] = record
+            # Indexed by the kernel's ifi_flags, so that RUNNING can be looked up
+            self._flags.setdefault(flags_value(record.flags) if record.flags else 0, []).append(position)
+            self._types.setdefault(record.link_type, []).append(record)
+            self._states.setdefault(record.operstate, []).append(record)
+            if not isinstance(record, IPAddr):
+                continue
+            for info in record.addr_info:
+                local, prefixlen = info.local, info.prefixlen
+                owners.setdefault(local, []).append((record, info))
+                table = networks.setdefault((local.version, prefixlen), {})
+                table.setdefault(int(local) >> (local.max_prefixlen - prefixlen), []).append((record, info))
+        # Longest prefixes first
+        self._networks = dict(sorted(networks.items(), key=lambda item: -item[0][1]))
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def __repr__(self) -> str:
+        return '<InterfaceIndex of {} links and {} addresses>'.format(len(self.records), len(self._owners))
+
+    def by_index(self, ifindex: int) -> Optional[IPCommonInfo]:
+        position = self._positions.get(ifindex)
+        return self.records[position] if position is not None else None
+
+    def by_name(self, ifname: str) -> Optional[IPCommonInfo]:
+        return self._names.get(ifname)
+
+    def by_type(self, link_type: LinkType) -> Tuple[IPCommonInfo, ...]:
+        return tuple(self._types.get(link_type, ()))
+
+    def by_operstate(self, operstate: OperState) -> Tuple[IPCommonInfo, ...]:
+        return tuple(self._states.get(operstate, ()))
+
+    def with_flags(self, flags: int, without: int = 0) -> Tuple[IPCommonInfo, ...]:
+        '''
+        The links which have all of ``flags`` and none of ``without``, which are
+        :py:class:`~linetface.consts.LinkFlag` values or'ed together.
+
+        They are tested against the kernel's ``ifi_flags``, which have ``RUNNING``.
+        ``NO_CARRIER`` is not a bit of them: the links without carrier are
+        ``with_flags(LinkFlag.UP, without=LinkFlag.RUNNING)``.
+        '''
+        if flags is LinkFlag.NO_CARRIER or without is LinkFlag.NO_CARRIER:
+            raise ValueError('NO_CARRIER is not a flag, use without=LinkFlag.RUNNING')
+        groups = [positions for mask, positions in self._flags.items() if mask & flags == flags and not mask & without]
+        records = self.records
+        if len(groups) == 1:
+            return tuple(records[p] for p in groups[0])
+        return tuple(records[p] for p in heapq.merge(*groups))
+
+    def owners(self, address: IPAddress) -> Tuple[Tuple[IPCommonInfo, AddrInfo], ...]:
+        '''
+        The links which have this address, with its :py:class:`~linetface.core.AddrInfo`.
+        Link-local addresses can be on several links.
+        '''
+        return tuple(self._owners.get(_address(address), ()))
+
+    def containing(self, address: IPAddress) -> Tuple[Tuple[IPCommonInfo, AddrInfo], ...]:
+        '''
+        The addresses whose subnet contains ``address``, from the most specific subnet,
+        with the links which have them. The first one is the link that a route to ``address``
+        would usually go through.
+        '''
+        address = _address(address)
+        value, version, bits = int(address), address.version, address.max_prefixlen
+        found: List[Tuple[IPCommonInfo, AddrInfo]] = []
+        for (net_version, prefixlen), networks in self._networks.items():
+            if net_version == version:
+                found.extend(networks.get(value >> (bits - prefixlen), ()))
+        return tuple(found)
@@ -0,0 +1,150 @@
+'''
+JSON output in the shape of ``ip -j -d link`` and ``ip -j -d addr``.
+
+The records are written field by field, in the order and with the formatting of iproute2,
+without building intermediate dicts. Fields that ``ip`` omits when they are absent
+(``None`` here) are omitted too.
+
+.. code-block:: python
+
+    import sys
+    from linetface import get_addrs, ipjson
+
+    ipjson.dump(get_addrs(), sys.stdout)
+'''
+
+from json.encoder import encode_basestring
+from typing import Callable, Iterable, Tuple, TextIO, Union
+
+from .core import IPLink, IPAddr, AddrInfo
+
+
+def _int(value: int) -> str:
+    return '%d' % value
+
+
+def _str(value) -> str:
+    return encode_basestring(str(value))
+
+
+def _display(value) -> str:
+    return '"%s"' % value.display
+
+
+def _name(value) -> str:
+    return '"%s"' % value.name
+
+
+# Flag tuples come from the memo tables of consts, so the same tuple objects come again
+# and again. Their JSON text is kept by identity, with the tuple, so that its id stays valid.
+_flags_text = {}
+
+
+def _flags(flags: Tuple) -> str:
+    entry = _flags_text.get(id(flags))
+    if entry is not None and entry[0] is flags:
+        return entry[1]
+    text = '[' + ','.join('"%s"' % f for f in flags) + ']'
+    if len(_flags_text) < 256:
+        _flags_text[id(flags)] = (flags, text)
+    return text
+
+
+Field = Tuple[str, str, Callable]
+
+
+def fields(*specs: Tuple[str, Callable]) -> Tuple[Field, ...]:
+    ''' Prepare (attribute name, JSON key, formatter) triples. '''
+    return tuple((name, '"%s":' % name, fmt) for name, fmt in specs)
+
+
+# Ref: iproute2's print_linkinfo() and print_addrinfo(), in ip/ipaddress.c
+LINK_FIELDS = fields(
+    ('ifindex', _int), ('ifname', _str), ('flags', _flags), ('mtu', _int), ('qdisc', _str),
+    ('operstate', _str), ('linkmode', _name), ('group', _str), ('txqlen', _int), ('link_type', _display),
+    ('address', _str), ('broadcast', _str), ('promiscuity', _int), ('min_mtu', _int), ('max_mtu', _int),
+    ('inet6_addr_gen_mode', _display), ('num_tx_queues', _int), ('num_rx_queues', _int),
+    ('gso_max_size', _int), ('gso_max_segs', _int),
+)
+# "ip addr" doesn't show linkmode and inet6_addr_gen_mode
+ADDR_LINK_FIELDS = tuple(f for f in LINK_FIELDS if f[0] not in ('linkmode', 'inet6_addr_gen_mode'))
+# Without -d, "ip" stops after the link-layer addresses
+LINK_BRIEF_FIELDS = LINK_FIELDS[:12]
+ADDR_LINK_BRIEF_FIELDS = ADDR_LINK_FIELDS[:11]
+# ... and "ip -4 addr" and "ip -6 addr" don't show the link layer at all, unless -d is given.
+ADDR_LINK_NO_LL_FIELDS = ADDR_LINK_FIELDS[:8]
+ADDR_INFO_HEAD = fields(('family', _display), ('local', _str), ('prefixlen', _int), ('broadcast', _str),
+                        ('scope', _display))
+ADDR_INFO_TAIL = fields(('label', _str), ('valid_life_time', _int), ('preferred_life_time', _int))
+
+
+def _append_fields(record, specs: Tuple[Field, ...], parts: list):
+    for name, key, fmt in specs:
+        value = getattr(record, name)
+        if value is not None:
+            parts.append(key + fmt(value))
+
+
+def encode_addr_info(info: AddrInfo) -> str:
+    parts = []
+    _append_fields(info, ADDR_INFO_HEAD, parts)
+    # See iproute2's print_ifa_flags()
+    parts.extend('"%s":true' % name for name in info.flags)
+    if info.unknown_flags:
+        parts.append('"ifa_flags":"%02x"' % info.unknown_flags)
+    _append_fields(info, ADDR_INFO_TAIL, parts)
+    return '{' + ','.join(parts) + '}'
+
+
+def encode(record: Union[IPLink, IPAddr], details: bool = True, link_layer: bool = True) -> str:
+    '''
+    Return the JSON text of one interface, as one item of ``ip -j -d link``
+    (for :py:class:`IPLink`) or ``ip -j -d addr`` (for :py:class:`IPAddr`).
+
+    :param details: False to follow ``ip -j`` instead, without ``-d``.
+    :param link_layer: False to leave out the link type and addresses of :py:class:`IPAddr`
+                       when ``details`` is False, like ``ip -4 addr`` and ``ip -6 addr`` do.
+    '''
+    parts = []
+    if isinstance(record, IPAddr):
+        _append_fields(record, _link_specs(True, details, link_layer), parts)
+        parts.append('"addr_info":[' + ','.join(map(encode_addr_info, record.addr_info)) + ']')
+    else:
+        _append_fields(record, _link_specs(False, details, link_layer), parts)
+    return '{' + ','.join(parts) + '}'
+
+
+def _link_specs(addr: bool, details: bool, link_layer: bool) -> Tuple[Field, ...]:
+    if addr:
+        return ADDR_LINK_FIELDS if details else ADDR_LINK_BRIEF_FIELDS if link_layer else ADDR_LINK_NO_LL_FIELDS
+    return LINK_FIELDS if details else LINK_BRIEF_FIELDS
+
+
+def shown_fields(addr: bool, details: bool = True, link_layer: bool = True) -> Tuple[str, ...]:
+    '''
+    Names of the link fields which :py:func:`encode` writes with these options, for an
+    :py:class:`IPAddr` if ``addr`` is true, else for an :py:class:`IPLink`.
+    The others don't need to be decoded.
+    '''
+    return tuple(name for name, _key, _fmt in _link_specs(addr, details, link_layer))
+
+
+def dump(records: Iterable[Union[IPLink, IPAddr]], fp: TextIO, **options):
+    '''
+    Write the records to ``fp`` as a JSON array, one interface at a time.
+    ``records`` can be a generator, the array is written while it is consumed.
+
+    ``options`` are passed to :py:func:`encode`.
+    '''
+    write = fp.write
+    separator = '['
+    for record in records:
+        # One write per interface, which is one system call if ``fp`` is not buffered
+        write(separator + encode(record, **options))
+        separator = ','
+    write(']\n' if separator == ',' else '[]\n')
+
+
+def dumps(records: Iterable[Union[IPLink, IPAddr]], **options) -> str:
+    ''' Return the records as a JSON array, like :py:func:`dump`. '''
+    return '[' + ','.join(encode(r, **options) for r in records) + ']'
@@ -0,0 +1,288 @@
+'''
+Opt-in instrumentation of the queries of :py:class:`~linetface.Linetface` sessions.
+
+Give a :py:class:`Metrics` to a session, and each of its queries is measured:
+number of netlink messages, bytes and ``recv`` calls, and the wall and CPU time
+of each phase (:py:data:`PHASES`). The totals can be read as a ``dict``, or exported
+in the Prometheus text format, and hooks receive the :py:class:`CallRecord` of every query.
+
+.. code-block:: python
+
+    from linetface import Linetface
+    from linetface.metrics import Metrics
+
+    metrics = Metrics()
+    metrics.add_hook(lambda record: record.wall['recv'] > 0.1 and print('Slow dump', record))
+    with Linetface(metrics=metrics) as lf:
+        lf.get_addrs()
+    print(metrics.to_prometheus())
+
+Sessions without metrics (the default) skip all of it, for the cost of a few attribute lookups per query.
+'''
+
+import time
+import threading
+import dataclasses
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from .rawnl import NLMSGHDR, BatchedSocket, DumpInterrupted
+
+
+# recv: waiting for the kernel and copying its replies (so it includes the time the kernel takes to dump),
+# decode: parsing the messages to records, materialize: building the result from the records.
+PHASES = ('recv', 'decode', 'materialize')
+
+MSG_PEEK = 2
+
+
+def _clocks() -> Tuple[float, float]:
+    return time.perf_counter(), time.thread_time()
+
+
+@dataclass
+class CallRecord:
+    '''
+    What one query did. ``wall`` and ``cpu`` map each of :py:data:`PHASES` to seconds.
+    ``error`` is the exception which ended the query, if any, like
+    :py:class:`~linetface.rawnl.DumpInterrupted` for each dump which had to be done again.
+
+    For the ``iter_*`` methods, which yield as they receive, the ``decode`` time
+    also counts what the caller does between two items.
+    '''
+    operation: str
+    decoder: str
+    messages: int = 0
+    bytes: int = 0
+    recvs: int = 0
+    wall: Dict[str, float] = field(default_factory=dict)
+    cpu: Dict[str, float] = field(default_factory=dict)
+    error: Optional[BaseException] = None
+
+
+class Probe:
+    '''
+    Measures one query: use it as a context manager around the query, :py:meth:`attach`
+    it to the socket, and call :py:meth:`materialize` when the dump is read.
+
+    :meta private:
+    '''
+    __slots__ = ('metrics', 'record', '_start', '_mark', '_recv_wall', '_recv_cpu')
+
+    def __init__(self, metrics: 'Metrics', operation: str, decoder: str):
+        self.metrics = metrics
+        self.record = CallRecord(operation, decoder)
+        self._start = self._mark = None
+        self._recv_wall = self._recv_cpu = 0.0
+
+    def __enter__(self) -> 'Probe':
+        self._start = _clocks()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = _clocks()
+        mark = self._mark or end
+        record = self.record
+        record.wall = {'recv': self._recv_wall, 'decode': mark[0] - self._start[0] - self._recv_wall,
+                       'materialize': end[0] - mark[0]}
+        record.cpu = {'recv': self._recv_cpu, 'decode': mark[1] - self._start[1] - self._recv_cpu,
+                      'materialize': end[1] - mark[1]}
+        # GeneratorExit is how an iterator is closed early, not a failure.
+        if exc is not None and not isinstance(exc, GeneratorExit):
+            record.error = exc
+        self.metrics.add(record)
+
+    def materialize(self):
+        ''' Mark the end of the dump: what follows builds the result. '''
+        self._mark = _clocks()
+
+    def _count(self, data):
+        record = self.record
+        record.bytes += len(data)
+        offset, size = 0, len(data)
+        while offset + NLMSGHDR.size <= size:
+            length = NLMSGHDR.unpack_from(data, offset)[0]
+            if length < NLMSGHDR.size:
+                break
+            record.messages += 1
+            offset += (length + 3) & ~3
+
+    def _timed(self, recv: Callable, batched: bool) -> Callable:
+        def timed_recv(*args):
+            start_wall, start_cpu = _clocks()
+            data = recv(*args)
+            self._recv_wall += time.perf_counter() - start_wall
+            self._recv_cpu += time.thread_time() - start_cpu
+            if len(args) < 2 or not args[1] & MSG_PEEK:
+                self.record.recvs += 1
+                for datagram in (data if batched else (data,)):
+                    self._count(datagram)
+            return data
+        return timed_recv
+
+    @contextmanager
+    def attach(self, sock) -> Iterator:
+        '''
+        Time the system calls which read the socket while in the block.
+
+        :py:mod:`linetface.rawnl` reads with ``recv``, or ``recv_datagrams`` of a
+        :py:class:`~linetface.rawnl.BatchedSocket`, pyroute2 with ``recv_ft``:
+        they are replaced on the instances, then put back.
+        '''
+        targets = [(sock, 'recv', False), (sock, 'recv_ft', False)]
+        if isinstance(sock, BatchedSocket):
+            targets = [(sock, 'recv_datagrams', True), (sock.sock, 'recv', False), (sock.sock, 'recv_ft', False)]
+        saved = []
+        for target, name, batched in targets:
+            if hasattr(target, name):
+                saved.append((target, name, vars(target).get(name)))
+                setattr(target, name, self._timed(getattr(target, name), batched))
+        try:
+            yield sock
+        finally:
+            for target, name, value in saved:
+                if value is None:
+                    delattr(target, name)
+                else:
+                    setattr(target, name, value)
+
+
+class NullProbe:
+    '''
+    What sessions without metrics use instead of a :py:class:`Probe`: it does nothing.
+
+    :meta private:
+    '''
+    __slots__ = ()
+
+    def __enter__(self) -> 'NullProbe':
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+    def materialize(self):
+        pass
+
+    def attach(self, sock) -> 'NullProbe':
+        return self
+
+
+NULL_PROBE = NullProbe()
+
+
+@dataclass
+class OperationTotals:
+    ''' Sums of the :py:class:`CallRecord` of one operation, with one decoder. '''
+    calls: int = 0
+    errors: int = 0
+    interrupted: int = 0
+    messages: int = 0
+    bytes: int = 0
+    recvs: int = 0
+    wall: Dict[str, float] = field(default_factory=lambda: dict.fromkeys(PHASES, 0.0))
+    cpu: Dict[str, float] = field(default_factory=lambda: dict.fromkeys(PHASES, 0.0))
+
+
+# Name, type, help and OperationTotals field of the exported metrics
+_PROMETHEUS_COUNTERS = (
+    ('calls_total', 'Queries made.', 'calls'),
+    ('errors_total', 'Queries which failed.', 'errors'),
+    ('dumps_interrupted_total', 'Queries whose dumps the kernel reported as interrupted.', 'interrupted'),
+    ('messages_total', 'Netlink messages received.', 'messages'),
+    ('received_bytes_total', 'Bytes received from the kernel.', 'bytes'),
+    ('recv_calls_total', 'System calls which read the netlink sockets.', 'recvs'),
+)
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+class Metrics:
+    '''
+    Totals of the queries of the sessions it is given to, by operation (the name of the
+    :py:class:`~linetface.Linetface` method) and decoder. It can be shared between sessions and threads.
+    '''
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._totals: Dict[Tuple[str, str], OperationTotals] = {}
+        self._hooks: List[Callable[[CallRecord], None]] = []
+
+    def probe(self, operation: str, decoder: str) -> Probe:
+        return Probe(self, operation, decoder)
+
+    def add_hook(self, hook: Callable[[CallRecord], None]):
+        '''
+        Call ``hook`` with the :py:class:`CallRecord` of each query, from the thread which made it.
+        Exceptions of hooks are not caught: they are raised by the query.
+        '''
+        with self._lock:
+            self._hooks = self._hooks + [hook]
+
+    def remove_hook(self, hook: Callable[[CallRecord], None]):
+        with self._lock:
+            self._hooks = [h for h in self._hooks if h is not hook]
+
+    def add(self, record: CallRecord):
+        ''' Add a query to the totals, and pass it to the hooks. '''
+        with self._lock:
+            totals = self._totals.get((record.operation, record.decoder))
+            if totals is None:
+                totals = self._totals[(record.operation, record.decoder)] = OperationTotals()
+            totals.calls += 1
+            totals.errors += record.error is not None
+            totals.interrupted += isinstance(record.error, DumpInterrupted)
+            totals.messages += record.messages
+            totals.bytes += record.bytes
+            totals.recvs += record.recvs
+            for phase in PHASES:
+                totals.wall[phase] += record.wall[phase]
+                totals.cpu[phase] += record.cpu[phase]
+            hooks = self._hooks
+        for hook in hooks:
+            hook(record)
+
+    def reset(self):
+        with self._lock:
+            self._totals = {}
+
+    def totals(self) -> Dict[Tuple[str, str], OperationTotals]:
+        ''' Copy of the totals, keyed by (operation, decoder). '''
+        with self._lock:
+            return {k: dataclasses.replace(t, wall=dict(t.wall), cpu=dict(t.cpu)) for k, t in self._totals.items()}
+
+    def as_dict(self) -> Dict[str, Dict[str, dict]]:
+        '''
+        The totals as plain data (for JSON): ``{operation: {decoder: {'calls': ..., 'wall': {phase: seconds}, ...}}}``.
+        '''
+        result: Dict[str, Dict[str, dict]] = {}
+        for (operation, decoder), totals in self.totals().items():
+            result.setdefault(operation, {})[decoder] = vars(totals)
+        return result
+
+    def to_prometheus(self, prefix: str = 'linetface') -> str:
+        '''
+        The totals in the Prometheus text exposition format, labelled by operation and decoder.
+        The times are ``<prefix>_phase_wall_seconds_total`` and ``<prefix>_phase_cpu_seconds_total``,
+        labelled by phase too.
+        '''
+        totals = sorted(self.totals().items())
+        lines = []
+        for name, help_text, attr in _PROMETHEUS_COUNTERS:
+            lines.append('# HELP {}_{} {}'.format(prefix, name, help_text))
+            lines.append('# TYPE {}_{} counter'.format(prefix, name))
+            for (operation, decoder), t in totals:
+                lines.append('{}_{}{{operation="{}",decoder="{}"}} {}'.format(
+                    prefix, name, _escape(operation), _escape(decoder), getattr(t, attr)))
+        for clock in ('wall', 'cpu'):
+            name = '{}_phase_{}_seconds_total'.format(prefix, clock)
+            lines.append('# HELP {} {} time spent in each phase of the queries.'.format(
+                name, 'Elapsed' if clock == 'wall' else 'CPU'))
+            lines.append('# TYPE {} counter'.format(name))
+            for (operation, decoder), t in totals:
+                for phase, seconds in getattr(t, clock).items():
+                    lines.append('{}{{operation="{}",decoder="{}",phase="{}"}} {!r}'.format(
+                        name, _escape(operation), _escape(decoder), phase, seconds))
+        return '\n'.join(lines) + '\n'
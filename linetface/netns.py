@@ -0,0 +1,229 @@
+'''
+Collection from several network namespaces at once.
+
+A netlink socket belongs to the namespace it is created in, whatever the namespace of the
+thread which uses it later. So each namespace gets its own :py:class:`~linetface.Linetface` session,
+whose socket is created by a short-lived thread which moves into that namespace,
+and is kept open for the next polls.
+
+.. code-block:: python
+
+    from linetface.netns import collect_namespaces
+
+    # Names from "ip netns", or paths like /proc/<pid>/ns/net
+    results = collect_namespaces(['blue', 'red', '/proc/4242/ns/net'], workers=8)
+    for ns, addrs in results.items():
+        print(ns, [a.ifname for a in addrs])
+
+Switching namespace needs ``CAP_SYS_ADMIN`` in the user namespace which owns the target,
+that is root, or the owner of an unprivileged user namespace which the caller runs in.
+'''
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Tuple, TypeVar, Union
+
+from .core import IPAddr
+from .hand import Linetface
+
+
+CLONE_NEWNET = 0x40000000
+NETNS_RUN_DIR = '/run/netns'
+
+Namespace = Union[str, int]
+T = TypeVar('T')
+
+
+def netns_path(ns: Namespace) -> str:
+    '''
+    Get the file of a network namespace: an ``int`` is a process ID, a name without "/"
+    is one given to ``ip netns add``, anything else is already a path.
+    '''
+    if isinstance(ns, int):
+        return '/proc/{}/ns/net'.format(ns)
+    if '/' not in ns:
+        return os.path.join(NETNS_RUN_DIR, ns)
+    return ns
+
+
+def _libc_setns(fd: int, nstype: int):
+    import ctypes
+    libc = ctypes.CDLL(None, use_errno=True)
+    if libc.setns(fd, nstype) != 0:
+        err = ctypes.get_errno()
+        raise OSError(err, os.strerror(err))
+
+
+# os.setns() only comes with Python 3.12
+setns = getattr(os, 'setns', _libc_setns)
+
+
+def call_in(path: str, func: Callable[[], T]) -> T:
+    '''
+    Call ``func`` from a new thread which moves into the network namespace at ``path``,
+    and return its result.
+
+    The thread ends there, instead of going back: coming back to the first namespace
+    needs privileges over it too, which a process in an unprivileged user namespace doesn't have.
+    And the thread of the caller is never left in the wrong namespace.
+    '''
+    outcome = []
+
+    def run():
+        try:
+            with open(path) as target:
+                setns(target.fileno(), CLONE_NEWNET)
+            outcome.append((True, func()))
+        except BaseException as e:
+            outcome.append((False, e))
+
+    thread = threading.Thread(target=run, name='linetface-setns')
+    thread.start()
+    thread.join()
+    ok, value = outcome[0]
+    if not ok:
+        raise value
+    return value
+
+
+def netns_id(path: str) -> Tuple[int, int]:
+    ''' What identifies a namespace: the device and inode of its nsfs file. '''
+    st = os.stat(path)
+    return st.st_dev, st.st_ino
+
+
+class NamespaceCollector:
+    '''
+    Poll several network namespaces in parallel, from a pool of ``workers`` threads.
+
+    Each namespace gets a :py:class:`~linetface.Linetface` session of one socket, opened
+    on first use and reused by the next calls of :py:meth:`collect`. If the file of a namespace
+    now points to another one (the process behind ``/proc/<pid>/ns/net`` is gone and its PID reused,
+    or ``ip netns`` deleted and added it again), the session is opened again.
+
+    The threads spend most of their time waiting for the kernel, with the GIL released,
+    and the sockets can't be shared with other processes, hence threads rather than processes.
+    '''
+    def __init__(self, workers: int = 4, decoder: str = 'fast'):
+        if workers < 1:
+            raise ValueError('workers must be at least 1')
+        self.decoder = decoder
+        self.errors: Dict[Namespace, Exception] = {}
+        self.workers = workers
+        self._executor = ThreadPoolExecutor(workers, thread_name_prefix='linetface-netns')
+        self._lock = threading.Lock()
+        self._sessions: Dict[str, Tuple[Tuple[int, int], Linetface]] = {}
+
+    def __enter__(self) -> 'NamespaceCollector':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def session(self, ns: Namespace) -> Linetface:
+        '''
+        Return the session of a namespace, creating it if needed.
+
+        :raise OSError: If the namespace doesn't exist (any more).
+        '''
+        path = netns_path(ns)
+        ident = netns_id(path)
+        with self._lock:
+            cached = self._sessions.get(path)
+            if cached is not None and cached[0] == ident:
+                return cached[1]
+            stale = self._sessions.pop(path, None)
+        if stale is not None:
+            stale[1].close()
+        new = Linetface(pool_size=1, decoder=self.decoder, netns=path)
+        with self._lock:
+            # Another thread may have got there first
+            cached = self._sessions.setdefault(path, (ident, new))
+        if cached[1] is not new:
+            new.close()
+        return cached[1]
+
+    def resize(self, workers: int):
+        '''
+        Change the number of threads. The sessions are kept, the queries already submitted
+        finish on the old threads.
+        '''
+        if workers < 1:
+            raise ValueError('workers must be at least 1')
+        with self._lock:
+            if workers == self.workers:
+                return
+            old = self._executor
+            self.workers = workers
+            self._executor = ThreadPoolExecutor(workers, thread_name_prefix='linetface-netns')
+        old.shutdown(wait=False)
+
+    def _query(self, ns: Namespace, query: Callable[[Linetface], T]) -> T:
+        return query(self.session(ns))
+
+    def collect(self, namespaces: Iterable[Namespace],
+                query: Callable[[Linetface], T] = lambda s: s.get_addrs()) -> Dict[Namespace, T]:
+        '''
+        Run ``query`` against the session of each namespace, in parallel, and return
+        the results keyed by the namespaces as they are given. By default, that is
+        :py:meth:`~linetface.Linetface.get_addrs`.
+
+        The namespaces which couldn't be queried are left out of the results,
+        their exceptions are put in :py:attr:`errors` instead.
+        '''
+        with self._lock:
+            # Not to submit to an executor which resize() is shutting down
+            futures = {ns: self._executor.submit(self._query, ns, query) for ns in namespaces}
+        results = {}
+        errors = {}
+        for ns, future in futures.items():
+            try:
+                results[ns] = future.result()
+            except Exception as e:
+                errors[ns] = e
+        self.errors = errors
+        return results
+
+    def forget(self, ns: Namespace):
+        ''' Close the session of a namespace which won't be polled again. '''
+        with self._lock:
+            cached = self._sessions.pop(netns_path(ns), None)
+        if cached is not None:
+            cached[1].close()
+
+    def close(self):
+        self._executor.shutdown()
+        with self._lock:
+            sessions, self._sessions = self._sessions, {}
+        for _ident, session in sessions.values():
+            session.close()
+
+
+_default_collector = None
+_default_collector_lock = threading.Lock()
+
+
+def default_collector(workers: int = 4) -> NamespaceCollector:
+    '''
+    Return the :py:class:`NamespaceCollector` used by :py:func:`collect_namespaces`,
+    creating it on first use, with ``workers`` threads. It is resized if ``workers`` changes.
+    '''
+    global _default_collector
+    with _default_collector_lock:
+        if _default_collector is None:
+            _default_collector = NamespaceCollector(workers)
+        else:
+            _default_collector.resize(workers)
+        return _default_collector
+
+
+def collect_namespaces(names_or_paths: Iterable[Namespace], workers: int = 4) -> Dict[Namespace, Tuple[IPAddr, ...]]:
+    '''
+    Return the result of ``ip -j -d addr`` in each of the given network namespaces.
+    See :py:func:`netns_path` for how they are given.
+
+    The sessions are kept by :py:func:`default_collector` for the next calls, and the errors
+    of the namespaces left out are in its ``errors``.
+    '''
+    return default_collector(workers).collect(names_or_paths)
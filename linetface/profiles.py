@@ -0,0 +1,90 @@
+'''
+Dump profiles: what the kernel is asked to put in the link messages, and which
+:py:class:`~linetface.core.IPLink` fields are filled from them.
+
+The kernel only lets ``IFLA_EXT_MASK`` add or leave out some blocks of the messages:
+
+- ``RTEXT_FILTER_SKIP_STATS`` leaves out the per-protocol statistics of ``IFLA_AF_SPEC``
+  (the IPv6 counters and ICMPv6 counters, about a quarter of each message) and the
+  statistics of the SR-IOV virtual functions. ``IFLA_STATS`` and ``IFLA_STATS64`` are always sent.
+- ``RTEXT_FILTER_VF`` adds ``IFLA_VFINFO_LIST``, the configuration of each virtual function,
+  which can be kilobytes per link on SR-IOV hosts.
+
+The other attributes are always sent. The fields which are not in the profile are left to ``None``,
+which saves decoding them.
+
+.. code-block:: python
+
+    from linetface import Linetface
+
+    with Linetface(decoder='fast', profile='minimal') as lf:
+        for link in lf.get_links():
+            print(link.ifname, link.operstate, link.address)
+'''
+
+import dataclasses
+from typing import Any, Callable, Dict, FrozenSet, Iterable, Optional, Union
+
+from .core import IPLink
+from .rawnl import LINK_FIELDS, RTEXT_FILTER_VF, RTEXT_FILTER_SKIP_STATS, AttrTable
+
+
+# Fields which are needed to look up links and join them with their addresses
+KEY_FIELDS = frozenset(('ifindex', 'ifname'))
+
+
+def _absent(data: bytes, t: AttrTable, header: tuple) -> None:
+    return None
+
+
+class DumpProfile:
+    '''
+    The ``IFLA_EXT_MASK`` of the link requests, and the :py:class:`~linetface.core.IPLink` fields to fill.
+
+    :param fields: Names of the fields, all of them if ``None``. ``ifindex`` and ``ifname`` are always filled.
+    '''
+    __slots__ = ('name', 'ext_mask', 'fields', 'omitted', 'link_fields')
+
+    def __init__(self, name: str, ext_mask: Optional[int], fields: Optional[Iterable[str]] = None):
+        known = frozenset(f.name for f in dataclasses.fields(IPLink))
+        fields = known if fields is None else frozenset(fields) | KEY_FIELDS
+        unknown = fields - known
+        if unknown:
+            raise ValueError('Unknown IPLink fields: {}'.format(', '.join(sorted(unknown))))
+        self.name = name
+        self.ext_mask = ext_mask
+        self.fields: FrozenSet[str] = fields
+        self.omitted = tuple(sorted(known - fields))
+        #: How the fast decoder gets each field, see :py:func:`linetface.rawnl.decode_link`
+        self.link_fields: Dict[str, Callable[[bytes, AttrTable, tuple], Any]] = {
+            name: decode if name in fields else _absent for name, decode in LINK_FIELDS.items()}
+
+    def __repr__(self):
+        return '<DumpProfile {}>'.format(self.name)
+
+    def restrict(self, link: IPLink) -> IPLink:
+        ''' Clear the fields of a decoded link which are not in the profile. '''
+        for name in self.omitted:
+            setattr(link, name, None)
+        return link
+
+
+PROFILES: Dict[str, DumpProfile] = {p.name: p for p in (
+    # Everything the kernel has, like "ip -s -d link", although IPLink has no field for the statistics
+    DumpProfile('full', RTEXT_FILTER_VF),
+    # What "ip -j -d link" shows
+    DumpProfile('ip-compatible', RTEXT_FILTER_SKIP_STATS),
+    # Enough to tell what a link is and whether it is up
+    DumpProfile('minimal', RTEXT_FILTER_SKIP_STATS,
+                ('ifindex', 'ifname', 'flags', 'mtu', 'operstate', 'link_type', 'address')),
+)}
+
+
+def get_profile(profile: Union[str, DumpProfile]) -> DumpProfile:
+    ''' Look up a profile of :py:data:`PROFILES` by name. Profiles are returned as they are. '''
+    if isinstance(profile, DumpProfile):
+        return profile
+    try:
+        return PROFILES[profile]
+    except KeyError:
+        raise ValueError('profile must be one of {}'.format(', '.join(PROFILES))) from None
@@ -0,0 +1,863 @@
+'''
+Decoder for raw rtnetlink messages, which doesn't go through pyroute2.
+
+It walks each RTM_NEWLINK/RTM_NEWADDR message once with :py:func:`struct.unpack_from`,
+noting where every attribute is, then builds :py:class:`~linetface.core.IPLink` and
+:py:class:`~linetface.core.AddrInfo` straight from that table. It is used by
+:py:class:`~linetface.Linetface` sessions created with ``decoder='fast'``.
+
+With ``decoder='lazy'``, the records keep the raw message instead, and decode
+each field when it is first read (see :py:class:`LazyIPLink`).
+'''
+
+import os
+import errno
+import socket
+import struct
+import itertools
+import dataclasses
+from ipaddress import IPv4Address, IPv6Address, IPv4Network, IPv6Network
+from typing import Any, Dict, Tuple, Optional, Iterator, Iterable, Callable
+
+from .core import IPCommonInfo, IPLink, IPAddr, AddrInfo, LinuxMAC, Route, Nexthop, Neighbor
+from .consts import OperState, LinkType, LinkMode, Inet6AddrGenMode, AddressFamily, RTScope, \
+    RouteType, RouteProtocol, NUDState, decode_link_flags, decode_ifa_flags
+
+
+SOL_NETLINK = 270
+NETLINK_GET_STRICT_CHK = 12
+
+NLMSG_ERROR = 2
+NLMSG_DONE = 3
+NLM_F_REQUEST = 0x01
+NLM_F_MULTI = 0x02
+NLM_F_DUMP_INTR = 0x10
+NLM_F_DUMP = 0x300
+NLA_TYPE_MASK = 0x3FFF
+
+RTM_NEWLINK = 16
+RTM_GETLINK = 18
+RTM_NEWADDR = 20
+RTM_GETADDR = 22
+RTM_NEWROUTE = 24
+RTM_GETROUTE = 26
+RTM_NEWNEIGH = 28
+RTM_GETNEIGH = 30
+RTM_NEWSTATS = 92
+RTM_GETSTATS = 94
+
+AF_INET = 2
+AF_INET6 = 10
+
+IFLA_ADDRESS = 1
+IFLA_BROADCAST = 2
+IFLA_IFNAME = 3
+IFLA_MTU = 4
+IFLA_QDISC = 6
+IFLA_TXQLEN = 13
+IFLA_OPERSTATE = 16
+IFLA_LINKMODE = 17
+IFLA_AF_SPEC = 26
+IFLA_GROUP = 27
+IFLA_EXT_MASK = 29
+IFLA_PROMISCUITY = 30
+IFLA_NUM_TX_QUEUES = 31
+IFLA_NUM_RX_QUEUES = 32
+IFLA_GSO_MAX_SEGS = 40
+IFLA_GSO_MAX_SIZE = 41
+IFLA_MIN_MTU = 50
+IFLA_MAX_MTU = 51
+IFLA_INET6_ADDR_GEN_MODE = 8
+
+# Values of IFLA_EXT_MASK
+RTEXT_FILTER_VF = 1 << 0
+RTEXT_FILTER_SKIP_STATS = 1 << 3
+
+IFA_ADDRESS = 1
+IFA_LOCAL = 2
+IFA_LABEL = 3
+IFA_BROADCAST = 4
+IFA_CACHEINFO = 6
+IFA_FLAGS = 8
+
+IFLA_STATS_LINK_64 = 1
+
+RTA_DST = 1
+RTA_OIF = 4
+RTA_GATEWAY = 5
+RTA_PRIORITY = 6
+RTA_PREFSRC = 7
+RTA_MULTIPATH = 9
+RTA_TABLE = 15
+
+NDA_DST = 1
+NDA_LLADDR = 2
+NDA_PROBES = 4
+NDA_IFINDEX = 8
+NTF_ROUTER = 0x80
+
+# The kernel puts at most 32 KiB of a dump in each datagram, unless one message is bigger
+# (a link with many SR-IOV virtual functions).
+RCVBUF = 1 << 16
+SO_RCVBUFFORCE = 33
+MSG_WAITFORONE = 0x10000
+
+NLMSGHDR = struct.Struct('IHHII')
+NLAHDR = struct.Struct('HH')
+IFINFOMSG = struct.Struct('BxHiII')
+IFADDRMSG = struct.Struct('BBBBI')
+IF_STATS_MSG = struct.Struct('BBHII')
+RTMSG = struct.Struct('BBBBBBBBI')
+RTNEXTHOP = struct.Struct('HBBi')
+NDMSG = struct.Struct('BxxxiHBB')
+CACHEINFO = struct.Struct('II')
+_u8 = struct.Struct('B').unpack_from
+_U32 = struct.Struct('I')
+_u32 = _U32.unpack_from
+_i32 = struct.Struct('i').unpack_from
+
+# By the kernel's IF_OPER_* values
+OPERSTATES = dict(enumerate(OperState(s) for s in ('UNKNOWN', 'NOTPRESENT', 'DOWN', 'LOWERLAYERDOWN',
+                                                   'TESTING', 'DORMANT', 'UP')))
+# Calling an Enum class to look up a member is slow, so keep the maps at hand.
+# Unknown values still go through the class call, to raise the same error.
+LINK_TYPES = {m.value: m for m in LinkType}
+FAMILIES = {m.value: m for m in AddressFamily}
+SCOPES = {m.value: m for m in RTScope}
+ROUTE_TYPES = {m.value: m for m in RouteType}
+PROTOCOLS = {m.value: m for m in RouteProtocol}
+NUD_STATES = {m.value: m for m in NUDState}
+
+AttrTable = Dict[int, Tuple[int, int]]
+
+
+def member(members: dict, enum_class, value):
+    found = members.get(value)
+    return found if found is not None else enum_class(value)
+
+
+_sequence = itertools.count(1)
+
+
+def attr_table(data: bytes, offset: int, end: int) -> AttrTable:
+    '''
+    Map each attribute type, found between ``offset`` and ``end``, to the start and end of its payload.
+    '''
+    table = {}
+    unpack = NLAHDR.unpack_from
+    while offset + 4 <= end:
+        length, kind = unpack(data, offset)
+        if length < 4:
+            break
+        table[kind & NLA_TYPE_MASK] = (offset + 4, offset + length)
+        offset += (length + 3) & ~3
+    return table
+
+
+def get_u32(data: bytes, table: AttrTable, kind: int) -> Optional[int]:
+    pos = table.get(kind)
+    return _u32(data, pos[0])[0] if pos else None
+
+
+def get_u8(data: bytes, table: AttrTable, kind: int) -> Optional[int]:
+    pos = table.get(kind)
+    return _u8(data, pos[0])[0] if pos else None
+
+
+def get_str(data: bytes, table: AttrTable, kind: int) -> Optional[str]:
+    pos = table.get(kind)
+    if not pos:
+        return None
+    return bytes(data[pos[0]:pos[1]]).partition(b'\0')[0].decode()
+
+
+def get_mac(data: bytes, table: AttrTable, kind: int) -> Optional[LinuxMAC]:
+    pos = table.get(kind)
+    if not pos:
+        return None
+    return LinuxMAC(bytes(data[pos[0]:pos[1]]))
+
+
+def inet6_addr_gen_mode(data: bytes, table: AttrTable) -> Optional[Inet6AddrGenMode]:
+    pos = table.get(IFLA_AF_SPEC)
+    if not pos:
+        return None
+    inet6 = attr_table(data, *pos).get(AF_INET6)
+    if not inet6:
+        return None
+    mode = get_u8(data, attr_table(data, *inet6), IFLA_INET6_ADDR_GEN_MODE)
+    return Inet6AddrGenMode(mode) if mode is not None else None
+
+
+def u32_field(kind: int) -> Callable:
+    return lambda data, t, header: get_u32(data, t, kind)
+
+
+def str_field(kind: int) -> Callable:
+    return lambda data, t, header: get_str(data, t, kind)
+
+
+def mac_field(kind: int) -> Callable:
+    return lambda data, t, header: get_mac(data, t, kind)
+
+
+def linkmode_field(data: bytes, t: AttrTable, header: tuple) -> Optional[LinkMode]:
+    linkmode = get_u8(data, t, IFLA_LINKMODE)
+    return LinkMode(linkmode) if linkmode is not None else None
+
+
+def group_field(data: bytes, t: AttrTable, header: tuple) -> str:
+    group = get_u32(data, t, IFLA_GROUP)
+    return str(group) if group != 0 else 'default'
+
+
+# How to get each IPLink field from the ifinfomsg header (family, type, index, flags, change)
+# and the attribute table of a RTM_NEWLINK message.
+LINK_FIELDS: Dict[str, Callable[[bytes, AttrTable, tuple], Any]] = {
+    'ifindex': lambda data, t, header: header[2],
+    'ifname': str_field(IFLA_IFNAME),
+    'flags': lambda data, t, header: decode_link_flags(header[3]),
+    'mtu': u32_field(IFLA_MTU),
+    'qdisc': str_field(IFLA_QDISC),
+    'operstate': lambda data, t, header: member(OPERSTATES, OperState,
+                                                get_u8(data, t, IFLA_OPERSTATE) or 0),
+    'linkmode': linkmode_field,
+    'group': group_field,
+    'txqlen': u32_field(IFLA_TXQLEN),
+    'link_type': lambda data, t, header: member(LINK_TYPES, LinkType, header[1]),
+    'address': mac_field(IFLA_ADDRESS),
+    'broadcast': mac_field(IFLA_BROADCAST),
+    'promiscuity': u32_field(IFLA_PROMISCUITY),
+    'min_mtu': u32_field(IFLA_MIN_MTU),
+    'max_mtu': u32_field(IFLA_MAX_MTU),
+    'inet6_addr_gen_mode': lambda data, t, header: inet6_addr_gen_mode(data, t),
+    'num_tx_queues': u32_field(IFLA_NUM_TX_QUEUES),
+    'num_rx_queues': u32_field(IFLA_NUM_RX_QUEUES),
+    'gso_max_size': u32_field(IFLA_GSO_MAX_SIZE),
+    'gso_max_segs': u32_field(IFLA_GSO_MAX_SEGS),
+}
+
+
+def decode_link(data: bytes, offset: int, end: int,
+                fields: Dict[str, Callable[[bytes, AttrTable, tuple], Any]] = LINK_FIELDS) -> IPLink:
+    '''
+    Build :py:class:`IPLink` from the RTM_NEWLINK payload between ``offset`` and ``end``
+    (the part after the netlink header).
+
+    :param fields: How to get each field, like :py:data:`LINK_FIELDS`
+                   (see :py:attr:`linetface.profiles.DumpProfile.link_fields`).
+    '''
+    header = IFINFOMSG.unpack_from(data, offset)
+    t = attr_table(data, offset + IFINFOMSG.size, end)
+    return IPLink(**{name: decode(data, t, header) for name, decode in fields.items()})
+
+
+# Attributes which the IPLink fields are decoded from. IFLA_AF_SPEC is not kept by lazy records,
+# because it is big and only one byte of it is used.
+LINK_ATTRS = frozenset((IFLA_ADDRESS, IFLA_BROADCAST, IFLA_IFNAME, IFLA_MTU, IFLA_QDISC, IFLA_TXQLEN,
+                        IFLA_OPERSTATE, IFLA_LINKMODE, IFLA_GROUP, IFLA_PROMISCUITY, IFLA_NUM_TX_QUEUES,
+                        IFLA_NUM_RX_QUEUES, IFLA_GSO_MAX_SEGS, IFLA_GSO_MAX_SIZE, IFLA_MIN_MTU, IFLA_MAX_MTU))
+
+
+class LazyRecord:
+    '''
+    Base for records which keep the raw message and decode each field on first access.
+
+    They compare equal to, and have the same ``repr()`` and ``to_dict()`` as,
+    the eagerly decoded record of the same data. :py:func:`dataclasses.replace` returns
+    an eagerly decoded record, with all the fields read from the lazy one.
+    '''
+    __slots__ = ()
+    _record_class: type
+    _fields: Dict[str, Callable[[bytes, AttrTable, tuple], Any]]
+
+    def __new__(cls, *args, **fields):
+        # dataclasses.replace() builds the new record with the fields as keyword arguments
+        if fields:
+            return cls._record_class(*args, **fields)
+        return super().__new__(cls)
+
+    def __getattr__(self, name: str):
+        # Only called when the field hasn't been decoded yet
+        decode = self._fields.get(name) if not name.startswith('_') else None
+        if decode is None:
+            raise AttributeError(name)
+        # The attribute table is built on the first read of a field, then kept for the next ones.
+        try:
+            t = self._table
+        except AttributeError:
+            t = self._table = attr_table(self._raw, IFINFOMSG.size, len(self._raw))
+        value = decode(self._raw, t, self._header)
+        # Store it in the slot of the record class, so that next reads don't come here.
+        setattr(self, name, value)
+        return value
+
+    def _values(self) -> tuple:
+        return tuple(getattr(self, f.name) for f in dataclasses.fields(self._record_class))
+
+    def __eq__(self, other):
+        if not isinstance(other, self._record_class):
+            return NotImplemented
+        return self._values() == tuple(getattr(other, f.name) for f in dataclasses.fields(self._record_class))
+
+    def __repr__(self):
+        values = ('{}={!r}'.format(f.name, v) for f, v in zip(dataclasses.fields(self._record_class),
+                                                             self._values()))
+        return '{}({})'.format(self._record_class.__qualname__, ', '.join(values))
+
+
+def lazy_gen_mode_field(data: bytes, t: AttrTable, header: tuple) -> Optional[Inet6AddrGenMode]:
+    # The raw mode is kept after the ifinfomsg fields
+    return Inet6AddrGenMode(header[5]) if header[5] is not None else None
+
+
+class LazyIPLink(LazyRecord, IPLink):
+    '''
+    :py:class:`~linetface.core.IPLink` which decodes its fields on first access.
+
+    It keeps a compact copy of the RTM_NEWLINK message, with only the attributes needed for its fields.
+    '''
+    __slots__ = ('_raw', '_header', '_table')
+    _record_class = IPLink
+    _fields = dict(LINK_FIELDS, inet6_addr_gen_mode=lazy_gen_mode_field)
+
+    def __init__(self, data: bytes, offset: int, end: int):
+        kept = [data[offset:offset + IFINFOMSG.size]]
+        gen_mode = None
+        pos = offset + IFINFOMSG.size
+        while pos + 4 <= end:
+            length, kind = NLAHDR.unpack_from(data, pos)
+            if length < 4:
+                break
+            aligned = (length + 3) & ~3
+            kind &= NLA_TYPE_MASK
+            if kind in LINK_ATTRS:
+                kept.append(data[pos:pos + aligned])
+            elif kind == IFLA_AF_SPEC:
+                inet6 = attr_table(data, pos + 4, pos + length).get(AF_INET6)
+                if inet6:
+                    gen_mode = get_u8(data, attr_table(data, *inet6), IFLA_INET6_ADDR_GEN_MODE)
+            pos += aligned
+        self._raw = b''.join(kept)
+        self._header = IFINFOMSG.unpack_from(self._raw, 0) + (gen_mode,)
+
+    def join(self, addr_info: Iterable[AddrInfo]) -> 'LazyIPAddr':
+        ''' Build the lazy ``ip -j -d addr`` record of this link. '''
+        return LazyIPAddr(self, addr_info)
+
+    def to_message(self) -> bytes:
+        '''
+        The compact copy as a RTM_NEWLINK message, which decodes to the same link.
+        ``IFLA_AF_SPEC`` only keeps the IPv6 address generation mode.
+        '''
+        body = self._raw
+        gen_mode = self._header[5]
+        if gen_mode is not None:
+            body += nla(IFLA_AF_SPEC, nla(AF_INET6, nla(IFLA_INET6_ADDR_GEN_MODE, bytes((gen_mode,)))))
+        return NLMSGHDR.pack(NLMSGHDR.size + len(body), RTM_NEWLINK, 0, 0, 0) + body
+
+
+class LazyIPAddr(LazyRecord, IPAddr):
+    '''
+    :py:class:`~linetface.core.IPAddr` which decodes its link fields on first access.
+    '''
+    __slots__ = ('_raw', '_header', '_table')
+    _record_class = IPAddr
+    _fields = {f.name: LazyIPLink._fields[f.name] for f in dataclasses.fields(IPCommonInfo)}
+
+    def __init__(self, link: LazyIPLink, addr_info: Iterable[AddrInfo]):
+        # Share the raw message, and what has been decoded so far, with the link.
+        self._raw = link._raw
+        self._header = link._header
+        try:
+            self._table = link._table
+        except AttributeError:
+            pass
+        for name in self._fields:
+            try:
+                # Read the slot directly, not to trigger decoding
+                setattr(self, name, getattr(IPCommonInfo, name).__get__(link))
+            except AttributeError:
+                pass
+        self.addr_info = tuple(addr_info)
+
+
+def get_ip(data: bytes, table: AttrTable, kind: int):
+    pos = table.get(kind)
+    if not pos:
+        return None
+    raw = bytes(data[pos[0]:pos[1]])
+    return IPv4Address(raw) if len(raw) == 4 else IPv6Address(raw)
+
+
+def decode_addr(data: bytes, offset: int, end: int) -> Tuple[int, AddrInfo]:
+    '''
+    Build :py:class:`AddrInfo` from the RTM_NEWADDR payload between ``offset`` and ``end``.
+
+    :return: Index of the interface and the address.
+    '''
+    family, prefixlen, ifa_flags, scope, index = IFADDRMSG.unpack_from(data, offset)
+    t = attr_table(data, offset + IFADDRMSG.size, end)
+    # Kernel doesn't send IFA_LOCAL for IPv6 addresses, the IFA_ADDRESS is the local one then.
+    local = get_ip(data, t, IFA_LOCAL) or get_ip(data, t, IFA_ADDRESS)
+    cache_info = t.get(IFA_CACHEINFO)
+    preferred_life_time, valid_life_time = CACHEINFO.unpack_from(data, cache_info[0]) \
+        if cache_info else (None, None)
+    full_flags = get_u32(data, t, IFA_FLAGS)
+    flags, unknown_flags = decode_ifa_flags(family, full_flags if full_flags is not None else ifa_flags)
+    return index, AddrInfo(
+        family=member(FAMILIES, AddressFamily, family),
+        local=local,
+        prefixlen=prefixlen,
+        broadcast=get_ip(data, t, IFA_BROADCAST),
+        scope=member(SCOPES, RTScope, scope),
+        dynamic='dynamic' in flags,
+        mngtmpaddr='mngtmpaddr' in flags,
+        noprefixroute='noprefixroute' in flags,
+        label=get_str(data, t, IFA_LABEL),
+        valid_life_time=valid_life_time,
+        preferred_life_time=preferred_life_time,
+        flags=flags,
+        unknown_flags=unknown_flags
+    )
+
+
+def iter_messages(data: bytes) -> Iterator[Tuple[int, int, int, int, int]]:
+    '''
+    Split a received buffer to netlink messages.
+
+    :return: Iterator of (type, flags, sequence number, payload start, payload end).
+    '''
+    offset = 0
+    size = len(data)
+    while offset + NLMSGHDR.size <= size:
+        length, msg_type, flags, seq, _pid = NLMSGHDR.unpack_from(data, offset)
+        if length < NLMSGHDR.size:
+            break
+        if offset + length > size:
+            raise ValueError('Netlink message of {} bytes at offset {} is cut at {} bytes, '
+                             'the datagram was truncated'.format(length, offset, size))
+        yield msg_type, flags, seq, offset + NLMSGHDR.size, offset + length
+        offset += (length + 3) & ~3
+
+
+def open_socket() -> socket.socket:
+    '''
+    Open a blocking rtnetlink socket, without pyroute2, on which the kernel applies
+    the filters of dump requests (see :py:func:`linetface.hand.open_socket`).
+    '''
+    sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW | socket.SOCK_CLOEXEC, socket.NETLINK_ROUTE)
+    sock.bind((0, 0))
+    try:
+        sock.setsockopt(SOL_NETLINK, NETLINK_GET_STRICT_CHK, 1)
+    except OSError:
+        pass
+    return sock
+
+
+class DumpInterrupted(Exception):
+    '''
+    The kernel flagged a dump with ``NLM_F_DUMP_INTR``: its table changed while it was dumped,
+    so the result may miss entries, or have stale ones. It is raised once the dump is read
+    to its end, so the socket can be used again.
+    '''
+
+
+def set_rcvbuf(sock, size: int):
+    '''
+    Set the receive buffer of a socket. Beyond ``net.core.rmem_max``, it needs ``CAP_NET_ADMIN``,
+    without it the kernel caps the size.
+    '''
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, SO_RCVBUFFORCE, size)
+    except OSError:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, size)
+
+
+def _recvmmsg():
+    ''' The ``recvmmsg`` function of the C library, with the structures it takes, or ``None``. '''
+    import ctypes
+
+    class iovec(ctypes.Structure):
+        _fields_ = [('iov_base', ctypes.c_void_p), ('iov_len', ctypes.c_size_t)]
+
+    class msghdr(ctypes.Structure):
+        _fields_ = [('msg_name', ctypes.c_void_p), ('msg_namelen', ctypes.c_uint32),
+                    ('msg_iov', ctypes.POINTER(iovec)), ('msg_iovlen', ctypes.c_size_t),
+                    ('msg_control', ctypes.c_void_p), ('msg_controllen', ctypes.c_size_t),
+                    ('msg_flags', ctypes.c_int)]
+
+    class mmsghdr(ctypes.Structure):
+        _fields_ = [('msg_hdr', msghdr), ('msg_len', ctypes.c_uint)]
+
+    try:
+        func = ctypes.CDLL(None, use_errno=True).recvmmsg
+    except AttributeError:
+        return None
+    func.argtypes = (ctypes.c_int, ctypes.POINTER(mmsghdr), ctypes.c_uint, ctypes.c_int, ctypes.c_void_p)
+    return ctypes, func, iovec, mmsghdr
+
+
+class BatchedSocket:
+    '''
+    Wrapper of a netlink socket (a :py:class:`socket.socket` or a pyroute2 one) whose
+    :py:meth:`recv` takes the datagrams of a dump by batches of ``batch``, with one ``recvmmsg``
+    system call, instead of one ``recv`` each. The kernel prepares the next datagram of a dump
+    as soon as one is read, so a batch is usually full.
+
+    The datagrams are received in a buffer of ``batch`` slots of :py:data:`RCVBUF` bytes,
+    allocated once, and :py:meth:`recv` returns copies of them. Other calls go to the socket.
+    Without ``recvmmsg`` (not Linux, or no ``fileno``), it reads one datagram at a time.
+
+    Only :py:mod:`linetface.rawnl` reads through :py:meth:`recv`, pyroute2 reads the socket
+    by itself.
+    '''
+    _recvmmsg = None
+
+    def __init__(self, sock, batch: int = 16):
+        if batch < 1:
+            raise ValueError('batch must be at least 1')
+        self.sock = sock
+        self.batch = batch
+        self._pending = []
+        # The buffer and the ctypes structures which point to it, created on first use
+        self._slots = None
+        if BatchedSocket._recvmmsg is None:
+            BatchedSocket._recvmmsg = _recvmmsg() or False
+
+    def __getattr__(self, name: str):
+        return getattr(self.sock, name)
+
+    def recv(self, bufsize: int = RCVBUF, flags: int = 0):
+        if flags or self._recvmmsg is False or self.batch == 1:
+            return self.sock.recv(bufsize, flags)
+        if not self._pending:
+            self._pending = self.recv_datagrams()
+            self._pending.reverse()
+        return self._pending.pop()
+
+    def recv_datagrams(self) -> list:
+        '''
+        Wait for a datagram, and return it with the ones which are already there, up to ``batch``.
+        '''
+        ctypes, recvmmsg, iovec, mmsghdr = self._recvmmsg
+        count = self.batch
+        if self._slots is None:
+            array = (ctypes.c_char * (count * RCVBUF))()
+            base = ctypes.addressof(array)
+            iovecs = (iovec * count)(*((base + i * RCVBUF, RCVBUF) for i in range(count)))
+            headers = (mmsghdr * count)()
+            for i in range(count):
+                headers[i].msg_hdr.msg_iov = ctypes.pointer(iovecs[i])
+                headers[i].msg_hdr.msg_iovlen = 1
+            self._slots = memoryview(array).cast('B'), iovecs, headers
+        view, _iovecs, headers = self._slots
+        while True:
+            # With MSG_TRUNC, msg_len is the length of the datagram even if it didn't fit.
+            received = recvmmsg(self.sock.fileno(), headers, count, MSG_WAITFORONE | socket.MSG_TRUNC, None)
+            if received >= 0:
+                break
+            err = ctypes.get_errno()
+            # Retry when interrupted by a signal, like the methods of socket.socket
+            if err != errno.EINTR:
+                raise OSError(err, os.strerror(err))
+        datagrams = []
+        for i in range(received):
+            length = headers[i].msg_len
+            if headers[i].msg_hdr.msg_flags & socket.MSG_TRUNC:
+                # Its end is lost, and so is the dump
+                raise OSError(errno.EMSGSIZE, 'Datagram of {} bytes truncated to {}'.format(length, RCVBUF))
+            # Copied out, as the slots are used again by the next call
+            datagrams.append(bytes(view[i * RCVBUF:i * RCVBUF + length]))
+        return datagrams
+
+
+def is_last(msg_type: int, msg_flags: int) -> bool:
+    return msg_type in (NLMSG_DONE, NLMSG_ERROR) or not msg_flags & NLM_F_MULTI
+
+
+def drain(sock, seq: int, messages: Iterator[Tuple[int, int, int, int, int]]):
+    '''
+    Read and drop the rest of the reply ``seq``, from the messages left in the current buffer
+    (``messages``), then from the socket. Until a dump is read to its end, the kernel
+    refuses to start another one on the same socket.
+    '''
+    while True:
+        for msg_type, msg_flags, msg_seq, _start, _end in messages:
+            if msg_seq == seq and is_last(msg_type, msg_flags):
+                return
+        messages = iter_messages(sock.recv(RCVBUF))
+
+
+def request(sock, msg_type: int, body: bytes, flags: int = NLM_F_REQUEST | NLM_F_DUMP,
+            ignored: Tuple[int, ...] = ()) -> Iterator[Tuple[bytes, int, int, int]]:
+    '''
+    Send a request on a netlink socket and yield the messages of the reply,
+    until the end of dump.
+
+    ``sock`` is a :py:class:`socket.socket`, a pyroute2 socket or a :py:class:`BatchedSocket`.
+    If the iterator is closed before the end (the caller stops early), the rest of the reply
+    is read and dropped, so that the socket can be used again.
+
+    :param ignored: Error codes (``errno``) which end the reply silently.
+    :return: Iterator of (buffer, type, payload start, payload end).
+    :raise NetlinkError: If kernel returns an error.
+    :raise DumpInterrupted: At the end of a dump flagged with ``NLM_F_DUMP_INTR``.
+    '''
+    seq = next(_sequence) & 0xFFFFFFFF
+    sock.sendto(NLMSGHDR.pack(NLMSGHDR.size + len(body), msg_type, flags, seq, 0) + body, (0, 0))
+    messages = iter(())
+    pending = True
+    interrupted = 0
+    try:
+        while pending:
+            data = sock.recv(RCVBUF)
+            messages = iter_messages(data)
+            for msg_type, msg_flags, msg_seq, start, end in messages:
+                if msg_seq != seq:
+                    continue
+                interrupted |= msg_flags & NLM_F_DUMP_INTR
+                if msg_type == NLMSG_DONE:
+                    if interrupted:
+                        raise DumpInterrupted()
+                    return
+                if msg_type == NLMSG_ERROR:
+                    code = -_i32(data, start)[0]
+                    if code and code not in ignored:
+                        # Imported here, so that the raw path doesn't load pyroute2 until it is needed.
+                        from pyroute2.netlink.exceptions import NetlinkError
+                        raise NetlinkError(code)
+                    return
+                pending = bool(msg_flags & NLM_F_MULTI)
+                yield data, msg_type, start, end
+                if not pending:
+                    return
+    except GeneratorExit:
+        if pending:
+            drain(sock, seq, messages)
+        raise
+
+
+def nla(kind: int, payload: bytes) -> bytes:
+    length = NLAHDR.size + len(payload)
+    return NLAHDR.pack(length, kind) + payload + b'\0' * ((4 - length % 4) % 4)
+
+
+def iter_links(sock, ifname: Optional[str] = None, ifindex: Optional[int] = None,
+               lazy: bool = False, ext_mask: Optional[int] = None,
+               fields: Dict[str, Callable[[bytes, AttrTable, tuple], Any]] = LINK_FIELDS) -> Iterator[IPLink]:
+    '''
+    Dump all links, or ask kernel for the one with given name or index, and decode them.
+
+    :param lazy: Yield :py:class:`LazyIPLink`, which decodes the fields when they are read.
+    :param ext_mask: ``IFLA_EXT_MASK`` of the request (``RTEXT_FILTER_*`` bits), which tells
+                     the kernel what to add to, or leave out of, the messages.
+    :param fields: How to get each field of the records, see :py:func:`decode_link`.
+    '''
+    body = IFINFOMSG.pack(0, 0, ifindex or 0, 0, 0)
+    if ext_mask is not None:
+        body += nla(IFLA_EXT_MASK, _U32.pack(ext_mask))
+    if ifname is None and ifindex is None:
+        replies = request(sock, RTM_GETLINK, body)
+    else:
+        if ifname is not None:
+            body += nla(IFLA_IFNAME, ifname.encode() + b'\0')
+        replies = request(sock, RTM_GETLINK, body, NLM_F_REQUEST, ignored=(errno.ENODEV,))
+    for data, msg_type, start, end in replies:
+        if msg_type != RTM_NEWLINK:
+            continue
+        link = LazyIPLink(data, start, end) if lazy else decode_link(data, start, end, fields)
+        # If both are given, kernel looks up by index only
+        if ifname is None or link.ifname == ifname:
+            yield link
+
+
+def iter_addrs(sock, family: Optional[int] = None, ifindex: Optional[int] = None) \
+        -> Iterator[Tuple[int, AddrInfo]]:
+    '''
+    Dump addresses, optionally of one family and one interface only, and decode them.
+
+    :return: Iterator of (interface index, address).
+    '''
+    body = IFADDRMSG.pack(family or 0, 0, 0, 0, ifindex or 0)
+    for data, msg_type, start, end in request(sock, RTM_GETADDR, body):
+        if msg_type != RTM_NEWADDR:
+            continue
+        index, info = decode_addr(data, start, end)
+        # Old kernels ignore the index
+        if ifindex is None or index == ifindex:
+            yield index, info
+
+
+def iter_link_stats(sock) -> Iterator[Tuple[int, bytes, int, int]]:
+    '''
+    Dump the 64-bit counters of all links, with ``RTM_GETSTATS`` (Linux 4.7+), which only sends
+    the ``struct rtnl_link_stats64`` of each link, not all its attributes like ``RTM_GETLINK``.
+
+    :return: Iterator of (interface index, buffer, start and end of the ``rtnl_link_stats64``).
+    '''
+    body = IF_STATS_MSG.pack(0, 0, 0, 0, 1 << (IFLA_STATS_LINK_64 - 1))
+    for data, msg_type, start, end in request(sock, RTM_GETSTATS, body):
+        if msg_type != RTM_NEWSTATS:
+            continue
+        ifindex = IF_STATS_MSG.unpack_from(data, start)[3]
+        pos = attr_table(data, start + IF_STATS_MSG.size, end).get(IFLA_STATS_LINK_64)
+        if pos:
+            yield ifindex, data, pos[0], pos[1]
+
+
+def get_raw(data: bytes, table: AttrTable, kind: int) -> Optional[bytes]:
+    pos = table.get(kind)
+    return bytes(data[pos[0]:pos[1]]) if pos else None
+
+
+def to_ip(raw: Optional[bytes]):
+    if raw is None:
+        return None
+    return IPv4Address(raw) if len(raw) == 4 else IPv6Address(raw)
+
+
+def decode_nexthops(data: bytes, start: int, end: int) -> Tuple[Nexthop, ...]:
+    nexthops = []
+    while start + RTNEXTHOP.size <= end:
+        length, _flags, hops, ifindex = RTNEXTHOP.unpack_from(data, start)
+        if length < RTNEXTHOP.size:
+            break
+        t = attr_table(data, start + RTNEXTHOP.size, start + length)
+        nexthops.append(Nexthop(gateway=get_ip(data, t, RTA_GATEWAY), oif=ifindex, weight=hops + 1))
+        start += (length + 3) & ~3
+    return tuple(nexthops)
+
+
+RouteFields = Tuple[int, bytes, int, int, int, int, int, int, Optional[bytes], Optional[int], Optional[bytes],
+                    Optional[int], Tuple[Nexthop, ...]]
+
+
+def decode_route_fields(data: bytes, offset: int, end: int) -> RouteFields:
+    '''
+    Read the RTM_NEWROUTE payload between ``offset`` and ``end``, without building objects
+    for the addresses, for :py:class:`~linetface.table.RouteTable` to store them as they are.
+
+    :return: (family, packed destination, prefix length, table, protocol, scope, type, flags,
+             packed gateway, output interface, packed preferred source, metric, nexthops)
+    '''
+    family, dst_len, _src_len, _tos, table, protocol, scope, rtype, flags = RTMSG.unpack_from(data, offset)
+    t = attr_table(data, offset + RTMSG.size, end)
+    dst = get_raw(data, t, RTA_DST)
+    if dst is None:
+        # The default route has no RTA_DST
+        dst = bytes(4 if family == AF_INET else 16)
+    multipath = t.get(RTA_MULTIPATH)
+    nexthops = decode_nexthops(data, multipath[0], multipath[1]) if multipath else ()
+    # rtm_table only has 8 bits, RTA_TABLE has the full id
+    full_table = get_u32(data, t, RTA_TABLE)
+    return (family, dst, dst_len, table if full_table is None else full_table, protocol, scope, rtype, flags,
+            get_raw(data, t, RTA_GATEWAY), get_u32(data, t, RTA_OIF), get_raw(data, t, RTA_PREFSRC),
+            get_u32(data, t, RTA_PRIORITY), nexthops)
+
+
+def make_route(family: int, dst: bytes, dst_len: int, table: int, protocol: int, scope: int, rtype: int,
+               flags: int, gateway: Optional[bytes], oif: Optional[int], prefsrc: Optional[bytes],
+               metric: Optional[int], nexthops: Tuple[Nexthop, ...]) -> Route:
+    '''
+    Build :py:class:`~linetface.core.Route` from the values of :py:func:`decode_route_fields`.
+    '''
+    network = IPv4Network((dst, dst_len)) if len(dst) == 4 else IPv6Network((dst, dst_len))
+    return Route(
+        family=member(FAMILIES, AddressFamily, family),
+        dst=network,
+        type=member(ROUTE_TYPES, RouteType, rtype),
+        table=table,
+        protocol=PROTOCOLS.get(protocol, protocol),
+        scope=member(SCOPES, RTScope, scope),
+        gateway=to_ip(gateway),
+        oif=oif,
+        prefsrc=to_ip(prefsrc),
+        metric=metric,
+        flags=flags,
+        nexthops=nexthops
+    )
+
+
+def decode_route(data: bytes, offset: int, end: int) -> Route:
+    '''
+    Build :py:class:`~linetface.core.Route` from the RTM_NEWROUTE payload between ``offset`` and ``end``.
+    '''
+    return make_route(*decode_route_fields(data, offset, end))
+
+
+IP_FAMILIES = (AF_INET, AF_INET6)
+
+
+def iter_route_fields(sock, family: Optional[int] = None, table: Optional[int] = None) -> Iterator[RouteFields]:
+    '''
+    Dump the routes, optionally of one family and one routing table only,
+    and yield the values of :py:func:`decode_route_fields`.
+
+    Only IPv4 and IPv6 unicast routes are yielded: without a family, the kernel also sends
+    the multicast routes (``RTNL_FAMILY_IPMR``, ``RTNL_FAMILY_IP6MR``) and the MPLS ones.
+    '''
+    body = RTMSG.pack(family or 0, 0, 0, 0, 0 if table is None else min(table, 255), 0, 0, 0, 0)
+    if table is not None:
+        body += nla(RTA_TABLE, struct.pack('I', table))
+    for data, msg_type, start, end in request(sock, RTM_GETROUTE, body):
+        if msg_type != RTM_NEWROUTE:
+            continue
+        fields = decode_route_fields(data, start, end)
+        # Old kernels ignore the filters
+        if fields[0] in IP_FAMILIES and (family is None or fields[0] == family) and \
+                (table is None or fields[3] == table):
+            yield fields
+
+
+def iter_routes(sock, family: Optional[int] = None, table: Optional[int] = None) -> Iterator[Route]:
+    '''
+    Dump the routes, optionally of one family and one routing table only, and decode them.
+    '''
+    for fields in iter_route_fields(sock, family, table):
+        yield make_route(*fields)
+
+
+def decode_neighbor(data: bytes, offset: int, end: int) -> Neighbor:
+    '''
+    Build :py:class:`~linetface.core.Neighbor` from the RTM_NEWNEIGH payload between ``offset`` and ``end``.
+    '''
+    family, ifindex, state, flags, _type = NDMSG.unpack_from(data, offset)
+    t = attr_table(data, offset + NDMSG.size, end)
+    return Neighbor(
+        family=member(FAMILIES, AddressFamily, family),
+        ifindex=ifindex,
+        dst=get_ip(data, t, NDA_DST),
+        lladdr=get_mac(data, t, NDA_LLADDR),
+        state=member(NUD_STATES, NUDState, state),
+        router=bool(flags & NTF_ROUTER),
+        probes=get_u32(data, t, NDA_PROBES)
+    )
+
+
+# Like "ip neigh", leave out the static entries of the interfaces which don't need ARP/NDP,
+# like the loopback, and of the multicast addresses
+SHOWN_NUD_STATES = 0xFF & ~NUDState.NOARP
+
+
+def iter_neighbors(sock, family: Optional[int] = None, ifindex: Optional[int] = None,
+                   states: Optional[int] = SHOWN_NUD_STATES) -> Iterator[Neighbor]:
+    '''
+    Dump the ARP and NDP caches, optionally of one family and one interface only, and decode
+    the entries one by one, as they are received.
+
+    :param states: Mask of the :py:class:`~linetface.consts.NUDState` to keep,
+                   ``None`` for all entries (like ``ip neigh show nud all``).
+    '''
+    body = NDMSG.pack(family or 0, 0, 0, 0, 0)
+    if ifindex is not None:
+        body += nla(NDA_IFINDEX, struct.pack('I', ifindex))
+    for data, msg_type, start, end in request(sock, RTM_GETNEIGH, body):
+        if msg_type != RTM_NEWNEIGH:
+            continue
+        if states is not None and not NDMSG.unpack_from(data, start)[2] & states:
+            continue
+        neighbor = decode_neighbor(data, start, end)
+        # Old kernels ignore the filters
+        if neighbor.dst is not None and (ifindex is None or neighbor.ifindex == ifindex):
+            yield neighbor
@@ -0,0 +1,322 @@
+'''
+Share the interfaces of one process with many: a publisher dumps the links and addresses,
+and writes them to a memory-mapped file, which any number of processes read without
+netlink sockets or system calls.
+
+.. code-block:: python
+
+    from linetface.shm import SnapshotPublisher, SnapshotReader
+
+    # In the process which keeps the snapshot current
+    with SnapshotPublisher('/dev/shm/linetface') as publisher:
+        publisher.serve(interval=5)
+
+    # In each worker
+    reader = SnapshotReader('/dev/shm/linetface')
+    addrs = reader.get_addrs()
+
+The file has two slots: the publisher writes each snapshot to the one which readers are not
+directed to, then points the header to it. Each slot is guarded by a sequence counter, which is odd
+while the slot is written (a seqlock), and a CRC of its content. Readers copy the slot, then check
+that neither changed, else they read again. So readers never wait for, nor block, the publisher.
+
+The links are stored as compact RTM_NEWLINK messages (the attributes that :py:class:`~linetface.core.IPLink`
+is decoded from), the addresses as the kernel sent them. A reader decodes a snapshot once,
+to lazy records (see :py:class:`~linetface.rawnl.LazyIPLink`), then returns the same tuples
+until the publisher writes a new one: checking that costs one read of the mapped header.
+Only the messages which changed since the previous snapshot are decoded again, the records
+of the others are reused.
+
+There must be only one publisher per file.
+'''
+
+import os
+import mmap
+import time
+import zlib
+import errno
+import select
+import socket
+import struct
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from . import rawnl
+from .core import IPLink, IPAddr, AddrInfo
+from .hand import Linetface, retry_interrupted
+
+
+MAGIC = b'LNTFSNAP'
+LAYOUT_VERSION = 1
+# magic, layout version, slot count, capacity of each slot, current generation, time of the last dump
+HEADER = struct.Struct('=8sIIQQd')
+U64 = struct.Struct('=Q')
+DOUBLE = struct.Struct('=d')
+GENERATION_OFFSET = 24
+LAST_DUMP_OFFSET = 32
+# sequence (seqlock), generation, time of the dump, lengths of the link and address data, CRC32 of the data
+SLOT = struct.Struct('=QQdIII')
+# The slot headers are on their own cache lines, the data follows.
+SLOT_HEADER_SIZE = 64
+DATA_OFFSET = 64 + 2 * SLOT_HEADER_SIZE
+
+DEFAULT_CAPACITY = 16 << 20
+
+# rtnetlink multicast groups of links, IPv4 and IPv6 addresses
+WATCH_GROUPS = 0x1 | 0x10 | 0x100
+
+
+class SnapshotPublisher:
+    '''
+    Writes snapshots of the links and addresses to the file at ``path``, which is created,
+    or replaced, atomically. Put it on a tmpfs, like ``/dev/shm``, so that it is never written to disk.
+
+    :param capacity: Bytes of each of the two slots. The file is sparse, only what is
+                     written takes memory. A link takes about 200 bytes, an address about 70.
+    :param session: Session to dump with, a new one by default.
+    :param dump_retries: Times to dump again when the kernel reports that a table changed during its dump.
+
+    Readers which opened the file before it was replaced keep reading the old one,
+    so they must be opened again when the publisher is restarted.
+    '''
+    def __init__(self, path: str, capacity: int = DEFAULT_CAPACITY, session: Optional[Linetface] = None,
+                 dump_retries: int = 3):
+        self.path = path
+        self.capacity = capacity
+        self.dump_retries = dump_retries
+        #: Number of dumps which the kernel reported as interrupted
+        self.interrupted_dumps = 0
+        self._lock = threading.Lock()
+        self._own_session = session is None
+        self.session = session if session is not None else Linetface(pool_size=1, decoder='fast')
+        #: Number of snapshots written
+        self.generation = 0
+        temp_path = '{}.{}.tmp'.format(path, os.getpid())
+        fd = os.open(temp_path, os.O_RDWR | os.O_CREAT | os.O_TRUNC | os.O_CLOEXEC, 0o644)
+        try:
+            os.ftruncate(fd, DATA_OFFSET + 2 * capacity)
+            self._map = mmap.mmap(fd, DATA_OFFSET + 2 * capacity)
+        finally:
+            os.close(fd)
+        self._last: Tuple[bytes, bytes] = (b'', b'')
+        HEADER.pack_into(self._map, 0, MAGIC, LAYOUT_VERSION, 2, capacity, 0, 0.0)
+        os.rename(temp_path, path)
+
+    def __enter__(self) -> 'SnapshotPublisher':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        ''' Stop writing. The file is left for the readers, with the last snapshot. '''
+        self._map.close()
+        if self._own_session:
+            self.session.close()
+
+    def write(self, link_data: bytes, addr_data: bytes, dumped_at: Optional[float] = None) -> int:
+        '''
+        Write a snapshot: ``link_data`` and ``addr_data`` are RTM_NEWLINK and RTM_NEWADDR messages,
+        one after the other.
+
+        :return: The generation of the snapshot.
+        :raise ValueError: If it doesn't fit in a slot.
+        '''
+        size = len(link_data) + len(addr_data)
+        if size > self.capacity:
+            raise ValueError('Snapshot of {} bytes does not fit in slots of {} bytes'.format(size, self.capacity))
+        generation = self.generation + 1
+        slot = generation % 2
+        header_offset = 64 + slot * SLOT_HEADER_SIZE
+        data_offset = DATA_OFFSET + slot * self.capacity
+        mm = self._map
+        sequence = SLOT.unpack_from(mm, header_offset)[0]
+        # Odd while writing: readers which started on this slot will see that it changed.
+        U64.pack_into(mm, header_offset, sequence + 1)
+        mm[data_offset:data_offset + len(link_data)] = link_data
+        mm[data_offset + len(link_data):data_offset + size] = addr_data
+        crc = zlib.crc32(addr_data, zlib.crc32(link_data))
+        SLOT.pack_into(mm, header_offset, sequence + 1, generation, dumped_at if dumped_at is not None else time.time(),
+                       len(link_data), len(addr_data), crc)
+        U64.pack_into(mm, header_offset, sequence + 2)
+        U64.pack_into(mm, GENERATION_OFFSET, generation)
+        self.generation = generation
+        self._last = link_data, addr_data
+        return generation
+
+    @retry_interrupted
+    def dump(self) -> Tuple[bytes, bytes]:
+        ''' Dump the links (as compact messages) and addresses. '''
+        with self.session.socket() as ip:
+            links = b''.join(link.to_message() for link in rawnl.iter_links(
+                ip, lazy=True, ext_mask=rawnl.RTEXT_FILTER_SKIP_STATS))
+            body = rawnl.IFADDRMSG.pack(0, 0, 0, 0, 0)
+            addrs = b''.join(data[start - rawnl.NLMSGHDR.size:end] for data, msg_type, start, end
+                             in rawnl.request(ip, rawnl.RTM_GETADDR, body) if msg_type == rawnl.RTM_NEWADDR)
+        return links, addrs
+
+    def publish(self) -> int:
+        '''
+        Dump the links and addresses, and write them if they changed since the last snapshot.
+        Return the generation.
+        '''
+        dumped_at = time.time()
+        dump = self.dump()
+        if dump != self._last:
+            self.write(*dump, dumped_at=dumped_at)
+        DOUBLE.pack_into(self._map, LAST_DUMP_OFFSET, dumped_at)
+        return self.generation
+
+    def serve(self, interval: float = 5.0, stop: Optional[threading.Event] = None):
+        '''
+        Publish now, then each time links or addresses change, and every ``interval`` seconds
+        anyway (the lifetimes of dynamic addresses go down). Return when ``stop`` is set,
+        checked at least every ``interval`` seconds.
+        '''
+        monitor = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW | socket.SOCK_CLOEXEC, socket.NETLINK_ROUTE)
+        try:
+            monitor.bind((0, WATCH_GROUPS))
+            monitor.setblocking(False)
+            while stop is None or not stop.is_set():
+                self.publish()
+                readable, _w, _x = select.select((monitor,), (), (), interval)
+                if readable:
+                    # The notifications only tell to dump again, a burst of them makes one snapshot.
+                    time.sleep(0.01)
+                    _drain(monitor)
+        finally:
+            monitor.close()
+
+
+def _drain(sock: socket.socket):
+    while True:
+        try:
+            sock.recv(rawnl.RCVBUF)
+        except BlockingIOError:
+            return
+        except OSError as e:
+            # Notifications were lost, the next dump covers them.
+            if e.errno != errno.ENOBUFS:
+                raise
+
+
+class SnapshotReader:
+    '''
+    Reads the snapshots written by a :py:class:`SnapshotPublisher` to the file at ``path``.
+    It can be opened before forking the workers, and shared between threads.
+
+    :raise ValueError: If the file is not a snapshot file.
+    '''
+    def __init__(self, path: str):
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, prot=mmap.PROT_READ)
+        magic, version, _slots, capacity, _generation, _last_dump = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != LAYOUT_VERSION:
+            self._map.close()
+            raise ValueError('{} is not a snapshot file of this version'.format(path))
+        self.capacity = capacity
+        #: Generation of the snapshot which the records were decoded from
+        self.generation = 0
+        #: Time of the dump of that snapshot
+        self.dumped_at: Optional[float] = None
+        #: Number of times a slot changed while it was copied, and was read again
+        self.retries = 0
+        self._lock = threading.Lock()
+        self._data: Tuple[bytes, bytes] = (b'', b'')
+        self._links: Optional[Tuple[IPLink, ...]] = ()
+        self._addrs: Optional[Tuple[IPAddr, ...]] = ()
+        # What was decoded from the previous snapshot, by raw message, to reuse for the unchanged ones
+        self._link_cache: Dict[bytes, rawnl.LazyIPLink] = {}
+        self._addr_cache: Dict[bytes, Tuple[int, AddrInfo]] = {}
+        self._joined: Dict[int, IPAddr] = {}
+
+    def __enter__(self) -> 'SnapshotReader':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self._map.close()
+
+    def published(self) -> int:
+        ''' The generation of the last snapshot written, 0 if there is none yet. '''
+        return U64.unpack_from(self._map, GENERATION_OFFSET)[0]
+
+    def last_dump(self) -> float:
+        '''
+        Time of the last dump of :py:meth:`SnapshotPublisher.publish`, even if nothing had changed:
+        it tells whether the publisher is still running.
+        '''
+        return DOUBLE.unpack_from(self._map, LAST_DUMP_OFFSET)[0]
+
+    def _refresh(self):
+        mm = self._map
+        while True:
+            generation = U64.unpack_from(mm, GENERATION_OFFSET)[0]
+            if generation == self.generation:
+                return
+            header_offset = 64 + generation % 2 * SLOT_HEADER_SIZE
+            data_offset = DATA_OFFSET + generation % 2 * self.capacity
+            sequence, slot_generation, dumped_at, link_size, addr_size, crc = SLOT.unpack_from(mm, header_offset)
+            if not sequence & 1 and slot_generation == generation \
+                    and link_size + addr_size <= self.capacity:
+                link_data = mm[data_offset:data_offset + link_size]
+                addr_data = mm[data_offset + link_size:data_offset + link_size + addr_size]
+                if U64.unpack_from(mm, header_offset)[0] == sequence \
+                        and zlib.crc32(addr_data, zlib.crc32(link_data)) == crc:
+                    self._data = link_data, addr_data
+                    self._links = self._addrs = None
+                    self.generation, self.dumped_at = generation, dumped_at
+                    return
+            # The publisher wrote over the slot meanwhile (it made two snapshots while this one was copied)
+            self.retries += 1
+            time.sleep(0)
+
+    def get_links(self) -> Tuple[IPLink, ...]:
+        ''' The links of the last snapshot, like :py:func:`~linetface.get_links`. '''
+        with self._lock:
+            return self._get_links()
+
+    def _get_links(self) -> Tuple[IPLink, ...]:
+        self._refresh()
+        if self._links is None:
+            link_data = self._data[0]
+            old, cache = self._link_cache, {}
+            for msg_type, _f, _s, start, end in rawnl.iter_messages(link_data):
+                if msg_type == rawnl.RTM_NEWLINK:
+                    raw = link_data[start:end]
+                    link = old.get(raw)
+                    cache[raw] = link if link is not None else rawnl.LazyIPLink(raw, 0, len(raw))
+            self._link_cache = cache
+            self._links = tuple(cache.values())
+        return self._links
+
+    def get_addrs(self) -> Tuple[IPAddr, ...]:
+        ''' The links and their addresses of the last snapshot, like :py:func:`~linetface.get_addrs`. '''
+        with self._lock:
+            links = self._get_links()
+            if self._addrs is None:
+                addr_data = self._data[1]
+                old, cache = self._addr_cache, {}
+                infos: Dict[int, List[AddrInfo]] = {}
+                for msg_type, _f, _s, start, end in rawnl.iter_messages(addr_data):
+                    if msg_type == rawnl.RTM_NEWADDR:
+                        raw = addr_data[start:end]
+                        decoded = old.get(raw)
+                        if decoded is None:
+                            decoded = rawnl.decode_addr(raw, 0, len(raw))
+                        cache[raw] = decoded
+                        infos.setdefault(decoded[0], []).append(decoded[1])
+                self._addr_cache = cache
+                self._addrs = tuple(self._join(link, infos.get(link.ifindex, ())) for link in links)
+                self._joined = {a.ifindex: a for a in self._addrs}
+            return self._addrs
+
+    def _join(self, link: rawnl.LazyIPLink, infos: List[AddrInfo]) -> IPAddr:
+        # The same record as in the previous snapshot, if neither the link nor its addresses changed
+        joined = self._joined.get(link.ifindex)
+        if joined is not None and joined._raw is link._raw and len(joined.addr_info) == len(infos) \
+                and all(a is b for a, b in zip(joined.addr_info, infos)):
+            return joined
+        return link.join(infos)
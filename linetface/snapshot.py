@@ -0,0 +1,155 @@
+'''
+Indexed snapshots of the interfaces, and the changes between two of them.
+
+.. code-block:: python
+
+    from linetface import get_addrs
+    from linetface.snapshot import Snapshot, diff
+
+    before = Snapshot(get_addrs())
+    ...
+    changes = diff(before, Snapshot(get_addrs()))
+    for change in changes.changed_addrs:
+        print(change.key, change.fields)
+
+Links are indexed by ``ifindex``, addresses by ``(ifindex, family, local, prefixlen)``,
+so :py:func:`diff` is linear in the number of records.
+'''
+
+import dataclasses
+from dataclasses import dataclass
+from ipaddress import IPv4Address, IPv6Address
+from operator import attrgetter
+from typing import Any, Callable, Collection, Dict, Iterable, Tuple, Union
+
+from .core import IPCommonInfo, IPAddr, AddrInfo
+
+
+AddrKey = Tuple[int, int, Union[IPv4Address, IPv6Address], int]
+Key = Union[int, AddrKey]
+
+# The remaining lifetimes of addresses go down every second
+VOLATILE_FIELDS = ('valid_life_time', 'preferred_life_time')
+
+
+def addr_key(ifindex: int, info: AddrInfo) -> AddrKey:
+    return ifindex, int(info.family), info.local, info.prefixlen
+
+
+class Snapshot:
+    '''
+    The result of :py:func:`~linetface.get_addrs` (or :py:func:`~linetface.get_links`), indexed.
+
+    ``links`` maps interface indexes to the records, ``addrs`` maps :py:func:`addr_key`
+    to the :py:class:`~linetface.core.AddrInfo`.
+    '''
+    __slots__ = ('links', 'addrs')
+
+    def __init__(self, records: Iterable[IPCommonInfo] = ()):
+        self.links: Dict[int, IPCommonInfo] = {}
+        self.addrs: Dict[AddrKey, AddrInfo] = {}
+        for record in records:
+            self.links[record.ifindex] = record
+            if isinstance(record, IPAddr):
+                for info in record.addr_info:
+                    self.addrs[addr_key(record.ifindex, info)] = info
+
+    def __len__(self) -> int:
+        return len(self.links)
+
+    def __repr__(self) -> str:
+        return '<Snapshot of {} links and {} addresses>'.format(len(self.links), len(self.addrs))
+
+
+@dataclass
+class Change:
+    '''
+    A record which is in both snapshots, but differs. ``fields`` maps the name
+    of each differing field to its (old, new) values.
+    '''
+    __slots__ = ('key', 'old', 'new', 'fields')
+    key: Key
+    old: Any
+    new: Any
+    fields: Dict[str, Tuple[Any, Any]]
+
+
+@dataclass
+class SnapshotDiff:
+    '''
+    What changed from one :py:class:`Snapshot` to the next.
+    The added and removed addresses are (key, :py:class:`~linetface.core.AddrInfo`) pairs.
+    '''
+    added_links: Tuple[IPCommonInfo, ...] = ()
+    removed_links: Tuple[IPCommonInfo, ...] = ()
+    changed_links: Tuple[Change, ...] = ()
+    added_addrs: Tuple[Tuple[AddrKey, AddrInfo], ...] = ()
+    removed_addrs: Tuple[Tuple[AddrKey, AddrInfo], ...] = ()
+    changed_addrs: Tuple[Change, ...] = ()
+
+    def __bool__(self) -> bool:
+        return any(getattr(self, f.name) for f in dataclasses.fields(self))
+
+
+# Not compared: the addresses are compared one by one, and the fields of the keys are equal.
+NOT_COMPARED = frozenset(('addr_info', 'ifindex', 'family', 'local', 'prefixlen'))
+
+
+def _compared_fields(old_type: type, new_type: type, volatile: Collection[str]) -> Tuple[str, ...]:
+    new_names = set(f.name for f in dataclasses.fields(new_type))
+    return tuple(f.name for f in dataclasses.fields(old_type)
+                 if f.name in new_names and f.name not in NOT_COMPARED and f.name not in volatile)
+
+
+def _tuple_getter(names: Tuple[str, ...]) -> Callable:
+    if len(names) > 1:
+        return attrgetter(*names)
+    return lambda record: tuple(getattr(record, n) for n in names)
+
+
+def _changes(old: Dict, new: Dict, volatile: Collection[str]) -> Tuple[Change, ...]:
+    # All the compared values of a record are fetched at once, by a (C) attrgetter per pair of types.
+    getters: Dict[Tuple[type, type], Tuple[Tuple[str, ...], Callable]] = {}
+    changes = []
+    for key, before in old.items():
+        after = new.get(key)
+        if after is None or after is before:
+            continue
+        types = type(before), type(after)
+        getter = getters.get(types)
+        if getter is None:
+            names = _compared_fields(*types, volatile)
+            getter = getters[types] = names, _tuple_getter(names)
+        names, values = getter
+        old_values = values(before)
+        new_values = values(after)
+        if old_values != new_values:
+            fields = {n: (a, b) for n, a, b in zip(names, old_values, new_values) if a != b}
+            changes.append(Change(key, before, after, fields))
+    return tuple(changes)
+
+
+def diff(old: Union[Snapshot, Iterable[IPCommonInfo]], new: Union[Snapshot, Iterable[IPCommonInfo]],
+         volatile: Collection[str] = VOLATILE_FIELDS) -> SnapshotDiff:
+    '''
+    Compare two snapshots (or two results of :py:func:`~linetface.get_addrs`).
+
+    :param volatile: Names of the fields which are not compared. By default, the address lifetimes,
+                     pass ``()`` to compare every field.
+
+    A link is changed when its own fields change, not when its addresses do:
+    those are reported by address.
+    '''
+    if not isinstance(old, Snapshot):
+        old = Snapshot(old)
+    if not isinstance(new, Snapshot):
+        new = Snapshot(new)
+    volatile = frozenset(volatile)
+    return SnapshotDiff(
+        added_links=tuple(r for i, r in new.links.items() if i not in old.links),
+        removed_links=tuple(r for i, r in old.links.items() if i not in new.links),
+        changed_links=_changes(old.links, new.links, volatile),
+        added_addrs=tuple((k, a) for k, a in new.addrs.items() if k not in old.addrs),
+        removed_addrs=tuple((k, a) for k, a in old.addrs.items() if k not in new.addrs),
+        changed_addrs=_changes(old.addrs, new.addrs, volatile),
+    )
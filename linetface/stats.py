@@ -0,0 +1,183 @@
+'''
+Traffic counters of all interfaces, as one matrix, and the rates between two samples.
+
+The counters are the kernel's ``struct rtnl_link_stats64``, the source of ``/proc/net/dev``
+and ``ip -s link``. With NumPy installed, :py:attr:`CounterMatrix.values` is a 2-D array
+of one row per interface, and :py:class:`RateTracker` computes all the rates at once.
+Without NumPy, it is a flat :py:class:`array.array`, row after row.
+
+.. code-block:: python
+
+    import time
+    from linetface import get_link_stats
+    from linetface.stats import RateTracker
+
+    tracker = RateTracker()
+    while True:
+        rates = tracker.update(get_link_stats())
+        if rates is not None:
+            print(rates.column('rx_bytes'))
+        time.sleep(1)
+'''
+
+import time
+from array import array
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+# Ref: struct rtnl_link_stats64, in include/uapi/linux/if_link.h.
+# Newer kernels append more counters, they are left out.
+COUNTERS = ('rx_packets', 'tx_packets', 'rx_bytes', 'tx_bytes', 'rx_errors', 'tx_errors',
+            'rx_dropped', 'tx_dropped', 'multicast', 'collisions', 'rx_length_errors', 'rx_over_errors',
+            'rx_crc_errors', 'rx_frame_errors', 'rx_fifo_errors', 'rx_missed_errors', 'tx_aborted_errors',
+            'tx_carrier_errors', 'tx_fifo_errors', 'tx_heartbeat_errors', 'tx_window_errors',
+            'rx_compressed', 'tx_compressed', 'rx_nohandler')
+COUNTER_INDEX = {name: i for i, name in enumerate(COUNTERS)}
+ROW_SIZE = 8 * len(COUNTERS)
+
+
+class CounterMatrix:
+    '''
+    One row of :py:data:`COUNTERS` per interface, in the order of :py:attr:`ifindex`.
+    '''
+    __slots__ = ('ifindex', 'values', '_rows')
+
+    def __init__(self, ifindex: Sequence[int], values):
+        self.ifindex = ifindex
+        self.values = values
+        self._rows: Optional[Dict[int, int]] = None
+
+    def __len__(self) -> int:
+        return len(self.ifindex)
+
+    def __contains__(self, ifindex: int) -> bool:
+        return ifindex in self.rows
+
+    @property
+    def rows(self) -> Dict[int, int]:
+        ''' Row number of each interface index. '''
+        if self._rows is None:
+            self._rows = {int(x): i for i, x in enumerate(self.ifindex)}
+        return self._rows
+
+    def column(self, name: str) -> Sequence:
+        ''' The values of one counter, for all interfaces. '''
+        c = COUNTER_INDEX[name]
+        if numpy is not None and isinstance(self.values, numpy.ndarray):
+            return self.values[:, c]
+        return self.values[c::len(COUNTERS)]
+
+    def row(self, ifindex: int) -> Dict[str, float]:
+        ''' The counters of one interface, by name. '''
+        row = self.rows[ifindex]
+        if numpy is not None and isinstance(self.values, numpy.ndarray):
+            values = self.values[row].tolist()
+        else:
+            values = self.values[row * len(COUNTERS):(row + 1) * len(COUNTERS)]
+        return dict(zip(COUNTERS, values))
+
+
+class LinkStats(CounterMatrix):
+    '''
+    The counters of all interfaces, as read at :py:attr:`timestamp` (:py:func:`time.monotonic`).
+    '''
+    __slots__ = ('timestamp',)
+
+    def __init__(self, ifindex: Sequence[int], values, timestamp: float):
+        super().__init__(ifindex, values)
+        self.timestamp = timestamp
+
+    @classmethod
+    def from_dump(cls, dump: Iterable[Tuple[int, bytes, int, int]], timestamp: Optional[float] = None) -> 'LinkStats':
+        '''
+        Build from the output of :py:func:`linetface.rawnl.iter_link_stats`.
+        The ``rtnl_link_stats64`` are copied as they are, in one buffer.
+        '''
+        ifindex = array('i')
+        buffer = bytearray()
+        for index, data, start, end in dump:
+            ifindex.append(index)
+            if end - start >= ROW_SIZE:
+                buffer += data[start:start + ROW_SIZE]
+            else:
+                # Older kernels have fewer counters
+                buffer += data[start:end]
+                buffer += bytes(ROW_SIZE - end + start)
+        if timestamp is None:
+            timestamp = time.monotonic()
+        if numpy is not None:
+            return cls(numpy.frombuffer(ifindex, numpy.int32),
+                       numpy.frombuffer(buffer, numpy.uint64).reshape(-1, len(COUNTERS)), timestamp)
+        return cls(ifindex, array('Q', bytes(buffer)), timestamp)
+
+
+class LinkRates(CounterMatrix):
+    '''
+    Per-second rates of the counters, over :py:attr:`interval` seconds.
+    Interfaces which were not in both samples are left out.
+    '''
+    __slots__ = ('interval',)
+
+    def __init__(self, ifindex: Sequence[int], values, interval: float):
+        super().__init__(ifindex, values)
+        self.interval = interval
+
+
+def _numpy_rates(old: LinkStats, new: LinkStats, interval: float) -> LinkRates:
+    if numpy.array_equal(old.ifindex, new.ifindex):
+        ifindex, before, after = new.ifindex, old.values, new.values
+    else:
+        ifindex, old_rows, new_rows = numpy.intersect1d(old.ifindex, new.ifindex, assume_unique=True,
+                                                        return_indices=True)
+        before, after = old.values[old_rows], new.values[new_rows]
+    # A counter which went down was reset (the driver was reloaded), it counts again from 0.
+    delta = numpy.where(after >= before, after - before, after)
+    return LinkRates(ifindex, delta / interval, interval)
+
+
+def _array_rates(old: LinkStats, new: LinkStats, interval: float) -> LinkRates:
+    width = len(COUNTERS)
+    ifindex = array('i')
+    values = array('d')
+    old_rows = old.rows
+    for row, index in enumerate(new.ifindex):
+        old_row = old_rows.get(index)
+        if old_row is None:
+            continue
+        ifindex.append(index)
+        before = old.values[old_row * width:(old_row + 1) * width]
+        after = new.values[row * width:(row + 1) * width]
+        values.extend((a - b if a >= b else a) / interval for a, b in zip(after, before))
+    return LinkRates(ifindex, values, interval)
+
+
+class RateTracker:
+    '''
+    Turn successive :py:class:`LinkStats` into per-second rates.
+    '''
+    def __init__(self):
+        self.last: Optional[LinkStats] = None
+
+    def update(self, stats: LinkStats) -> Optional[LinkRates]:
+        '''
+        Record a new sample, and return the rates since the previous one (``None`` for the first sample).
+        '''
+        old = self.last
+        if old is None:
+            self.last = stats
+            return None
+        interval = stats.timestamp - old.timestamp
+        if interval <= 0:
+            # Rejected samples are not recorded, the next one is compared with the last good one.
+            raise ValueError('The samples must be taken in order')
+        if numpy is not None and isinstance(stats.values, numpy.ndarray):
+            rates = _numpy_rates(old, stats, interval)
+        else:
+            rates = _array_rates(old, stats, interval)
+        self.last = stats
+        return rates
@@ -0,0 +1,432 @@
+'''
+Columnar containers for large link and address tables.
+
+Instead of one Python object per row, the values are kept in :py:mod:`array` columns:
+integers and enums as their raw values, MAC addresses as 48-bit (or 64-bit) integers,
+IP addresses packed in 16 bytes. Rows are rebuilt as :py:class:`~linetface.core.IPLink`
+and :py:class:`~linetface.core.AddrInfo` when they are read.
+'''
+
+import sys
+from array import array
+from bisect import bisect_right
+from ipaddress import IPv4Address, IPv6Address, ip_address
+from typing import Dict, Iterable, Iterator, Tuple, Optional, List, Union
+
+from .core import IPLink, AddrInfo, LinuxMAC, Route
+from .rawnl import make_route
+from .consts import LinkFlag, OperState, LinkMode, LinkType, Inet6AddrGenMode, AddressFamily, RTScope, \
+    IFAFlag, IFA_FLAG_NAMES, decode_link_flags, decode_ifa_flags
+
+
+# Stand-ins for None in the integer columns
+NONE_U32 = 0xFFFFFFFF
+NONE_U8 = 0xFF
+# Link types go up to 0xFFFF (ARPHRD_VOID), their column is wider
+NONE_LINK_TYPE = -1
+NONE_MAC = 0xFFFFFFFFFFFFFFFF
+
+OPERSTATES = tuple(OperState)
+OPERSTATE_CODES = {s: i for i, s in enumerate(OPERSTATES)}
+
+# The integer fields of IPLink, kept in 'I' columns
+LINK_U32_FIELDS = ('mtu', 'txqlen', 'promiscuity', 'min_mtu', 'max_mtu', 'num_tx_queues', 'num_rx_queues',
+                   'gso_max_size', 'gso_max_segs')
+
+
+def flags_value(flags: Tuple[LinkFlag, ...]) -> int:
+    '''
+    Get back the kernel's ``ifi_flags`` value from the tuple of :py:class:`LinkFlag` of a link.
+
+    That tuple drops ``RUNNING``, and has ``NO_CARRIER`` when an UP link is not RUNNING.
+    A link which is not UP is never RUNNING.
+    '''
+    # The flags are distinct bits, adding them as ints is faster than or'ing the enums.
+    value = sum(flags)
+    if value & LinkFlag.UP.value and LinkFlag.NO_CARRIER not in flags:
+        value |= LinkFlag.RUNNING.value
+    return int(value)
+
+
+def u32(value: Optional[int]) -> int:
+    return NONE_U32 if value is None else value
+
+
+def from_u32(value: int) -> Optional[int]:
+    return None if value == NONE_U32 else value
+
+
+def intern(value: Optional[str]) -> Optional[str]:
+    return sys.intern(value) if value is not None else None
+
+
+class LinkTable:
+    '''
+    Links in columnar form. It is filled by :py:meth:`append` or :py:meth:`from_links`,
+    and reads like a sequence of :py:class:`IPLink`, built on demand.
+    '''
+    def __init__(self):
+        self.ifindex = array('i')
+        self.flags = array('I')
+        self.link_type = array('i')
+        self.operstate = array('B')
+        self.linkmode = array('B')
+        self.inet6_addr_gen_mode = array('B')
+        self.address = array('Q')
+        self.broadcast = array('Q')
+        self.u32_columns = {name: array('I') for name in LINK_U32_FIELDS}
+        # Strings are few and repeated (except the names), they are interned.
+        self.ifname: List[str] = []
+        self.qdisc: List[Optional[str]] = []
+        self.group: List[str] = []
+
+    @classmethod
+    def from_links(cls, links: Iterable[IPLink]) -> 'LinkTable':
+        table = cls()
+        for link in links:
+            table.append(link)
+        return table
+
+    def append(self, link: IPLink):
+        self.ifindex.append(link.ifindex)
+        # The fields which a dump profile leaves out are None
+        self.flags.append(NONE_U32 if link.flags is None else flags_value(link.flags))
+        self.link_type.append(NONE_LINK_TYPE if link.link_type is None else link.link_type)
+        self.operstate.append(NONE_U8 if link.operstate is None else OPERSTATE_CODES[link.operstate])
+        self.linkmode.append(NONE_U8 if link.linkmode is None else link.linkmode.value)
+        self.inet6_addr_gen_mode.append(NONE_U8 if link.inet6_addr_gen_mode is None else link.inet6_addr_gen_mode)
+        self.address.append(NONE_MAC if link.address is None else int(link.address))
+        self.broadcast.append(NONE_MAC if link.broadcast is None else int(link.broadcast))
+        for name, column in self.u32_columns.items():
+            column.append(u32(getattr(link, name)))
+        self.ifname.append(link.ifname)
+        self.qdisc.append(intern(link.qdisc))
+        self.group.append(intern(link.group))
+
+    def __len__(self) -> int:
+        return len(self.ifindex)
+
+    def __getitem__(self, i: int) -> IPLink:
+        flags = self.flags[i]
+        link_type = self.link_type[i]
+        operstate = self.operstate[i]
+        linkmode = self.linkmode[i]
+        gen_mode = self.inet6_addr_gen_mode[i]
+        address = self.address[i]
+        broadcast = self.broadcast[i]
+        return IPLink(
+            ifindex=self.ifindex[i],
+            ifname=self.ifname[i],
+            flags=None if flags == NONE_U32 else decode_link_flags(flags),
+            qdisc=self.qdisc[i],
+            operstate=None if operstate == NONE_U8 else OPERSTATES[operstate],
+            linkmode=None if linkmode == NONE_U8 else LinkMode(linkmode),
+            group=self.group[i],
+            link_type=None if link_type == NONE_LINK_TYPE else LinkType(link_type),
+            address=None if address == NONE_MAC else LinuxMAC(address),
+            broadcast=None if broadcast == NONE_MAC else LinuxMAC(broadcast),
+            inet6_addr_gen_mode=None if gen_mode == NONE_U8 else Inet6AddrGenMode(gen_mode),
+            **{name: from_u32(column[i]) for name, column in self.u32_columns.items()}
+        )
+
+    def __iter__(self) -> Iterator[IPLink]:
+        return (self[i] for i in range(len(self)))
+
+
+# Families which lookups are done in, and the width of their addresses
+ADDRESS_BITS = {AddressFamily.INET: 32, AddressFamily.INET6: 128}
+
+
+def pack_ip(ip) -> bytes:
+    return ip.packed.rjust(16, b'\0')
+
+
+def unpack_ip(family: int, packed: bytes):
+    return IPv4Address(packed[12:]) if family == AddressFamily.INET else IPv6Address(packed)
+
+
+IFA_FLAG_BITS = dict(((name, flag.value) for flag, name in IFA_FLAG_NAMES), temporary=IFAFlag.SECONDARY.value)
+
+
+def ifa_flags_value(info: AddrInfo) -> int:
+    ''' Get back the kernel's ``IFA_FLAGS`` value from the flag names of an address. '''
+    value = info.unknown_flags
+    for name in info.flags:
+        value |= IFA_FLAG_BITS.get(name, 0)
+    if 'dynamic' not in info.flags:
+        value |= IFAFlag.PERMANENT.value
+    return value
+
+
+def tristate(value: Optional[bool]) -> int:
+    return -1 if value is None else int(value)
+
+
+def from_tristate(value: int) -> Optional[bool]:
+    return None if value < 0 else bool(value)
+
+
+def from_tristate_int(value: int) -> Optional[int]:
+    return None if value < 0 else value
+
+
+class AddrTable:
+    '''
+    Addresses, with the index of their interfaces, in columnar form.
+    It reads like a sequence of (ifindex, :py:class:`AddrInfo`), built on demand.
+    '''
+    def __init__(self):
+        self.ifindex = array('i')
+        self.family = array('B')
+        self.prefixlen = array('B')
+        self.scope = array('B')
+        self.dynamic = array('b')
+        self.mngtmpaddr = array('b')
+        self.noprefixroute = array('b')
+        # 0xFFFFFFFF means "forever" here, so None needs a wider column
+        self.valid_life_time = array('q')
+        self.preferred_life_time = array('q')
+        self.has_broadcast = array('B')
+        self.ifa_flags = array('I')
+        # 16 bytes per row, IPv4 addresses are right-aligned
+        self.local = bytearray()
+        self.broadcast = bytearray()
+        self.label: List[Optional[str]] = []
+
+    @classmethod
+    def from_addrs(cls, addrs: Iterable[Tuple[int, AddrInfo]]) -> 'AddrTable':
+        table = cls()
+        for ifindex, info in addrs:
+            table.append(ifindex, info)
+        return table
+
+    def append(self, ifindex: int, info: AddrInfo):
+        self.ifindex.append(ifindex)
+        self.family.append(info.family)
+        self.prefixlen.append(info.prefixlen)
+        self.scope.append(info.scope)
+        self.dynamic.append(tristate(info.dynamic))
+        self.mngtmpaddr.append(tristate(info.mngtmpaddr))
+        self.noprefixroute.append(tristate(info.noprefixroute))
+        self.valid_life_time.append(-1 if info.valid_life_time is None else info.valid_life_time)
+        self.preferred_life_time.append(-1 if info.preferred_life_time is None else info.preferred_life_time)
+        self.local += pack_ip(info.local)
+        self.has_broadcast.append(info.broadcast is not None)
+        self.broadcast += pack_ip(info.broadcast) if info.broadcast is not None else bytes(16)
+        self.label.append(intern(info.label))
+        self.ifa_flags.append(ifa_flags_value(info))
+
+    def __len__(self) -> int:
+        return len(self.ifindex)
+
+    def __getitem__(self, i: int) -> Tuple[int, AddrInfo]:
+        family = self.family[i]
+        flags, unknown_flags = decode_ifa_flags(family, self.ifa_flags[i])
+        return self.ifindex[i], AddrInfo(
+            family=AddressFamily(family),
+            local=unpack_ip(family, bytes(self.local[16 * i:16 * i + 16])),
+            prefixlen=self.prefixlen[i],
+            broadcast=unpack_ip(family, bytes(self.broadcast[16 * i:16 * i + 16]))
+            if self.has_broadcast[i] else None,
+            scope=RTScope(self.scope[i]),
+            dynamic=from_tristate(self.dynamic[i]),
+            mngtmpaddr=from_tristate(self.mngtmpaddr[i]),
+            noprefixroute=from_tristate(self.noprefixroute[i]),
+            label=self.label[i],
+            valid_life_time=from_tristate_int(self.valid_life_time[i]),
+            preferred_life_time=from_tristate_int(self.preferred_life_time[i]),
+            flags=flags,
+            unknown_flags=unknown_flags
+        )
+
+    def __iter__(self) -> Iterator[Tuple[int, AddrInfo]]:
+        return (self[i] for i in range(len(self)))
+
+    def addr_info(self, ifindex: int) -> Tuple[AddrInfo, ...]:
+        ''' The addresses of one interface. '''
+        return tuple(self[i][1] for i, x in enumerate(self.ifindex) if x == ifindex)
+
+
+class RouteTable:
+    '''
+    Routes in columnar form, with a longest-prefix-match index for :py:meth:`lookup`.
+
+    It is filled by :py:meth:`append`, or straight from the dump by :py:meth:`from_dump`
+    without building a :py:class:`~linetface.core.Route` per route, and reads like a sequence
+    of :py:class:`~linetface.core.Route`. The gateways and preferred sources repeat a lot,
+    they are kept once, and the rows only have their numbers.
+
+    The index compiles the prefix tree into the sorted list of the address ranges in which
+    the longest match doesn't change, so one lookup is one binary search, whatever the
+    number and lengths of the prefixes. It is built on the first lookup after the table is changed.
+    Among routes of the same prefix (in several routing tables, or with several metrics),
+    the one of lowest metric wins.
+    '''
+    def __init__(self):
+        self.family = array('B')
+        self.dst_len = array('B')
+        self.table = array('I')
+        self.protocol = array('B')
+        self.scope = array('B')
+        self.type = array('B')
+        self.flags = array('I')
+        self.metric = array('I')
+        self.oif = array('I')
+        # 0 is None, n is self.addresses[n - 1]
+        self.gateway = array('I')
+        self.prefsrc = array('I')
+        # 16 bytes per row, IPv4 addresses are right-aligned
+        self.dst = bytearray()
+        self.addresses: List[bytes] = []
+        self._address_numbers: Dict[bytes, int] = {}
+        self.nexthops: Dict[int, tuple] = {}
+        self._index: Dict[int, Tuple[array, array]] = {}
+
+    @classmethod
+    def from_routes(cls, routes: Iterable[Route]) -> 'RouteTable':
+        table = cls()
+        for route in routes:
+            table.append(route)
+        return table
+
+    @classmethod
+    def from_dump(cls, dump: Iterable[tuple]) -> 'RouteTable':
+        ''' Build from the output of :py:func:`linetface.rawnl.iter_route_fields`. '''
+        table = cls()
+        for fields in dump:
+            table.append_fields(*fields)
+        return table
+
+    def _address_number(self, packed: Optional[bytes]) -> int:
+        if packed is None:
+            return 0
+        number = self._address_numbers.get(packed)
+        if number is None:
+            self.addresses.append(packed)
+            number = self._address_numbers[packed] = len(self.addresses)
+        return number
+
+    def append(self, route: Route):
+        self.append_fields(route.family, route.dst.network_address.packed, route.dst.prefixlen, route.table,
+                           route.protocol, route.scope, route.type, route.flags,
+                           route.gateway.packed if route.gateway is not None else None, route.oif,
+                           route.prefsrc.packed if route.prefsrc is not None else None, route.metric,
+                           route.nexthops)
+
+    def append_fields(self, family: int, dst: bytes, dst_len: int, table: int, protocol: int, scope: int,
+                      rtype: int, flags: int, gateway: Optional[bytes], oif: Optional[int],
+                      prefsrc: Optional[bytes], metric: Optional[int], nexthops: tuple = ()):
+        ''' Add a route, given as the values of :py:func:`linetface.rawnl.decode_route_fields`. '''
+        if nexthops:
+            self.nexthops[len(self.family)] = nexthops
+        self.family.append(family)
+        self.dst += dst.rjust(16, b'\0')
+        self.dst_len.append(dst_len)
+        self.table.append(table)
+        self.protocol.append(protocol)
+        self.scope.append(scope)
+        self.type.append(rtype)
+        self.flags.append(flags)
+        self.gateway.append(self._address_number(gateway))
+        self.oif.append(u32(oif))
+        self.prefsrc.append(self._address_number(prefsrc))
+        self.metric.append(u32(metric))
+        self._index.clear()
+
+    def __len__(self) -> int:
+        return len(self.family)
+
+    def _address(self, number: int) -> Union[IPv4Address, IPv6Address, None]:
+        if not number:
+            return None
+        packed = self.addresses[number - 1]
+        return IPv4Address(packed) if len(packed) == 4 else IPv6Address(packed)
+
+    def __getitem__(self, i: int) -> Route:
+        family = self.family[i]
+        dst = bytes(self.dst[16 * i:16 * i + 16])
+        return make_route(family, dst[12:] if family == AddressFamily.INET else dst, self.dst_len[i], self.table[i],
+                          self.protocol[i], self.scope[i], self.type[i], self.flags[i],
+                          self.addresses[self.gateway[i] - 1] if self.gateway[i] else None, from_u32(self.oif[i]),
+                          self.addresses[self.prefsrc[i] - 1] if self.prefsrc[i] else None,
+                          from_u32(self.metric[i]), self.nexthops.get(i, ()))
+
+    def __iter__(self) -> Iterator[Route]:
+        return (self[i] for i in range(len(self)))
+
+    def _build_index(self, family: int) -> Tuple[array, array]:
+        bits = ADDRESS_BITS[family]
+        offset = 16 - bits // 8
+        # Sort by start of range, then from the shortest prefix to the longest,
+        # so that every prefix comes after the prefixes which contain it.
+        keys = []
+        dst = self.dst
+        for i, f in enumerate(self.family):
+            if f == family:
+                start = int.from_bytes(dst[16 * i + offset:16 * i + 16], 'big')
+                keys.append((start << 8 | self.dst_len[i]) << 32 | i)
+        keys.sort()
+        # IPv4 starts fit in 'I', IPv6 ones are kept as Python ints.
+        starts = array('I') if bits == 32 else []
+        rows = array('i')
+
+        def mark(start: int, row: int):
+            # From "start", the longest match is "row" (-1 for none)
+            if starts and starts[-1] == start:
+                rows[-1] = row
+            elif not rows or rows[-1] != row:
+                starts.append(start)
+                rows.append(row)
+
+        # Prefixes which contain the current position, the innermost last: (last address, row)
+        stack: List[Tuple[int, int]] = []
+        metric = self.metric
+        last_key = None
+        for key in keys:
+            row = key & 0xFFFFFFFF
+            prefix = key >> 32
+            start, length = prefix >> 8, prefix & 0xFF
+            end = start + (1 << (bits - length)) - 1
+            while stack and stack[-1][0] < start:
+                closed_end, _row = stack.pop()
+                mark(closed_end + 1, stack[-1][1] if stack else -1)
+            if prefix == last_key:
+                # Same prefix again: keep the lower metric
+                if metric[row] < metric[stack[-1][1]]:
+                    stack[-1] = end, row
+                    mark(start, row)
+                continue
+            last_key = prefix
+            stack.append((end, row))
+            mark(start, row)
+        while stack:
+            closed_end, _row = stack.pop()
+            if closed_end + 1 < 1 << bits:
+                mark(closed_end + 1, stack[-1][1] if stack else -1)
+        return starts, rows
+
+    def lookup_row(self, family: int, address: int) -> int:
+        '''
+        Find the row of the longest prefix which contains the address, given as an integer.
+        Return -1 if no route matches.
+
+        :raise ValueError: If the family is neither ``INET`` nor ``INET6``.
+        '''
+        index = self._index.get(family)
+        if index is None:
+            if family not in ADDRESS_BITS:
+                raise ValueError('Routes can only be looked up in INET or INET6, not {}'.format(family))
+            index = self._index[family] = self._build_index(family)
+        starts, rows = index
+        i = bisect_right(starts, address) - 1
+        return rows[i] if i >= 0 else -1
+
+    def lookup(self, address: Union[str, IPv4Address, IPv6Address]) -> Optional[Route]:
+        '''
+        Return the route of the longest prefix which contains the address, or ``None``.
+        '''
+        if isinstance(address, str):
+            address = ip_address(address)
+        family = AddressFamily.INET if address.version == 4 else AddressFamily.INET6
+        row = self.lookup_row(family, int(address))
+        return self[row] if row >= 0 else None
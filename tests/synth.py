@@ -0,0 +1,328 @@
+'''
+Builders for synthetic rtnetlink dumps.
+
+The messages are encoded byte by byte, the same way the kernel writes them to a
+netlink socket, so they can be fed to pyroute2's parser (or to anything else which reads
+raw netlink buffers) without privileges and without real interfaces.
+'''
+
+import random
+import struct
+import socket
+from ipaddress import IPv4Address, IPv6Address, ip_address
+from typing import Dict, Iterator, List, Tuple, Union
+
+from pyroute2.netlink.rtnl.marshal import MarshalRtnl
+
+
+RTM_NEWLINK = 16
+RTM_DELLINK = 17
+RTM_NEWADDR = 20
+RTM_DELADDR = 21
+RTM_NEWROUTE = 24
+RTM_NEWNEIGH = 28
+NLMSG_DONE = 3
+NLM_F_MULTI = 0x02
+NLM_F_DUMP_INTR = 0x10
+
+IFLA_ADDRESS = 1
+IFLA_BROADCAST = 2
+IFLA_IFNAME = 3
+IFLA_MTU = 4
+IFLA_QDISC = 6
+IFLA_TXQLEN = 13
+IFLA_OPERSTATE = 16
+IFLA_LINKMODE = 17
+IFLA_AF_SPEC = 26
+IFLA_GROUP = 27
+IFLA_PROMISCUITY = 30
+IFLA_NUM_TX_QUEUES = 31
+IFLA_NUM_RX_QUEUES = 32
+IFLA_GSO_MAX_SEGS = 40
+IFLA_GSO_MAX_SIZE = 41
+IFLA_MIN_MTU = 50
+IFLA_MAX_MTU = 51
+IFLA_INET6_ADDR_GEN_MODE = 8
+
+IFA_ADDRESS = 1
+IFA_LOCAL = 2
+IFA_LABEL = 3
+IFA_BROADCAST = 4
+IFA_CACHEINFO = 6
+IFA_FLAGS = 8
+
+RTA_DST = 1
+RTA_OIF = 4
+RTA_GATEWAY = 5
+RTA_PRIORITY = 6
+RTA_TABLE = 15
+
+NDA_DST = 1
+NDA_LLADDR = 2
+
+# Flags of a link which is UP, RUNNING and LOWER_UP, with BROADCAST and MULTICAST
+ETHER_FLAGS = 0x1 | 0x2 | 0x40 | 0x1000 | 0x10000
+
+
+def nla(kind: int, payload: bytes) -> bytes:
+    length = 4 + len(payload)
+    padding = b'\0' * ((4 - length % 4) % 4)
+    return struct.pack('HH', length, kind) + payload + padding
+
+
+def nlmsg(msg_type: int, body: bytes, seq: int = 0, flags: int = NLM_F_MULTI) -> bytes:
+    return struct.pack('IHHII', 16 + len(body), msg_type, flags, seq, 0) + body
+
+
+def link_msg(index: int, ifname: str, mac: bytes, flags: int = ETHER_FLAGS, mtu: int = 1500,
+             ifi_type: int = 1, operstate: int = 6, seq: int = 0, msg_type: int = RTM_NEWLINK) -> bytes:
+    inet6 = nla(socket.AF_INET6, nla(IFLA_INET6_ADDR_GEN_MODE, b'\0'))
+    attrs = b''.join((
+        nla(IFLA_IFNAME, ifname.encode() + b'\0'),
+        nla(IFLA_TXQLEN, struct.pack('I', 1000)),
+        nla(IFLA_OPERSTATE, struct.pack('B', operstate)),
+        nla(IFLA_LINKMODE, b'\0'),
+        nla(IFLA_MTU, struct.pack('I', mtu)),
+        nla(IFLA_MIN_MTU, struct.pack('I', 68)),
+        nla(IFLA_MAX_MTU, struct.pack('I', 65535)),
+        nla(IFLA_GROUP, struct.pack('I', 0)),
+        nla(IFLA_PROMISCUITY, struct.pack('I', 0)),
+        nla(IFLA_NUM_TX_QUEUES, struct.pack('I', 1)),
+        nla(IFLA_GSO_MAX_SEGS, struct.pack('I', 65535)),
+        nla(IFLA_GSO_MAX_SIZE, struct.pack('I', 65536)),
+        nla(IFLA_NUM_RX_QUEUES, struct.pack('I', 1)),
+        nla(IFLA_ADDRESS, mac),
+        nla(IFLA_BROADCAST, b'\xff' * 6),
+        nla(IFLA_QDISC, b'noqueue\0'),
+        nla(IFLA_AF_SPEC, inet6),
+    ))
+    header = struct.pack('BxHiII', socket.AF_UNSPEC, ifi_type, index, flags, 0)
+    return nlmsg(msg_type, header + attrs, seq)
+
+
+def addr_msg(index: int, address: str, prefixlen: int, label: str = None, scope: int = 0,
+             ifa_flags: int = 0x80, seq: int = 0, msg_type: int = RTM_NEWADDR) -> bytes:
+    if ':' in address:
+        family, packed = socket.AF_INET6, IPv6Address(address).packed
+    else:
+        family, packed = socket.AF_INET, IPv4Address(address).packed
+    attrs = [nla(IFA_ADDRESS, packed)]
+    if family == socket.AF_INET:
+        attrs.append(nla(IFA_LOCAL, packed))
+        attrs.append(nla(IFA_LABEL, label.encode() + b'\0'))
+    attrs.append(nla(IFA_FLAGS, struct.pack('I', ifa_flags)))
+    attrs.append(nla(IFA_CACHEINFO, struct.pack('IIII', 0xFFFFFFFF, 0xFFFFFFFF, 100, 100)))
+    header = struct.pack('BBBBI', family, prefixlen, ifa_flags & 0xFF, scope, index)
+    return nlmsg(msg_type, header + b''.join(attrs), seq)
+
+
+def route_msg(dst: bytes, dst_len: int, gateway: bytes = None, oif: int = 2, table: int = 254,
+              protocol: int = 186, metric: int = None, seq: int = 0) -> bytes:
+    family = socket.AF_INET if len(dst) == 4 else socket.AF_INET6
+    attrs = [nla(RTA_TABLE, struct.pack('I', table))]
+    if dst_len:
+        attrs.append(nla(RTA_DST, dst))
+    if metric is not None:
+        attrs.append(nla(RTA_PRIORITY, struct.pack('I', metric)))
+    if gateway is not None:
+        attrs.append(nla(RTA_GATEWAY, gateway))
+    attrs.append(nla(RTA_OIF, struct.pack('I', oif)))
+    # Universe scope, unicast
+    header = struct.pack('BBBBBBBBI', family, dst_len, 0, 0, min(table, 255), protocol, 0, 1, 0)
+    return nlmsg(RTM_NEWROUTE, header + b''.join(attrs), seq)
+
+
+def neigh_msg(index: int, address: str, lladdr: bytes = None, state: int = 0x02, flags: int = 0,
+              seq: int = 0) -> bytes:
+    packed = ip_address(address).packed
+    family = socket.AF_INET if len(packed) == 4 else socket.AF_INET6
+    attrs = nla(NDA_DST, packed)
+    if lladdr is not None:
+        attrs += nla(NDA_LLADDR, lladdr)
+    header = struct.pack('BxxxiHBB', family, index, state, flags, 1)
+    return nlmsg(RTM_NEWNEIGH, header + attrs, seq)
+
+
+# Share of each prefix length in a full IPv4 BGP table, roughly
+BGP_LENGTHS = ((24, 60), (23, 8), (22, 11), (21, 4), (20, 4), (19, 3), (18, 2), (17, 1), (16, 3),
+               (15, 1), (14, 1), (13, 1), (12, 1))
+
+
+def bgp_prefixes(count: int, seed: int = 0) -> Iterator[Tuple[bytes, int]]:
+    '''
+    Yield ``count`` random IPv4 prefixes (packed network, length), with the lengths of
+    a BGP table. Some are the same prefix again, as announced by another peer.
+    '''
+    rng = random.Random(seed)
+    lengths = [length for length, share in BGP_LENGTHS for _i in range(share)]
+    for _i in range(count):
+        length = rng.choice(lengths)
+        network = rng.getrandbits(length) << (32 - length)
+        yield network.to_bytes(4, 'big'), length
+
+
+def bgp_dump(count: int, seed: int = 0, chunk: int = 1000) -> Iterator[bytes]:
+    '''
+    Build the raw RTM_GETROUTE dump of a router which has a full table of ``count`` routes
+    over 4 peers, ``chunk`` messages per buffer, like the kernel sends them.
+    '''
+    messages = []
+    for n, (dst, dst_len) in enumerate(bgp_prefixes(count, seed)):
+        peer = n % 4
+        messages.append(route_msg(dst, dst_len, bytes((192, 0, 2, 1 + peer)), oif=2 + peer))
+        if len(messages) == chunk:
+            yield b''.join(messages)
+            messages = []
+    messages.append(done_msg())
+    yield b''.join(messages)
+
+
+def done_msg(seq: int = 0) -> bytes:
+    return nlmsg(NLMSG_DONE, struct.pack('i', 0), seq)
+
+
+def host_dump(nlinks: int, seq: int = 0) -> Tuple[bytes, bytes]:
+    '''
+    Build the raw RTM_GETLINK and RTM_GETADDR dump of a host which has ``nlinks``
+    veth-like interfaces, each with one IPv4 and two IPv6 addresses.
+    Interface index 1 is the loopback.
+    '''
+    links = [link_msg(1, 'lo', b'\0' * 6, flags=0x1 | 0x8 | 0x40 | 0x10000, mtu=65536,
+                      ifi_type=772, operstate=0, seq=seq)]
+    addrs = [addr_msg(1, '127.0.0.1', 8, 'lo', scope=254, seq=seq)]
+    for index in range(2, nlinks + 1):
+        ifname = 'veth{}'.format(index)
+        mac = b'\x02\x42' + struct.pack('>I', index)
+        links.append(link_msg(index, ifname, mac, seq=seq))
+        addrs.append(addr_msg(index, str(IPv4Address(0x0A000000 + index)), 16, ifname, seq=seq))
+    for index in range(2, nlinks + 1):
+        # Split the index in 16-bit groups, for the hosts with more than 65535 links
+        suffix = '{:x}:{:x}'.format(*divmod(index, 0x10000)) if index > 0xFFFF else '{:x}'.format(index)
+        addrs.append(addr_msg(index, 'fd00::' + suffix, 64, seq=seq))
+        addrs.append(addr_msg(index, 'fe80::42:' + suffix, 64, scope=253, seq=seq))
+    links.append(done_msg(seq))
+    addrs.append(done_msg(seq))
+    return b''.join(links), b''.join(addrs)
+
+
+def interrupted(data: bytes) -> bytes:
+    ''' Flag all the messages of a dump with NLM_F_DUMP_INTR, like the kernel when the table changes. '''
+    flagged = bytearray(data)
+    offset = 0
+    while offset < len(flagged):
+        length, _kind, flags = struct.unpack_from('IHH', flagged, offset)
+        struct.pack_into('H', flagged, offset + 6, flags | NLM_F_DUMP_INTR)
+        offset += length
+    return bytes(flagged)
+
+
+def split_families(addr_data: bytes, seq: int = 0) -> Dict[int, bytes]:
+    '''
+    Cut an address dump into the dumps of each family, as the kernel sends them
+    when the request names a family.
+    '''
+    parts: Dict[int, List[bytes]] = {}
+    offset = 0
+    while offset < len(addr_data):
+        length, kind = struct.unpack_from('IH', addr_data, offset)
+        if kind == RTM_NEWADDR:
+            parts.setdefault(addr_data[offset + 16], []).append(addr_data[offset:offset + length])
+        offset += length
+    return {family: b''.join(msgs) + done_msg(seq) for family, msgs in parts.items()}
+
+
+def parse(data: bytes) -> List:
+    ''' Decode a raw dump to pyroute2 messages, dropping the NLMSG_DONE trailer. '''
+    return [m for m in MarshalRtnl().parse(data) if m['header']['type'] != NLMSG_DONE]
+
+
+class FakeIPRoute:
+    '''
+    Stand-in for :py:class:`pyroute2.IPRoute` which answers from a synthetic dump.
+
+    Like pyroute2, it filters the address dump on the client side when ``label`` is given.
+    '''
+    def __init__(self, link_data: bytes, addr_data: bytes):
+        self.links = parse(link_data)
+        self.addrs = parse(addr_data)
+        self.requests = []
+
+    def setsockopt(self, *args):
+        pass
+
+    def get_links(self, *argv, **kwarg):
+        self.requests.append(('dump', 'link', kwarg))
+        return self.links
+
+    def link(self, command, index=None, ifname=None, ext_mask=None, match=None):
+        if command == 'dump':
+            # Like get_links(), without filters
+            self.requests.append(('dump', 'link', {}))
+            return self.links
+        self.requests.append((command, 'link', {'index': index, 'ifname': ifname}))
+        if index is not None:
+            return [m for m in self.links if m['index'] == index]
+        return [m for m in self.links if m.get_attr('IFLA_IFNAME') == ifname]
+
+    def get_addr(self, family=socket.AF_UNSPEC, match=None, **kwarg):
+        self.requests.append(('dump', 'addr', kwarg))
+        label = kwarg.get('label')
+        if label is None:
+            return self.addrs
+        return [m for m in self.addrs if m.get_attr('IFA_LABEL') == label]
+
+    def addr(self, command, family=None, index=None):
+        self.requests.append((command, 'addr', {'family': family, 'index': index}))
+        return [m for m in self.addrs if family in (None, m['family']) and index in (None, m['index'])]
+
+    def close(self):
+        pass
+
+
+class FakeSocket:
+    '''
+    Stand-in for a netlink socket, for the raw decoder (:py:mod:`linetface.rawnl`):
+    it answers dump requests from synthetic dumps, given by request type, in buffers
+    of about ``chunk`` bytes like the kernel does. The dumps keyed by (request type, family)
+    answer the requests for that family.
+    '''
+    def __init__(self, dumps: Dict[Union[int, Tuple[int, int]], bytes], chunk: int = 32768):
+        self.dumps = {kind: self.split(data, chunk) for kind, data in dumps.items()}
+        self.pending: List[bytearray] = []
+
+    @staticmethod
+    def split(data: bytes, chunk: int) -> List[Tuple[bytearray, List[int]]]:
+        ''' Cut at message boundaries, noting where each message starts. '''
+        buffers = []
+        start = 0
+        while start < len(data):
+            offsets = []
+            end = start
+            while end < len(data) and (end - start < chunk or not offsets):
+                offsets.append(end - start)
+                end += struct.unpack_from('I', data, end)[0]
+            buffers.append((bytearray(data[start:end]), offsets))
+            start = end
+        return buffers
+
+    def setsockopt(self, *args):
+        pass
+
+    def sendto(self, data: bytes, address):
+        _length, kind, _flags, seq, _pid = struct.unpack_from('IHHII', data)
+        self.pending = []
+        buffers = self.dumps.get((kind, data[16]))
+        if buffers is None:
+            buffers = self.dumps[kind]
+        for buffer, offsets in buffers:
+            # Answer with the sequence number of the request
+            for offset in offsets:
+                struct.pack_into('I', buffer, offset + 8, seq)
+            self.pending.append(buffer)
+        self.pending.reverse()
+
+    def recv(self, size: int) -> bytes:
+        return bytes(self.pending.pop())
+
+    def close(self):
+        pass
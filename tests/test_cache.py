@@ -0,0 +1,89 @@
+import errno
+from unittest import mock
+
+from linetface import hand, cache, netns
+from linetface.cache import InterfaceCache
+from linetface.hand import Linetface
+
+from .synth import host_dump, FakeIPRoute, parse, link_msg, addr_msg, RTM_DELLINK, RTM_DELADDR
+
+
+class ReplaySocket:
+    '''
+    Monitor socket which replays recorded notifications, one buffer per ``get()``.
+    An exception in the recording is raised instead.
+    '''
+    def __init__(self, recording):
+        self.recording = list(recording)
+
+    def setsockopt(self, *args):
+        pass
+
+    def bind(self, groups=0):
+        self.groups = groups
+
+    def get(self):
+        item = self.recording.pop(0)
+        if isinstance(item, Exception):
+            raise item
+        return parse(item)
+
+    def close(self):
+        pass
+
+
+def make_cache(recording, nlinks=3):
+    session = Linetface(pool_size=1)
+    with mock.patch.object(hand, '_IPRoute', return_value=FakeIPRoute(*host_dump(nlinks))), \
+            mock.patch.object(cache, '_IPRoute', return_value=ReplaySocket(recording)):
+        return InterfaceCache(session)
+
+
+def test_replay_link_and_addr_events():
+    recording = [
+        link_msg(9, 'veth9', b'\x02\x42\0\0\0\x09') + addr_msg(9, '10.9.0.1', 24, 'veth9'),
+        addr_msg(2, '10.0.0.2', 16, 'veth2', msg_type=RTM_DELADDR),
+        link_msg(3, 'veth3', b'\x02\x42\0\0\0\x03', msg_type=RTM_DELLINK),
+        link_msg(2, 'pod2', b'\x02\x42\0\0\0\x02', flags=0x2 | 0x1000),
+    ]
+    lc = make_cache(recording)
+    assert [li.ifname for li in lc.get_links()] == ['lo', 'veth2', 'veth3']
+    events = lc.poll(timeout=None)
+    assert [(e.event, e.ifindex) for e in events] == [('RTM_NEWLINK', 9), ('RTM_NEWADDR', 9)]
+    assert [str(a.local) for a in lc.addr(9).addr_info] == ['10.9.0.1']
+    lc.poll(timeout=None)
+    assert [str(a.local) for a in lc.addr(2).addr_info] == ['fd00::2', 'fe80::42:2']
+    lc.poll(timeout=None)
+    assert lc.link(3) is None and lc.link_by_name('veth3') is None
+    lc.poll(timeout=None)
+    assert lc.link_by_name('veth2') is None
+    assert lc.link_by_name('pod2').ifindex == 2
+    assert lc.addr(2).ifname == 'pod2'
+    assert [a.ifindex for a in lc.get_addrs()] == [1, 2, 9]
+
+
+def test_resync_on_enobufs():
+    lc = make_cache([OSError(errno.ENOBUFS, 'No buffer space available')])
+    with mock.patch.object(hand, '_IPRoute', return_value=FakeIPRoute(*host_dump(5))):
+        lc.session = Linetface(pool_size=1)
+        assert lc.poll(timeout=None) == []
+    assert lc.resyncs == 1
+    assert len(lc.get_links()) == 5
+
+
+def test_monitor_in_session_netns():
+    monitor = ReplaySocket([])
+    entered = []
+
+    def call_in(path, func):
+        entered.append(path)
+        return func()
+
+    with mock.patch.object(netns, 'call_in', call_in), \
+            mock.patch.object(hand, '_IPRoute', side_effect=lambda: FakeIPRoute(*host_dump(3))), \
+            mock.patch.object(cache, '_IPRoute', return_value=monitor):
+        lc = InterfaceCache(Linetface(pool_size=1, netns='/run/netns/blue'))
+    # The monitor and the socket of the dump were both opened in the namespace
+    assert entered == ['/run/netns/blue', '/run/netns/blue']
+    assert lc._monitor is monitor
+    assert [a.ifname for a in lc.get_addrs()] == ['lo', 'veth2', 'veth3']
@@ -0,0 +1,38 @@
+import json
+import subprocess
+
+import pytest
+
+from linetface import cli, rawnl
+
+
+def test_parse_args():
+    assert cli.parse_args(['-j', '-d', 'a', 'sh', 'dev', 'eth0']) == cli.Options('addr', True, True, None, 'eth0')
+    assert cli.parse_args(['-json', '-6', 'l', 'lo']) == cli.Options('link', True, False, rawnl.AF_INET6, 'lo')
+    for argv in ([], ['-j'], ['-j', 'route'], ['-x', 'link'], ['-j', 'link', 'dev'], ['-j', 'link', 'a', 'b']):
+        with pytest.raises(cli.UsageError):
+            cli.parse_args(argv)
+
+
+@pytest.mark.parametrize('args', [('-j', 'link'), ('-j', '-4', 'addr'), ('-j', 'addr', 'show', 'lo')])
+def test_output_same_as_ip(args, capsys):
+    assert cli.main(args) == 0
+    ours = json.loads(capsys.readouterr().out)
+    theirs = json.loads(subprocess.run(('ip',) + args, check=True, stdout=subprocess.PIPE).stdout)
+    assert ours == theirs
+
+
+@pytest.mark.parametrize('args', [('-j', '-d', 'link'), ('-j', '-d', 'addr')])
+def test_details_same_as_ip(args, capsys):
+    # Newer iproute2 shows some attributes which IPLink has no field for
+    assert cli.main(args) == 0
+    ours = json.loads(capsys.readouterr().out)
+    theirs = json.loads(subprocess.run(('ip',) + args, check=True, stdout=subprocess.PIPE).stdout)
+    assert [{k: t.get(k) for k in o} for o, t in zip(ours, theirs)] == ours and len(ours) == len(theirs)
+
+
+def test_unknown_device(capsys):
+    assert cli.main(['-j', 'link', 'dev', 'nosuch0']) == 1
+    out, err = capsys.readouterr()
+    assert out == ''
+    assert err == 'Device "nosuch0" does not exist.\n'
@@ -0,0 +1,40 @@
+import dataclasses
+from ipaddress import ip_address
+
+import pytest
+
+from linetface.consts import LinkFlag, LinkType, OperState
+from linetface.index import InterfaceIndex
+
+from .test_snapshot import get_addrs
+
+
+def test_interface_index():
+    records = list(get_addrs(4))
+    # veth3 has a second, narrower subnet, veth4 is down.
+    narrow = dataclasses.replace(records[2].addr_info[0], local=ip_address('10.0.1.3'), prefixlen=24)
+    records[2] = dataclasses.replace(records[2], addr_info=records[2].addr_info + (narrow,))
+    records[3] = dataclasses.replace(records[3], flags=(LinkFlag.BROADCAST, LinkFlag.MULTICAST),
+                                     operstate=OperState.DOWN)
+    index = InterfaceIndex(records)
+    up = index.with_flags(LinkFlag.UP | LinkFlag.MULTICAST, without=LinkFlag.LOOPBACK)
+    assert [r.ifname for r in up] == ['veth2', 'veth3']
+    # Same as scanning
+    assert [r.ifname for r in index.with_flags(LinkFlag.UP)] == \
+        [r.ifname for r in records if LinkFlag.UP in r.flags] == ['lo', 'veth2', 'veth3']
+    # The flags are the kernel's: RUNNING is there, and NO_CARRIER is UP without RUNNING
+    records[1] = dataclasses.replace(records[1], flags=(LinkFlag.NO_CARRIER,) + records[1].flags)
+    index = InterfaceIndex(records)
+    assert [r.ifname for r in index.with_flags(LinkFlag.RUNNING)] == ['lo', 'veth3']
+    assert [r.ifname for r in index.with_flags(LinkFlag.UP, without=LinkFlag.RUNNING)] == ['veth2']
+    with pytest.raises(ValueError):
+        index.with_flags(LinkFlag.NO_CARRIER)
+    assert [r.ifname for r in index.by_type(LinkType.ETHER)] == ['veth2', 'veth3', 'veth4']
+    assert [r.ifname for r in index.by_operstate(OperState.DOWN)] == ['veth4']
+    assert index.by_name('veth3') is index.by_index(3) is records[2]
+    assert index.by_name('eth0') is None
+    assert [r.ifname for r, _a in index.owners('fe80::42:2')] == ['veth2']
+    assert [(r.ifname, a.prefixlen) for r, a in index.containing('10.0.1.200')] == \
+        [('veth3', 24), ('veth2', 16), ('veth3', 16), ('veth4', 16)]
+    assert [r.ifname for r, _a in index.containing(ip_address('fd00::99'))] == ['veth2', 'veth3', 'veth4']
+    assert index.containing('192.168.1.1') == ()
@@ -0,0 +1,61 @@
+import io
+import json
+from pathlib import Path
+
+from linetface import hand, rawnl, ipjson
+
+from .synth import parse
+
+
+DATA = Path(__file__).parent / 'data'
+
+
+def recorded_records():
+    '''
+    Decode the dumps which were recorded together with tests/data/ip_link.json and ip_addr.json,
+    with both decoders.
+    '''
+    link_data = (DATA / 'host_links.bin').read_bytes()
+    addr_data = (DATA / 'host_addrs.bin').read_bytes()
+    fast_links = [rawnl.decode_link(link_data, start, end)
+                  for kind, _f, _s, start, end in rawnl.iter_messages(link_data) if kind == rawnl.RTM_NEWLINK]
+    fast_addrs = [rawnl.decode_addr(addr_data, start, end)
+                  for kind, _f, _s, start, end in rawnl.iter_messages(addr_data) if kind == rawnl.RTM_NEWADDR]
+    slow_links = [hand.shinify_link(m) for m in parse(link_data)]
+    slow_addrs = [(m['index'], hand.shinify_addr_info(m)) for m in parse(addr_data)]
+    for links, addrs in ((fast_links, fast_addrs), (slow_links, slow_addrs)):
+        joined = [hand.join_addr_info(li, [info for i, info in addrs if i == li.ifindex]) for li in links]
+        yield links, joined
+
+
+def assert_like_ip(ours, theirs):
+    ''' Same values, and the keys in the same order, except the ones that we don't support. '''
+    assert list(ours) == [k for k in theirs if k in ours]
+    for key, value in ours.items():
+        if key == 'addr_info':
+            assert len(value) == len(theirs[key])
+            for item, their_item in zip(value, theirs[key]):
+                assert_like_ip(item, their_item)
+        else:
+            assert value == theirs[key], key
+
+
+def test_golden_link_and_addr():
+    ip_links = json.loads((DATA / 'ip_link.json').read_text())
+    ip_addrs = json.loads((DATA / 'ip_addr.json').read_text())
+    for links, addrs in recorded_records():
+        for ours, theirs in ((ipjson.dumps(links), ip_links), (ipjson.dumps(addrs), ip_addrs)):
+            ours = json.loads(ours)
+            assert len(ours) == len(theirs)
+            for item, their_item in zip(ours, theirs):
+                assert_like_ip(item, their_item)
+
+
+def test_dump_streams():
+    _links, addrs = next(recorded_records())
+    out = io.StringIO()
+    ipjson.dump(iter(addrs), out)
+    assert out.getvalue() == ipjson.dumps(addrs) + '\n'
+    out = io.StringIO()
+    ipjson.dump(iter(()), out)
+    assert json.loads(out.getvalue()) == []
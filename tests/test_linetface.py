@@ -1,8 +1,30 @@
+import dataclasses
+import errno
 import json
+import pickle
+import socket
+import sys
+import struct
+from pathlib import Path
+import asyncio
 import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
 
+import pytest
 from devtools import debug
-from linetface.hand import get_links
+from netaddr import EUI
+import linetface
+from linetface import hand, aio, rawnl, consts
+from linetface.core import IPCommonInfo, IPLink, IPAddr, LinuxMAC
+from linetface.hand import Linetface, get_links
+from linetface.metrics import Metrics
+
+from .synth import host_dump, split_families, interrupted, link_msg, done_msg, FakeIPRoute, FakeSocket, parse
+
+
+ROOT = Path(__file__).parent.parent
+DATA = ROOT / 'tests' / 'data'
 
 
 def test_get_links():
@@ -16,3 +38,392 @@ def test_get_links():
     assert first_link.max_mtu == first_stdlink['max_mtu']
     debug(first_stdlink)
     assert str(first_link.inet6_addr_gen_mode) == first_stdlink['inet6_addr_gen_mode']
+
+
+def test_get_addrs_join_by_index():
+    fake = FakeIPRoute(*host_dump(4))
+    with mock.patch.object(hand, '_IPRoute', return_value=fake), Linetface() as session:
+        addrs = session.get_addrs()
+    assert [a.ifname for a in addrs] == ['lo', 'veth2', 'veth3', 'veth4']
+    assert len(addrs[0].addr_info) == 1
+    veth3 = addrs[2]
+    assert [str(a.local) for a in veth3.addr_info] == ['10.0.0.3', 'fd00::3', 'fe80::42:3']
+
+
+def test_session_reuses_sockets():
+    with mock.patch.object(hand, '_IPRoute', side_effect=lambda: FakeIPRoute(*host_dump(3))) as factory:
+        with Linetface(pool_size=2) as session:
+            with ThreadPoolExecutor(8) as executor:
+                futures = [executor.submit(session.get_addrs) for _ in range(8)]
+            assert all(len(f.result()) == 3 for f in futures)
+            session.get_links()
+            assert 1 <= factory.call_count <= 2
+            # A socket on which a query failed is not reused
+            idle = len(session._idle)
+            with pytest.raises(ValueError), session.socket():
+                raise ValueError
+            assert len(session._idle) == idle - 1
+
+
+def test_aio_matches_blocking():
+    links = asyncio.run(aio.get_links())
+    addrs = asyncio.run(aio.get_addrs())
+    with Linetface() as session:
+        assert [li.ifname for li in links] == [li.ifname for li in session.get_links()]
+        assert [a.addr_info for a in addrs] == [a.addr_info for a in session.get_addrs()]
+
+
+def test_aio_cancelled_dump():
+    pairs = []
+
+    def socketpair(groups=0):
+        pair = socket.socketpair(socket.AF_UNIX, socket.SOCK_DGRAM)
+        for sock in pair:
+            sock.setblocking(False)
+        pairs.append(pair)
+        return pair[0]
+
+    async def main():
+        lf = aio.AsyncLinetface()
+        task = asyncio.create_task(lf.get_links())
+        await asyncio.sleep(0)
+        kernel = pairs[0][1]
+        seq = struct.unpack_from('I', kernel.recv(4096), 8)[0]
+        # Half of the dump, then the task is cancelled while waiting for the rest
+        kernel.send(link_msg(1, 'lo', b'\0' * 6, seq=seq))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert pairs[0][0].fileno() == -1
+        # The next query doesn't read the rest of the cancelled dump: it has its own socket.
+        task = asyncio.create_task(lf.get_links())
+        await asyncio.sleep(0)
+        kernel = pairs[1][1]
+        seq = struct.unpack_from('I', kernel.recv(4096), 8)[0]
+        kernel.send(host_dump(2, seq)[0])
+        return await task
+
+    with mock.patch.object(aio, 'open_socket', socketpair):
+        links = asyncio.run(main())
+    assert [li.ifname for li in links] == ['lo', 'veth2']
+    for sock in sum(pairs, ()):
+        sock.close()
+
+
+def test_aio_interrupted_dump():
+    pairs = []
+
+    def socketpair(groups=0):
+        pair = socket.socketpair(socket.AF_UNIX, socket.SOCK_DGRAM)
+        for sock in pair:
+            sock.setblocking(False)
+        pairs.append(pair)
+        return pair[0]
+
+    async def reply(task, flagged):
+        # Answer each dump request of the task, the first ``flagged`` ones as interrupted
+        while not task.done():
+            await asyncio.sleep(0.01)
+            try:
+                request = pairs[-1][1].recv(4096)
+            except BlockingIOError:
+                continue
+            data = host_dump(2, struct.unpack_from('I', request, 8)[0])[0]
+            pairs[-1][1].send(interrupted(data) if flagged > 0 else data)
+            flagged -= 1
+
+    async def query(lf, flagged):
+        task = asyncio.create_task(lf.get_links())
+        await reply(task, flagged)
+        return await task
+
+    async def main():
+        lf = aio.AsyncLinetface(dump_retries=1)
+        links = await query(lf, 1)
+        assert lf.interrupted_dumps == 1
+        with pytest.raises(rawnl.DumpInterrupted):
+            await query(lf, 2)
+        assert lf.interrupted_dumps == 3
+        # The interrupted dumps were read to their end: the socket is still used
+        assert len(pairs) == 1
+        return links
+
+    with mock.patch.object(aio, 'open_socket', socketpair):
+        links = asyncio.run(main())
+    assert [li.ifname for li in links] == ['lo', 'veth2']
+    for sock in sum(pairs, ()):
+        sock.close()
+
+
+def test_filtered_queries():
+    fake = FakeIPRoute(*host_dump(4))
+    with mock.patch.object(hand, '_IPRoute', return_value=fake), Linetface() as session:
+        assert [li.ifindex for li in session.get_links(ifname='veth3')] == [3]
+        assert session.get_links(ifname='veth3', ifindex=2) == ()
+        addrs = session.get_addrs(family=socket.AF_INET6, ifindex=4)
+        lo_only = session.get_addrs(family=socket.AF_INET, ifindex=1)
+    assert [str(a.local) for a in addrs[0].addr_info] == ['fd00::4', 'fe80::42:4']
+    assert [a.ifname for a in lo_only] == ['lo']
+    # None of the filtered queries was a full dump
+    assert not any(command == 'dump' and not kwarg for command, _kind, kwarg in fake.requests)
+
+
+def test_rawnl_matches_pyroute2():
+    recorded = ((DATA / 'host_links.bin').read_bytes(), (DATA / 'host_addrs.bin').read_bytes())
+    for link_data, addr_data in (recorded, host_dump(5)):
+        fast_links = [rawnl.decode_link(link_data, start, end)
+                      for kind, _f, _s, start, end in rawnl.iter_messages(link_data) if kind == rawnl.RTM_NEWLINK]
+        assert fast_links == [hand.shinify_link(m) for m in parse(link_data)]
+        fast_addrs = [rawnl.decode_addr(addr_data, start, end)
+                      for kind, _f, _s, start, end in rawnl.iter_messages(addr_data) if kind == rawnl.RTM_NEWADDR]
+        assert fast_addrs == [(m['index'], hand.shinify_addr_info(m)) for m in parse(addr_data)]
+
+    # Unknown values raise the same error with both decoders (pyroute2 keeps the raw attribute)
+    link_data = link_msg(2, 'veth2', b'\0' * 6, operstate=7)
+    _kind, _f, _s, start, end = next(rawnl.iter_messages(link_data))
+    with pytest.raises(ValueError, match='is not a valid OperState'):
+        rawnl.decode_link(link_data, start, end)
+    with pytest.raises(ValueError, match='is not a valid OperState'):
+        hand.shinify_link(parse(link_data)[0])
+
+
+def test_lazy_records_match_eager():
+    link_data, addr_data = host_dump(3)
+    fake = FakeIPRoute(link_data, addr_data)
+    eager = [hand.shinify_link(m) for m in fake.links]
+    lazy = [rawnl.LazyIPLink(link_data, start, end)
+            for kind, _f, _s, start, end in rawnl.iter_messages(link_data) if kind == rawnl.RTM_NEWLINK]
+    assert lazy[1].ifname == 'veth2'
+    with pytest.raises(AttributeError):
+        # Not decoded yet
+        IPCommonInfo.address.__get__(lazy[1])
+    assert lazy == eager
+    assert [repr(li) for li in lazy] == [repr(li) for li in eager]
+    assert lazy[2].to_dict() == eager[2].to_dict()
+    joined = hand.join_addr_info(lazy[2], ())
+    assert isinstance(joined, rawnl.LazyIPAddr)
+    assert joined == hand.join_addr_info(eager[2], ())
+    # Replacing a field gives an eager record
+    renamed = dataclasses.replace(lazy[1], ifname='pod2')
+    assert type(renamed) is IPLink and renamed == dataclasses.replace(eager[1], ifname='pod2')
+    assert type(dataclasses.replace(joined, addr_info=())) is IPAddr
+
+
+def test_tables_roundtrip():
+    fake = FakeIPRoute(*host_dump(4))
+    with mock.patch.object(hand, '_IPRoute', return_value=fake), Linetface() as session:
+        links = session.get_links()
+        addrs = session.get_addrs()
+        link_table = session.get_link_table()
+        addr_table = session.get_addr_table()
+    assert len(link_table) == 4
+    assert list(link_table) == list(links)
+    assert link_table[0].flags == links[0].flags
+    assert len(addr_table) == 1 + 3 * 3
+    for a in addrs:
+        assert addr_table.addr_info(a.ifindex) == a.addr_info
+
+
+def test_flags_match_ip():
+    ip_stdout = subprocess.run(('ip', '-j', '-d', 'addr'), check=True, stdout=subprocess.PIPE).stdout
+    standard = {b['ifindex']: b for b in json.loads(ip_stdout)}
+    for addr in hand.get_addrs():
+        stdaddr = standard[addr.ifindex]
+        assert [str(f) for f in addr.flags] == stdaddr['flags']
+        for info, stdinfo in zip(addr.addr_info, stdaddr['addr_info']):
+            assert info.flags == tuple(k for k, v in stdinfo.items() if v is True)
+
+
+def test_ifa_flags_like_iproute2():
+    # SECONDARY is "temporary" for IPv6, PERMANENT is shown as the lack of "dynamic"
+    assert consts.decode_ifa_flags(socket.AF_INET6, 0x201) == (('temporary', 'dynamic', 'noprefixroute'), 0)
+    assert consts.decode_ifa_flags(socket.AF_INET, 0x81) == (('secondary',), 0)
+    assert consts.decode_ifa_flags(socket.AF_INET, 0x1080) == ((), 0x1000)
+    assert consts.decode_link_flags(0x1003) == (consts.LinkFlag.NO_CARRIER, consts.LinkFlag.BROADCAST,
+                                                consts.LinkFlag.MULTICAST, consts.LinkFlag.UP)
+
+
+def test_mac_interned():
+    broadcast = LinuxMAC('ff:ff:ff:ff:ff:ff')
+    assert LinuxMAC(b'\xff' * 6) is broadcast
+    assert LinuxMAC(0xFFFFFFFFFFFF) is broadcast
+    mac = LinuxMAC(EUI('02-42-AC-11-00-02'))
+    assert str(mac) == '02:42:ac:11:00:02'
+    assert mac.to_eui() == EUI('02:42:ac:11:00:02')
+    assert mac == '02:42:ac:11:00:02'
+    assert mac.words == (0x02, 0x42, 0xac, 0x11, 0x00, 0x02)
+    assert pickle.loads(pickle.dumps(mac)) is mac
+    # Hardware addresses of other lengths, like InfiniBand's 20 bytes
+    assert len(LinuxMAC(bytes(range(20))).packed) == 20
+
+
+def test_mac_spellings():
+    mac = LinuxMAC('02:42:ac:11:00:02')
+    for text in ('2:42:ac:11:0:2', '02-42-AC-11-00-02', '0242.ac11.0002', '0242ac-110002', '0242ac110002'):
+        assert LinuxMAC(text) is mac
+    assert str(LinuxMAC('1:2:3:4:5:6')) == '01:02:03:04:05:06'
+    assert LinuxMAC('2:42:ac:11:0:2:3:4').length == LinuxMAC('0242.ac11.0002.0304').length == 8
+    for text in ('', '02:42:ac:11:00:002', '02:42-ac:11:00:02', '0242ac11000', '02:42:ac:11::02', '+2:42',
+                 'ab', '1:2', '1.2.3', '242.ac11.2', '1:2:3:4:5:6:7', '0242ac11000203'):
+        with pytest.raises(ValueError):
+            LinuxMAC(text)
+    # Only the kernel's bytes can have other lengths
+    assert LinuxMAC(b'\x01\x02').length == 2
+    macs = [LinuxMAC('00:00:00:00:00:00:00:01'), LinuxMAC('00:00:00:00:00:02'), LinuxMAC('00:00:00:00:00:01')]
+    assert [str(m) for m in sorted(macs)] == ['00:00:00:00:00:01', '00:00:00:00:00:02', '00:00:00:00:00:00:00:01']
+    assert mac > '02:42:ac:11:00:01' and mac <= EUI('02-42-ac-11-00-02')
+
+
+def test_import_is_light():
+    code = ('import sys, linetface, linetface.consts; '
+            'print(sorted(m for m in ("pyroute2", "netaddr") if m in sys.modules))')
+    output = subprocess.run((sys.executable, '-c', code), check=True, stdout=subprocess.PIPE).stdout
+    assert json.loads(output.decode().replace("'", '"')) == []
+    assert linetface.__version__
+    assert linetface.Linetface is hand.Linetface
+
+
+def test_dump_closed_early():
+    sock = rawnl.open_socket()
+    links = rawnl.iter_links(sock)
+    next(links)
+    links.close()
+    # The rest of the dump was drained, the socket can be used again
+    assert len(list(rawnl.iter_links(sock))) == len(get_links())
+    sock.close()
+
+
+def summary(records) -> list:
+    return [(r.ifindex, r.ifname, [str(a.local) for a in r.addr_info]) for r in records]
+
+
+class ReturnedSockets(list):
+    ''' Pool of idle sockets which notes the buffers left unread on each one given back. '''
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.unread = []
+
+    def append(self, ip):
+        self.unread.append(len(ip.pending))
+        super().append(ip)
+
+
+@pytest.mark.parametrize('ordered', (True, False))
+def test_iter_addrs_like_get_addrs(ordered):
+    link_data, addr_data = host_dump(300)
+    dumps = {rawnl.RTM_GETLINK: link_data, rawnl.RTM_GETADDR: addr_data}
+    for family, data in split_families(addr_data).items():
+        dumps[(rawnl.RTM_GETADDR, family)] = data
+    for decoder, profile in (('fast', 'ip-compatible'), ('lazy', 'minimal')):
+        with mock.patch.object(hand, '_IPRoute', side_effect=lambda: FakeSocket(dumps, chunk=4096)), \
+                mock.patch.object(hand, 'ORDERED_DUMPS', ordered), \
+                Linetface(decoder=decoder, profile=profile) as session:
+            for family in (None, socket.AF_INET6):
+                assert summary(session.iter_addrs(family)) == summary(session.get_addrs(family))
+            assert [li.ifname for li in session.iter_links()] == [li.ifname for li in session.get_links()]
+            # Stopped early, the sockets are given back, with their dumps drained by then
+            session._idle = ReturnedSockets(session._idle)
+            records = session.iter_addrs()
+            next(records)
+            records.close()
+            assert len(session._idle) == (3 if ordered else 1)
+            assert session._idle.unread == [0] * len(session._idle)
+    # With the kernel's dumps
+    with mock.patch.object(hand, 'ORDERED_DUMPS', ordered), Linetface(decoder='fast') as session:
+        assert summary(session.iter_addrs()) == summary(session.get_addrs())
+
+
+def test_merge_out_of_order():
+    fake = FakeIPRoute(*host_dump(6))
+    links = tuple(map(hand.shinify_link, fake.links))
+    addrs = [(m['index'], hand.shinify_addr_info(m)) for m in fake.addrs]
+    by_index = {li.ifindex: li for li in links}
+    # Links 3 and 2 swapped, link 5 removed between the dumps
+    shuffled = [by_index[i] for i in (1, 3, 2, 4, 6)]
+    v4 = iter([a for a in addrs if a[1].family == socket.AF_INET])
+    v6 = iter([a for a in addrs if a[1].family == socket.AF_INET6])
+    merged = summary(hand.merge_addr_info(shuffled, [v4, v6]))
+    assert [r[0] for r in merged] == [1, 3, 2, 4, 6]
+    for index, _name, locals_ in merged:
+        assert locals_ == [str(a.local) for i, a in addrs if i == index]
+
+
+class FlakySocket(FakeSocket):
+    ''' Answers the first ``failures`` requests with interrupted dumps. '''
+    def __init__(self, dumps, failures: int):
+        super().__init__(dumps)
+        self.bad = FakeSocket({kind: interrupted(data) for kind, data in dumps.items()})
+        self.failures = failures
+
+    def sendto(self, data, address):
+        if self.failures:
+            self.failures -= 1
+            self.bad.sendto(data, address)
+            self.pending = self.bad.pending
+        else:
+            super().sendto(data, address)
+
+
+def test_interrupted_dump_retried():
+    link_data, addr_data = host_dump(20)
+    dumps = {rawnl.RTM_GETLINK: link_data, rawnl.RTM_GETADDR: addr_data}
+    metrics = Metrics()
+    with mock.patch.object(hand, '_IPRoute', return_value=FlakySocket(dumps, 2)), \
+            Linetface(pool_size=1, decoder='fast', metrics=metrics, dump_retries=2) as session:
+        assert len(session.get_links()) == 20
+        assert session.interrupted_dumps == 2
+        assert metrics.totals()[('get_links', 'fast')].interrupted == 2
+        session.dump_retries = 0
+        session._idle[0].failures = 1
+        with pytest.raises(rawnl.DumpInterrupted):
+            session.get_addrs()
+    # pyroute2 doesn't check the flag, linetface does
+    hand.check_dump(parse(link_data))
+    with pytest.raises(rawnl.DumpInterrupted):
+        hand.check_dump(parse(interrupted(link_data)))
+
+
+BATCHED = r'''
+import json, subprocess
+from linetface import Linetface
+from linetface.metrics import Metrics
+commands = ''.join('link add ifb{} type ifb\n'.format(i) for i in range(1000))
+subprocess.run(('ip', '-b', '-'), input=commands.encode(), check=True)
+out = {}
+for batch in (1, 16):
+    metrics = Metrics()
+    with Linetface(decoder='fast', recv_batch=batch, rcvbuf=1 << 20, metrics=metrics) as session:
+        out[batch] = [link.ifname for link in session.get_links()]
+    out['recvs', batch] = metrics.totals()[('get_links', 'fast')].recvs
+print(json.dumps([out[1] == out[16], len(out[16]), out['recvs', 1], out['recvs', 16]]))
+'''
+
+
+def test_batched_recv():
+    if subprocess.run(('unshare', '-rn', 'true'), stderr=subprocess.DEVNULL).returncode:
+        pytest.skip('User namespaces are not available')
+    proc = subprocess.run(('unshare', '-rn', sys.executable, '-c', BATCHED), cwd=ROOT,
+                          stdout=subprocess.PIPE, check=True)
+    same, count, recvs, batched_recvs = json.loads(proc.stdout)
+    assert same and count == 1001
+    assert batched_recvs < recvs / 8
+
+
+def test_batched_truncated():
+    ours, theirs = socket.socketpair(socket.AF_UNIX, socket.SOCK_DGRAM)
+    with ours, theirs:
+        batched = rawnl.BatchedSocket(ours)
+        if not batched._recvmmsg:
+            pytest.skip('recvmmsg is not available')
+        theirs.send(done_msg(1))
+        theirs.send(done_msg(2))
+        assert batched.recv_datagrams() == [done_msg(1), done_msg(2)]
+        slots = batched._slots
+        theirs.send(bytes(rawnl.RCVBUF + 4))
+        with pytest.raises(OSError) as raised:
+            batched.recv_datagrams()
+        assert raised.value.errno == errno.EMSGSIZE and batched._slots is slots
+    # A message which goes past the end of its buffer
+    with pytest.raises(ValueError):
+        list(rawnl.iter_messages(done_msg(1)[:-2]))
@@ -0,0 +1,50 @@
+from unittest import mock
+
+from linetface import hand, rawnl
+from linetface.hand import Linetface
+from linetface.metrics import Metrics, PHASES
+
+from .synth import host_dump, FakeSocket
+
+
+def test_counts_and_phases():
+    link_data, addr_data = host_dump(100)
+    fake = FakeSocket({rawnl.RTM_GETLINK: link_data, rawnl.RTM_GETADDR: addr_data}, chunk=4096)
+    metrics = Metrics()
+    records = []
+    metrics.add_hook(records.append)
+    with mock.patch.object(hand, '_IPRoute', return_value=fake), \
+            Linetface(decoder='fast', metrics=metrics) as session:
+        addrs = session.get_addrs()
+        session.metrics = None
+        assert session.get_addrs() == addrs
+    assert len(records) == 1
+    record = records[0]
+    assert (record.operation, record.decoder, record.error) == ('get_addrs', 'fast', None)
+    # 100 links, 298 addresses (lo has only one), and the end of each dump
+    assert record.messages == 400
+    assert record.bytes == len(link_data) + len(addr_data)
+    assert record.recvs == len(fake.dumps[rawnl.RTM_GETLINK]) + len(fake.dumps[rawnl.RTM_GETADDR])
+    assert set(record.wall) == set(record.cpu) == set(PHASES)
+    assert all(t >= 0 for t in record.wall.values())
+    assert record.wall['decode'] > 0 and record.wall['materialize'] > 0
+    # The socket is given back as it was
+    assert 'recv' not in vars(fake)
+    assert metrics.as_dict()['get_addrs']['fast']['messages'] == 400
+
+
+def test_real_socket_and_prometheus():
+    metrics = Metrics()
+    for decoder in ('pyroute2', 'fast'):
+        with Linetface(decoder=decoder, metrics=metrics) as session:
+            session.get_links()
+            session.get_links()
+    totals = metrics.totals()
+    pyroute2, fast = totals[('get_links', 'pyroute2')], totals[('get_links', 'fast')]
+    assert pyroute2.calls == fast.calls == 2
+    assert pyroute2.messages == fast.messages > 2
+    assert pyroute2.recvs >= 2 and fast.recvs >= 2
+    text = metrics.to_prometheus()
+    assert '# TYPE linetface_calls_total counter' in text
+    assert 'linetface_calls_total{operation="get_links",decoder="fast"} 2' in text
+    assert 'linetface_phase_wall_seconds_total{operation="get_links",decoder="pyroute2",phase="recv"}' in text
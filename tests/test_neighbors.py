@@ -0,0 +1,34 @@
+import json
+import subprocess
+
+from linetface import rawnl, get_neighbors
+from linetface.consts import NUDState
+from linetface.index import NeighborIndex
+
+from .synth import neigh_msg
+
+
+def test_get_neighbors_like_ip():
+    theirs = json.loads(subprocess.run(('ip', '-j', 'neigh'), check=True, stdout=subprocess.PIPE).stdout)
+    ours = get_neighbors()
+    assert sorted((str(n.dst), str(n.lladdr), [str(n.state)]) for n in ours) == \
+        sorted((d['dst'], d.get('lladdr', 'None'), d['state']) for d in theirs)
+
+
+def test_neighbor_index():
+    camera = b'\x00\x12\x34\x56\x78\x9a'
+    data = b''.join((
+        neigh_msg(2, '10.0.0.7', camera),
+        neigh_msg(2, 'fe80::212:34ff:fe56:789a', camera, state=0x04, flags=0x80),
+        neigh_msg(3, '10.0.0.7', b'\x02\0\0\0\0\x01'),
+        neigh_msg(2, '10.0.0.8', state=0x20),
+    ))
+    neighbors = [rawnl.decode_neighbor(data, start, end) for _k, _f, _s, start, end in rawnl.iter_messages(data)]
+    assert neighbors[1].router and neighbors[1].state == NUDState.STALE
+    assert neighbors[3].lladdr is None and neighbors[3].state == NUDState.FAILED
+    index = NeighborIndex(iter(neighbors))
+    assert len(index) == 4
+    assert [str(n.dst) for n in index.by_mac('00:12:34:56:78:9a')] == ['10.0.0.7', 'fe80::212:34ff:fe56:789a']
+    assert index.by_ip('10.0.0.7').ifindex == 2
+    assert str(index.by_ip('10.0.0.7', ifindex=3).lladdr) == '02:00:00:00:00:01'
+    assert index.by_ip('10.0.0.9') is None
@@ -0,0 +1,69 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from linetface.netns import netns_path, default_collector, collect_namespaces
+
+
+ROOT = Path(__file__).parent.parent
+
+# Run in a new user namespace (as its root, without any privilege outside), so that it can
+# create network namespaces and enter them.
+CHILD = r'''
+import json, subprocess
+from linetface.netns import NamespaceCollector
+
+def spawn(n):
+    script = 'ip link set lo up && ip addr add 10.0.0.{}/8 dev lo && echo ready && exec sleep 60'.format(n)
+    proc = subprocess.Popen(('unshare', '-n', 'sh', '-c', script), stdout=subprocess.PIPE)
+    assert proc.stdout.readline() == b'ready\n'
+    return proc
+
+procs = [spawn(n) for n in (1, 2, 3)]
+out = {}
+with NamespaceCollector(workers=2) as collector:
+    namespaces = [procs[0].pid, '/proc/{}/ns/net'.format(procs[1].pid), procs[2].pid]
+    first = collector.collect(namespaces)
+    out['first'] = [[str(a.local) for a in first[ns][0].addr_info if a.family == 2] for ns in namespaces]
+    sessions = [collector.session(ns) for ns in namespaces]
+    procs[2].kill()
+    procs[2].wait()
+    second = collector.collect(namespaces)
+    out['reused'] = [collector.session(ns) is s for ns, s in zip(namespaces[:2], sessions)]
+    out['second'] = [str(ns) for ns in second]
+    out['errors'] = [type(e).__name__ for e in collector.errors.values()]
+for p in procs:
+    p.kill()
+print(json.dumps(out))
+'''
+
+
+def test_netns_path():
+    assert netns_path(42) == '/proc/42/ns/net'
+    assert netns_path('blue') == '/run/netns/blue'
+    assert netns_path('/var/run/netns/red') == '/var/run/netns/red'
+
+
+def test_collect_namespaces():
+    if subprocess.run(('unshare', '-r', 'true'), stderr=subprocess.DEVNULL).returncode:
+        pytest.skip('User namespaces are not available')
+    proc = subprocess.run(('unshare', '-r', sys.executable, '-c', CHILD), cwd=ROOT,
+                          stdout=subprocess.PIPE, check=True)
+    out = json.loads(proc.stdout)
+    # Each namespace has its own lo, with its own address
+    assert out['first'] == [['127.0.0.1', '10.0.0.1'], ['127.0.0.1', '10.0.0.2'], ['127.0.0.1', '10.0.0.3']]
+    assert out['reused'] == [True, True]
+    assert len(out['second']) == 2
+    assert out['errors'] == ['FileNotFoundError']
+
+
+def test_default_collector_workers():
+    collector = default_collector(2)
+    assert default_collector(3) is collector and collector.workers == 3
+    # The resized collector still runs queries, here against a namespace which doesn't exist
+    assert collect_namespaces(['/nonexistent/ns'], workers=1) == {}
+    assert collector.workers == 1
+    assert type(collector.errors['/nonexistent/ns']) is FileNotFoundError
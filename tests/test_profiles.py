@@ -0,0 +1,45 @@
+import dataclasses
+
+import pytest
+
+from linetface.hand import Linetface
+from linetface.metrics import Metrics
+from linetface.profiles import DumpProfile, PROFILES
+
+
+def test_minimal_profile():
+    results = []
+    for decoder in Linetface.decoders:
+        with Linetface(decoder=decoder, profile='minimal') as session:
+            results.append(session.get_links())
+    assert results[0] == results[1] == results[2]
+    lo = results[0][0]
+    assert (lo.ifname, lo.mtu, lo.txqlen, lo.qdisc) == ('lo', 65536, None, None)
+    assert {f.name for f in dataclasses.fields(lo) if getattr(lo, f.name) is not None} <= PROFILES['minimal'].fields
+    with pytest.raises(ValueError):
+        DumpProfile('typo', None, ('ifnmae',))
+
+
+def test_profiles_bytes():
+    metrics = Metrics()
+    sizes = {}
+    for name in ('full', 'ip-compatible'):
+        with Linetface(decoder='fast', profile=name, metrics=metrics) as session:
+            links = session.get_links()
+        sizes[name] = metrics.totals()[('get_links', 'fast')].bytes
+        metrics.reset()
+    assert 0 < sizes['ip-compatible'] <= sizes['full']
+    # Same records, only the statistics are left out
+    with Linetface(decoder='fast', profile='full') as session:
+        assert session.get_links() == links
+
+
+def test_link_table_from_profiles():
+    # Only the key fields: the table keeps the other ones as None
+    names = DumpProfile('names', PROFILES['minimal'].ext_mask, ())
+    for profile in ('minimal', names):
+        with Linetface(decoder='fast', profile=profile) as session:
+            links = session.get_links()
+            table = session.get_link_table()
+        assert list(table) == list(links)
+    assert (links[0].flags, links[0].link_type, links[0].operstate) == (None, None, None)
@@ -0,0 +1,82 @@
+import json
+import random
+import subprocess
+from ipaddress import IPv4Address
+
+import pytest
+
+from linetface import rawnl, get_routes
+from linetface.table import RouteTable
+
+from .synth import FakeSocket, bgp_dump, bgp_prefixes, route_msg, done_msg
+
+
+def ip_dst(route) -> str:
+    ''' The "dst" of "ip -j route": "default", and no mask for host routes. '''
+    if route.dst.prefixlen == 0:
+        return 'default'
+    if route.dst.prefixlen == route.dst.max_prefixlen:
+        return str(route.dst.network_address)
+    return str(route.dst)
+
+
+def test_get_routes_like_ip():
+    theirs = json.loads(subprocess.run(('ip', '-j', '-d', 'route', 'show', 'table', 'all'), check=True,
+                                       stdout=subprocess.PIPE).stdout)
+    ours = get_routes(table=None)
+    assert sorted(map(ip_dst, ours)) == sorted(d['dst'] for d in theirs)
+    assert sorted(str(r.type) for r in ours) == sorted(d['type'] for d in theirs)
+    assert len(get_routes()) == len([d for d in theirs if d['table'] == 'main'])
+
+
+def decode(data: bytes):
+    return [rawnl.decode_route_fields(data, start, end)
+            for kind, _f, _s, start, end in rawnl.iter_messages(data) if kind == rawnl.RTM_NEWROUTE]
+
+
+def test_route_table_rows():
+    fields = decode(b''.join(bgp_dump(50)))
+    table = RouteTable.from_dump(fields)
+    assert len(table) == 50
+    assert [r.dst for r in table] == [rawnl.make_route(*f).dst for f in fields]
+    # The 4 gateways are kept once
+    assert len(table.addresses) == 4
+    assert str(table[1].gateway) == '192.0.2.2'
+
+
+def test_longest_prefix_match():
+    prefixes = list(bgp_prefixes(1000, seed=1))
+    prefixes.append((bytes(4), 0))
+    # Same prefix with a better metric, and a host route inside a /24
+    prefixes.append(prefixes[10])
+    messages = [route_msg(dst, length, oif=i + 2, metric=100) for i, (dst, length) in enumerate(prefixes)]
+    messages[-1] = route_msg(prefixes[-1][0], prefixes[-1][1], oif=9999, metric=10)
+    inner = int.from_bytes(prefixes[0][0], 'big') + 5
+    messages.append(route_msg(inner.to_bytes(4, 'big'), 32, oif=7777))
+    table = RouteTable.from_dump(decode(b''.join(messages)))
+    networks = [r.dst for r in table]
+    rng = random.Random(2)
+    samples = [IPv4Address(rng.getrandbits(32)) for _i in range(500)]
+    samples += [n.network_address for n in networks] + [n.broadcast_address for n in networks]
+    for address in samples:
+        # Brute force: the longest containing prefix, then the lowest metric, then the first one
+        best = min((i for i, n in enumerate(networks) if address in n),
+                   key=lambda i: (-networks[i].prefixlen, table[i].metric if table[i].metric is not None
+                                  else 1 << 32, i))
+        assert table.lookup(address).oif == table[best].oif, address
+    assert table.lookup(IPv4Address(inner)).oif == 7777
+    assert table.lookup(networks[10].network_address).oif == 9999
+    assert table.lookup('::1') is None
+
+
+def test_route_table_ip_only():
+    # A dump of all families has the multicast routes too, here one of RTNL_FAMILY_IPMR
+    multicast = bytearray(route_msg(bytes((239, 1, 1, 1)), 32, table=252))
+    multicast[16] = 128
+    unicast = route_msg(bytes((10, 0, 0, 0)), 8)
+    sock = FakeSocket({rawnl.RTM_GETROUTE: bytes(multicast) + unicast + done_msg()})
+    table = RouteTable.from_dump(rawnl.iter_route_fields(sock, table=None))
+    assert [str(r.dst) for r in table] == ['10.0.0.0/8']
+    assert table.lookup('10.1.1.1') == table[0]
+    with pytest.raises(ValueError):
+        table.lookup_row(128, 0xEF010101)
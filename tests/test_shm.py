@@ -0,0 +1,96 @@
+import os
+import time
+import threading
+
+import pytest
+
+from linetface import rawnl
+from linetface.hand import Linetface
+from linetface.shm import SnapshotPublisher, SnapshotReader, DATA_OFFSET
+
+from .synth import host_dump
+
+
+def snapshots(nlinks: int) -> list:
+    '''
+    Two versions of a dump, with links renamed from veth* to vexx* in the second one:
+    successive writes to a slot alternate between them, so a torn read mixes both names.
+    '''
+    link_data, addr_data = host_dump(nlinks)
+    links = b''.join(rawnl.LazyIPLink(link_data, start, end).to_message()
+                     for kind, _f, _s, start, end in rawnl.iter_messages(link_data) if kind == rawnl.RTM_NEWLINK)
+    return [(links, addr_data), (links.replace(b'veth', b'vexx'), addr_data.replace(b'veth', b'vexx'))]
+
+
+def check_reads(reader: SnapshotReader, seconds: float) -> int:
+    ''' Read until the time is up, checking that each snapshot is whole. Return the generations seen. '''
+    seen = set()
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        addrs = reader.get_addrs()
+        generation = reader.generation
+        prefix = ('veth', 'vexx')[generation // 2 % 2]
+        assert [a.ifname for a in addrs] == ['lo'] + ['{}{}'.format(prefix, i) for i in range(2, len(addrs) + 1)]
+        assert [len(a.addr_info) for a in addrs] == [1] + [3] * (len(addrs) - 1)
+        assert not seen or generation >= max(seen)
+        seen.add(generation)
+    return len(seen)
+
+
+def test_forked_readers_under_churn(tmp_path):
+    path = str(tmp_path / 'snapshot')
+    dumps = snapshots(200)
+    with SnapshotPublisher(path, capacity=1 << 20, session=Linetface()) as publisher:
+        publisher.write(*dumps[0])
+        reader = SnapshotReader(path)
+        children = []
+        for _i in range(4):
+            read_end, write_end = os.pipe()
+            pid = os.fork()
+            if pid == 0:
+                status = 1
+                try:
+                    os.close(read_end)
+                    os.write(write_end, str(check_reads(reader, 1.0)).encode())
+                    status = 0
+                finally:
+                    os._exit(status)
+            os.close(write_end)
+            children.append((pid, read_end))
+        # The writer publishes as fast as it can while the children read.
+        deadline = time.monotonic() + 1.2
+        while time.monotonic() < deadline:
+            publisher.write(*dumps[(publisher.generation + 1) // 2 % 2])
+        for pid, read_end in children:
+            assert os.waitpid(pid, 0)[1] == 0
+            with os.fdopen(read_end) as f:
+                assert int(f.read()) > 5
+        # A slot whose content doesn't match its CRC is read again, until the next snapshot.
+        generation = publisher.write(*dumps[0])
+        retries = reader.retries
+        publisher._map[DATA_OFFSET + generation % 2 * publisher.capacity + 100] ^= 0xFF
+        threading.Timer(0.1, publisher.write, dumps[1]).start()
+        assert reader.get_addrs()[1].ifname == 'vexx2' and reader.generation == generation + 1
+        assert reader.retries > retries
+        with pytest.raises(ValueError):
+            publisher.write(b'\0' * (1 << 20), b'\0')
+        reader.close()
+
+
+def test_publish(tmp_path):
+    path = str(tmp_path / 'snapshot')
+    with SnapshotPublisher(path) as publisher, SnapshotReader(path) as reader:
+        assert reader.get_addrs() == ()
+        assert publisher.publish() == reader.published() == 1
+        addrs = reader.get_addrs()
+        with Linetface(decoder='fast') as session:
+            assert addrs == session.get_addrs()
+        # Nothing is decoded again until the next snapshot
+        assert reader.get_addrs() is addrs and reader.last_dump() > 0
+        link_data, addr_data = snapshots(3)[0]
+        publisher.write(link_data, addr_data)
+        addrs = reader.get_addrs()
+        assert reader.generation == 2 and [a.ifname for a in addrs] == ['lo', 'veth2', 'veth3']
+        # Then only what changed
+        publisher.write(link_data.replace(b'veth3', b'wan_3'), addr_data)
+        assert [a is b for a, b in zip(reader.get_addrs(), addrs)] == [True, True, False]
@@ -0,0 +1,41 @@
+import dataclasses
+from ipaddress import IPv4Address
+
+from linetface import rawnl
+from linetface.snapshot import Snapshot, diff
+
+from .synth import host_dump
+
+
+def get_addrs(nlinks: int):
+    link_data, addr_data = host_dump(nlinks)
+    links = [rawnl.decode_link(link_data, start, end) for kind, _f, _s, start, end in rawnl.iter_messages(link_data)
+             if kind == rawnl.RTM_NEWLINK]
+    infos = {}
+    for kind, _f, _s, start, end in rawnl.iter_messages(addr_data):
+        if kind == rawnl.RTM_NEWADDR:
+            index, info = rawnl.decode_addr(addr_data, start, end)
+            infos.setdefault(index, []).append(info)
+    return tuple(li.join(infos.get(li.ifindex, ())) for li in links)
+
+
+def test_diff():
+    old = get_addrs(5)
+    assert not diff(old, old)
+    new = list(old)
+    # veth2 is renamed, one address of veth3 ages and another is relabelled, veth5 goes away, veth6 comes.
+    new[1] = dataclasses.replace(new[1], ifname='wan0')
+    infos = list(new[2].addr_info)
+    infos[0] = dataclasses.replace(infos[0], label='veth3:1', valid_life_time=100)
+    infos[1] = dataclasses.replace(infos[1], valid_life_time=100)
+    new[2] = dataclasses.replace(new[2], addr_info=tuple(infos))
+    new[4:] = get_addrs(6)[5:]
+    changes = diff(Snapshot(old), Snapshot(new))
+    assert [li.ifname for li in changes.added_links] == ['veth6']
+    assert [li.ifname for li in changes.removed_links] == ['veth5']
+    assert [(c.key, c.fields) for c in changes.changed_links] == [(2, {'ifname': ('veth2', 'wan0')})]
+    assert [c.key for c in changes.changed_addrs] == [(3, 2, IPv4Address('10.0.0.3'), 16)]
+    assert changes.changed_addrs[0].fields == {'label': ('veth3', 'veth3:1')}
+    assert len(changes.added_addrs) == len(changes.removed_addrs) == 3
+    # With no volatile field, the lifetimes count too.
+    assert len(diff(old, new, volatile=()).changed_addrs) == 2
@@ -0,0 +1,50 @@
+from pathlib import Path
+from unittest import mock
+
+import pytest
+
+from linetface import get_link_stats, stats
+from linetface.stats import COUNTERS, LinkStats, RateTracker
+
+
+def sample(rows, timestamp):
+    ''' Build LinkStats from {ifindex: (rx_bytes, tx_bytes)}. '''
+    width = len(COUNTERS)
+
+    def dump():
+        for ifindex, (rx, tx) in rows.items():
+            values = [0] * width
+            values[COUNTERS.index('rx_bytes')] = rx
+            values[COUNTERS.index('tx_bytes')] = tx
+            data = b''.join(v.to_bytes(8, 'little') for v in values)
+            yield ifindex, data, 0, len(data)
+    return LinkStats.from_dump(dump(), timestamp)
+
+
+def test_get_link_stats():
+    before = int(Path('/sys/class/net/lo/statistics/tx_packets').read_text())
+    counters = get_link_stats()
+    assert sorted(int(i) for i in counters.ifindex) == sorted(
+        int(p.read_text()) for p in Path('/sys/class/net').glob('*/ifindex'))
+    assert counters.row(1)['tx_packets'] >= before
+
+
+@pytest.mark.parametrize('with_numpy', [True, False])
+def test_rates(with_numpy):
+    if with_numpy and stats.numpy is None:
+        pytest.skip('NumPy is not installed')
+    with mock.patch.object(stats, 'numpy', stats.numpy if with_numpy else None):
+        tracker = RateTracker()
+        assert tracker.update(sample({1: (100, 10), 2: (1000, 0), 3: (5, 5)}, 10.0)) is None
+        # 2 is reset, 3 goes away, 4 comes
+        rates = tracker.update(sample({1: (300, 50), 2: (400, 0), 4: (7, 7)}, 12.0))
+        # A sample out of order is rejected and not recorded
+        last = tracker.last
+        with pytest.raises(ValueError):
+            tracker.update(sample({1: (0, 0)}, 11.0))
+        assert tracker.last is last
+    assert sorted(int(i) for i in rates.ifindex) == [1, 2]
+    assert rates.row(1)['rx_bytes'] == 100
+    assert rates.row(1)['tx_bytes'] == 20
+    assert rates.row(2)['rx_bytes'] == 200
+    assert list(rates.column('rx_packets')) == [0, 0]